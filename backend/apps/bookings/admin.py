@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Customer, Booking, PartyBooking, Waiver, Transaction, BookingBlock, SessionBookingHistory, PartyBookingHistory
+from .models import Customer, Booking, PartyBooking, Waiver, Transaction, BookingBlock, SessionBookingHistory, PartyBookingHistory, SlotAvailability, SlotHold
 
 # Payment inline for Booking admin
 class PaymentInline(admin.TabularInline):
@@ -60,10 +60,11 @@ class PartyPaymentInline(admin.TabularInline):
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'email', 'phone', 'created_at']
+    list_display = ['id', 'name', 'email', 'phone', 'booking_count', 'party_booking_count', 'total_spent', 'last_visit', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'email', 'phone']
     ordering = ['-created_at']
+    readonly_fields = ['booking_count', 'party_booking_count', 'total_spent', 'last_visit']
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -251,6 +252,25 @@ class BookingBlockAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(SlotAvailability)
+class SlotAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['date', 'time', 'adults', 'kids', 'spectators', 'booking_count', 'updated_at']
+    list_filter = ['date']
+    ordering = ['-date', 'time']
+    readonly_fields = ['date', 'time', 'adults', 'kids', 'spectators', 'booking_count', 'updated_at']
+    
+    def has_add_permission(self, request):
+        # Counters are maintained by booking signals (rebuild_slot_availability to repair)
+        return False
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ['booking', 'date', 'time', 'adults', 'kids', 'status', 'expires_at', 'created_at']
+    list_filter = ['status', 'date']
+    search_fields = ['booking__booking_number', 'booking__email']
+    raw_id_fields = ['booking']
+    readonly_fields = ['created_at', 'updated_at']
+
 @admin.register(SessionBookingHistory)
 class SessionBookingHistoryAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'email', 'date', 'time', 'amount', 'restored', 'restored_at', 'restored_by', 'created_at']
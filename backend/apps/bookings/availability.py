@@ -0,0 +1,308 @@
+"""
+Slot availability engine for session bookings.
+
+Keeps one SlotAvailability counter row per (date, time) slot in step with the
+Booking table. Counters are adjusted with F() expressions inside the booking's
+own transaction (see signals.py), so availability and capacity checks read a
+single indexed row instead of aggregating bookings.
+
+Checkout capacity is reserved under a row lock on the slot (reserve_slot) and
+kept for unpaid bookings by a SlotHold with a TTL; expired holds cancel the
+unpaid booking so its places go back to the slot.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Count, Q
+from django.utils import timezone
+
+from .models import Booking, SlotAvailability, SlotHold
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailable(ValueError):
+    """Raised when a slot does not have enough places left"""
+    pass
+
+
+def get_slot_capacity():
+    """Maximum jumpers (adults + kids) per slot. 0 disables the capacity check."""
+    return getattr(settings, 'SESSION_SLOT_CAPACITY', 0)
+
+
+def get_hold_ttl():
+    """How long an unpaid checkout keeps its places"""
+    return timedelta(minutes=getattr(settings, 'SLOT_HOLD_TTL_MINUTES', 15))
+
+
+def apply_slot_delta(slot_date, slot_time, adults=0, kids=0, spectators=0, bookings=0):
+    """
+    Atomically add (or subtract, with negative values) head-counts to a slot.
+    """
+    with transaction.atomic():
+        slot, _ = SlotAvailability.objects.get_or_create(date=slot_date, time=slot_time)
+        SlotAvailability.objects.filter(pk=slot.pk).update(
+            adults=F('adults') + adults,
+            kids=F('kids') + kids,
+            spectators=F('spectators') + spectators,
+            booking_count=F('booking_count') + bookings,
+        )
+
+
+def sync_booking_slot(old_usage, new_usage):
+    """
+    Move a booking's head-count from old_usage to new_usage.
+
+    Both arguments are Booking.slot_usage() tuples (or None when the booking
+    does not hold capacity), so this covers create, cancel, move and delete.
+    """
+    if old_usage == new_usage:
+        return
+    if old_usage:
+        slot_date, slot_time, adults, kids, spectators = old_usage
+        apply_slot_delta(slot_date, slot_time, -adults, -kids, -spectators, -1)
+    if new_usage:
+        slot_date, slot_time, adults, kids, spectators = new_usage
+        apply_slot_delta(slot_date, slot_time, adults, kids, spectators, 1)
+
+
+def remaining_capacity(slot_date, slot_time):
+    """
+    Return the number of jumpers that can still be booked into a slot,
+    or None when capacity is unlimited.
+    """
+    capacity = get_slot_capacity()
+    if not capacity:
+        return None
+    booked = SlotAvailability.objects.filter(date=slot_date, time=slot_time).values_list(
+        'adults', 'kids'
+    ).first()
+    if booked is None:
+        return capacity
+    return max(capacity - booked[0] - booked[1], 0)
+
+
+def lock_slot(slot_date, slot_time):
+    """
+    Return the slot's counter row locked with SELECT ... FOR UPDATE.
+
+    Must be called inside a transaction; concurrent checkouts for the same
+    slot queue on this lock until the first one commits.
+    """
+    slot, _ = SlotAvailability.objects.get_or_create(date=slot_date, time=slot_time)
+    return SlotAvailability.objects.select_for_update().get(pk=slot.pk)
+
+
+def reserve_slot(slot_date, slot_time, participants):
+    """
+    Lock the slot and check that `participants` more jumpers fit.
+
+    The caller must create the booking in the same transaction so the check and
+    the insert are serialized. Expired holds on the slot are swept first when
+    the slot looks full. Raises SlotUnavailable.
+    """
+    capacity = get_slot_capacity()
+    if not capacity or not participants:
+        return
+
+    slot = lock_slot(slot_date, slot_time)
+    if slot.participants + participants > capacity:
+        if expire_holds(slot_date=slot_date, slot_time=slot_time):
+            slot.refresh_from_db()
+    remaining = max(capacity - slot.participants, 0)
+    if participants > remaining:
+        raise SlotUnavailable(f"This time slot only has {remaining} place(s) left")
+
+
+def place_hold(booking, ttl=None):
+    """Start (or restart) the payment hold for an unpaid session booking."""
+    if not get_slot_capacity():
+        return None
+    usage = booking.slot_usage()
+    if usage is None:
+        return None
+    slot_date, slot_time, adults, kids, _ = usage
+    hold, _ = SlotHold.objects.update_or_create(
+        booking=booking,
+        defaults={
+            'date': slot_date,
+            'time': slot_time,
+            'adults': adults,
+            'kids': kids,
+            'status': 'ACTIVE',
+            'expires_at': timezone.now() + (ttl or get_hold_ttl()),
+        }
+    )
+    return hold
+
+
+@transaction.atomic
+def ensure_hold(booking):
+    """
+    Make sure an unpaid booking still has its places before payment starts.
+
+    Extends an active hold; re-reserves the places (under the slot lock) when
+    the hold already expired and the sweeper cancelled the booking.
+    Raises SlotUnavailable if the places were taken in the meantime.
+    Does nothing while slot capacity is not enforced.
+    """
+    if not get_slot_capacity():
+        return None
+    hold = SlotHold.objects.select_for_update().filter(booking=booking).first()
+    if hold is None or hold.status in ('CONVERTED', 'RELEASED'):
+        return hold
+
+    if hold.status == 'ACTIVE':
+        hold.expires_at = timezone.now() + get_hold_ttl()
+        hold.save(update_fields=['expires_at', 'updated_at'])
+        return hold
+
+    # Expired: the booking was cancelled by the sweeper, take the places back
+    reserve_slot(hold.date, hold.time, hold.adults + hold.kids)
+    _reinstate(booking, hold)
+    logger.info(f"Re-reserved expired hold for booking {booking.id}")
+    return place_hold(booking)
+
+
+def _reinstate(booking, hold):
+    """Give a booking cancelled by the sweeper back the status it had before."""
+    if booking.booking_status == 'CANCELLED':
+        booking.booking_status = hold.previous_booking_status or 'PENDING'
+        booking.save(update_fields=['booking_status', 'updated_at'])
+
+
+@transaction.atomic
+def convert_hold(booking):
+    """
+    Mark the booking's hold as converted once payment succeeded.
+
+    A payment that arrives after the sweeper cancelled the booking only
+    reinstates it if its places are still free; otherwise the booking stays
+    cancelled (and the hold expired) so staff can refund it.
+    """
+    hold = SlotHold.objects.select_for_update().filter(booking=booking).first()
+    if hold is None or hold.status == 'CONVERTED':
+        return hold
+
+    if hold.status == 'EXPIRED' and booking.booking_status == 'CANCELLED':
+        try:
+            reserve_slot(hold.date, hold.time, hold.adults + hold.kids)
+        except SlotUnavailable:
+            logger.error(f"Payment for booking {booking.id} arrived after its hold expired and the slot is full, refund needed")
+            return hold
+        logger.warning(f"Payment for booking {booking.id} arrived after its hold expired, reinstating")
+        _reinstate(booking, hold)
+
+    hold.status = 'CONVERTED'
+    hold.save(update_fields=['status', 'updated_at'])
+    return hold
+
+
+def expire_holds(now=None, slot_date=None, slot_time=None):
+    """
+    Expire active holds past their TTL and cancel their still-unpaid bookings.
+
+    Row locks with SKIP LOCKED let several sweepers (or a sweep inside
+    reserve_slot) run at once without blocking checkouts. Returns the number of holds expired.
+    Nothing is swept while slot capacity is not enforced.
+    """
+    if not get_slot_capacity():
+        return 0
+    now = now or timezone.now()
+    expired = 0
+    with transaction.atomic():
+        holds = SlotHold.objects.select_for_update(skip_locked=True).select_related('booking').filter(
+            status='ACTIVE',
+            expires_at__lte=now,
+        )
+        if slot_date is not None:
+            holds = holds.filter(date=slot_date, time=slot_time)
+
+        for hold in holds:
+            booking = hold.booking
+            if booking.payment_status == 'PENDING' and booking.booking_status != 'CANCELLED':
+                hold.previous_booking_status = booking.booking_status
+                booking.booking_status = 'CANCELLED'
+                booking.save(update_fields=['booking_status', 'updated_at'])
+            hold.status = 'EXPIRED'
+            hold.save(update_fields=['status', 'previous_booking_status', 'updated_at'])
+            expired += 1
+
+    if expired:
+        logger.info(f"Expired {expired} slot hold(s)")
+    return expired
+
+
+def get_availability(start_date, end_date):
+    """
+    Return counters for every booked slot between start_date and end_date (inclusive).
+
+    Runs one query against the (date, time) unique index. Slots without any
+    booking have no row and are fully available.
+    """
+    capacity = get_slot_capacity()
+    rows = SlotAvailability.objects.filter(
+        date__gte=start_date,
+        date__lte=end_date,
+    ).order_by('date', 'time').values_list('date', 'time', 'adults', 'kids', 'spectators', 'booking_count')
+
+    slots = []
+    for slot_date, slot_time, adults, kids, spectators, booking_count in rows:
+        participants = adults + kids
+        slots.append({
+            'date': slot_date.isoformat(),
+            'time': slot_time.strftime('%H:%M'),
+            'adults': adults,
+            'kids': kids,
+            'spectators': spectators,
+            'bookings': booking_count,
+            'participants': participants,
+            'remaining': max(capacity - participants, 0) if capacity else None,
+            'is_full': bool(capacity) and participants >= capacity,
+        })
+    return slots
+
+
+@transaction.atomic
+def rebuild_slot_availability(start_date=None, end_date=None):
+    """
+    Recompute slot counters from the Booking table.
+
+    Used to repair counters after bulk updates that bypass signals
+    (queryset.update(), raw SQL, data imports). Returns the number of slots written.
+    """
+    bookings = Booking.objects.exclude(
+        Q(booking_status='CANCELLED') | Q(status='CANCELLED')
+    )
+    slots = SlotAvailability.objects.all()
+    if start_date:
+        bookings = bookings.filter(date__gte=start_date)
+        slots = slots.filter(date__gte=start_date)
+    if end_date:
+        bookings = bookings.filter(date__lte=end_date)
+        slots = slots.filter(date__lte=end_date)
+
+    totals = bookings.order_by().values('date', 'time').annotate(
+        total_adults=Sum('adults'),
+        total_kids=Sum('kids'),
+        total_spectators=Sum('spectators'),
+        total_bookings=Count('id'),
+    )
+
+    slots.delete()
+    created = SlotAvailability.objects.bulk_create([
+        SlotAvailability(
+            date=row['date'],
+            time=row['time'],
+            adults=row['total_adults'] or 0,
+            kids=row['total_kids'] or 0,
+            spectators=row['total_spectators'] or 0,
+            booking_count=row['total_bookings'],
+        )
+        for row in totals
+    ])
+    logger.info(f"Rebuilt slot availability: {len(created)} slots")
+    return len(created)
@@ -0,0 +1,50 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
+from rest_framework import status
+from datetime import date, timedelta
+from django.utils import timezone
+from .availability import get_availability, get_slot_capacity
+
+# Upper bound on the requested range so a single call stays a small index scan
+MAX_AVAILABILITY_DAYS = 92
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def slot_availability(request):
+    """
+    Public per-slot availability for the booking wizard.
+
+    GET /api/v1/bookings/availability/?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+    Defaults to the next 30 days. Only slots that already have bookings are
+    listed; any other slot is fully available.
+    """
+    try:
+        start_param = request.query_params.get('from')
+        end_param = request.query_params.get('to')
+        start_date = date.fromisoformat(start_param) if start_param else timezone.localdate()
+        end_date = date.fromisoformat(end_param) if end_param else start_date + timedelta(days=30)
+    except ValueError:
+        return Response(
+            {'error': 'from and to must be dates in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if end_date < start_date:
+        return Response({'error': 'to must not be before from'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if (end_date - start_date).days > MAX_AVAILABILITY_DAYS:
+        return Response(
+            {'error': f'Date range cannot exceed {MAX_AVAILABILITY_DAYS} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    capacity = get_slot_capacity()
+    return Response({
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'capacity': capacity or None,
+        'slots': get_availability(start_date, end_date),
+    })
@@ -0,0 +1,194 @@
+"""
+Customer resolution for bookings.
+
+Every booking path (session/party serializers, the party booking view,
+history restores and the pre_save signal fallback) links its Customer through
+resolve_customer(), so a booking create costs one upsert instead of a
+get_or_create followed by extra saves.
+
+Customer lifetime stats (booking counts, total spent, last visit) are stored
+on the row and refreshed by refresh_customer_stats() when a booking changes.
+"""
+
+import logging
+from django.db import connection, IntegrityError, transaction
+from django.db.models import Count, DecimalField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Booking, Customer, PartyBooking
+
+logger = logging.getLogger(__name__)
+
+# Attribute used to memoize resolved customers on the current request
+MEMO_ATTR = '_customer_memo'
+
+
+def _normalize(value):
+    return (value or '').strip()
+
+
+def _upsert_postgresql(email, name, phone, overwrite):
+    """
+    INSERT ... ON CONFLICT (email) DO UPDATE in one statement.
+
+    The update only fires when the stored details actually change, in which
+    case nothing is returned and the existing row is read back. No post_save
+    fires for the raw INSERT, so a created customer (xmax = 0 in RETURNING) is
+    added to the daily metrics here.
+    """
+    table = Customer._meta.db_table
+    if overwrite:
+        # Latest booking details win (empty phone keeps the stored one)
+        new_name = f"COALESCE(NULLIF(EXCLUDED.name, ''), {table}.name)"
+        new_phone = f"COALESCE(NULLIF(EXCLUDED.phone, ''), {table}.phone)"
+    else:
+        # Only fill in blanks
+        new_name = f"COALESCE(NULLIF({table}.name, ''), EXCLUDED.name)"
+        new_phone = f"COALESCE(NULLIF({table}.phone, ''), EXCLUDED.phone)"
+
+    fields = Customer._meta.concrete_fields
+    returning = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (name, email, phone, booking_count, party_booking_count, total_spent, created_at, updated_at)
+            VALUES (%s, %s, %s, 0, 0, 0, %s, %s)
+            ON CONFLICT (email) DO UPDATE
+            SET name = {new_name}, phone = {new_phone}, updated_at = EXCLUDED.updated_at
+            WHERE ({table}.name, {table}.phone) IS DISTINCT FROM ({new_name}, {new_phone})
+            RETURNING {returning}, (xmax = 0)
+            """,
+            [name, email, phone or None, now, now]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return Customer.objects.get(email=email)
+    customer = Customer.from_db(connection.alias, [field.attname for field in fields], row[:-1])
+    if row[-1]:
+        from apps.core import metrics
+        metrics.sync_contribution({}, metrics.contribution(customer))
+    return customer
+
+
+def _upsert_generic(email, name, phone, overwrite):
+    """get_or_create plus at most one UPDATE, for databases without ON CONFLICT support."""
+    try:
+        with transaction.atomic():
+            customer, created = Customer.objects.get_or_create(
+                email=email,
+                defaults={'name': name, 'phone': phone or None}
+            )
+    except IntegrityError:
+        # Lost a race with a concurrent insert of the same email
+        customer, created = Customer.objects.get(email=email), False
+
+    if created:
+        return customer
+
+    changed = []
+    if overwrite:
+        if name and customer.name != name:
+            customer.name = name
+            changed.append('name')
+        if phone and customer.phone != phone:
+            customer.phone = phone
+            changed.append('phone')
+    else:
+        if not customer.name and name:
+            customer.name = name
+            changed.append('name')
+        if not customer.phone and phone:
+            customer.phone = phone
+            changed.append('phone')
+
+    if changed:
+        customer.save(update_fields=changed + ['updated_at'])
+    return customer
+
+
+def resolve_customer(email, name=None, phone=None, overwrite=True, request=None):
+    """
+    Return the Customer for `email`, creating or updating it in a single upsert.
+
+    Args:
+        email: Customer email (unique key). Returns None when empty.
+        name, phone: Details from the booking.
+        overwrite: True for live bookings (latest details win), False to only
+            fill in missing details (e.g. restoring old bookings).
+        request: When given, results are memoized on the request so resolving
+            the same email again in the same request costs no queries.
+    """
+    email = _normalize(email)
+    if not email:
+        return None
+    name = _normalize(name)
+    phone = _normalize(phone)
+
+    memo = None
+    if request is not None:
+        memo = getattr(request, MEMO_ATTR, None)
+        if memo is None:
+            memo = {}
+            setattr(request, MEMO_ATTR, memo)
+        key = (email, name, phone)
+        if key in memo:
+            return memo[key]
+
+    if connection.vendor == 'postgresql':
+        customer = _upsert_postgresql(email, name, phone, overwrite)
+    else:
+        customer = _upsert_generic(email, name, phone, overwrite)
+
+    if memo is not None:
+        memo[(email, name, phone)] = customer
+    return customer
+
+
+# ----------------------------------------------------------------------
+# Lifetime stats
+# ----------------------------------------------------------------------
+
+def _stats_subqueries(queryset, prefix):
+    """Count / amount sum / latest date of a customer's bookings as correlated subqueries."""
+    rows = queryset.filter(customer=OuterRef('pk')).order_by().values('customer')
+    return {
+        f'{prefix}_count': Subquery(rows.annotate(value=Count('id')).values('value'), output_field=IntegerField()),
+        f'{prefix}_spent': Subquery(rows.annotate(value=Sum('amount')).values('value'), output_field=DecimalField()),
+        f'{prefix}_last': Subquery(rows.annotate(value=Max('date')).values('value')),
+    }
+
+
+def customer_stats_expressions(booking_model=Booking, party_booking_model=PartyBooking):
+    """
+    UPDATE expressions recomputing every stats column from the booking tables.
+    Models can be swapped for historical ones in migrations.
+    """
+    session = _stats_subqueries(
+        booking_model.objects.exclude(Q(booking_status='CANCELLED') | Q(status='CANCELLED')), 'session'
+    )
+    party = _stats_subqueries(party_booking_model.objects.exclude(status='CANCELLED'), 'party')
+    zero = Value(0, output_field=DecimalField())
+    return {
+        'booking_count': Coalesce(session['session_count'], 0),
+        'party_booking_count': Coalesce(party['party_count'], 0),
+        'total_spent': Coalesce(session['session_spent'], zero) + Coalesce(party['party_spent'], zero),
+        # GREATEST is NULL-unsafe on some databases, so each side falls back to the other
+        'last_visit': Greatest(
+            Coalesce(session['session_last'], party['party_last']),
+            Coalesce(party['party_last'], session['session_last']),
+        ),
+    }
+
+
+def refresh_customer_stats(*customer_ids):
+    """Recompute the stats of the given customers in one UPDATE (None ids are ignored)."""
+    ids = {customer_id for customer_id in customer_ids if customer_id}
+    if ids:
+        Customer.objects.filter(pk__in=ids).update(**customer_stats_expressions())
+
+
+def recompute_customer_stats(customer_model=Customer, booking_model=Booking, party_booking_model=PartyBooking):
+    """Recompute the stats of every customer. Returns the number of customers updated."""
+    return customer_model.objects.update(**customer_stats_expressions(booking_model, party_booking_model))
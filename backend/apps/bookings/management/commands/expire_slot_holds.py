@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.bookings.availability import expire_holds
+
+
+class Command(BaseCommand):
+    help = 'Expire unpaid checkout holds past their TTL and release their slot places'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping (every SLOT_HOLD_SWEEP_SECONDS) instead of exiting',
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            count = expire_holds()
+            self.stdout.write(self.style.SUCCESS(f'Expired {count} slot hold(s)'))
+            return
+
+        self.stdout.write('Expiring slot holds...')
+        while True:
+            close_old_connections()
+            expire_holds()
+            time.sleep(settings.SLOT_HOLD_SWEEP_SECONDS)
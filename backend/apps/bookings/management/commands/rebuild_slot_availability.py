@@ -0,0 +1,21 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.bookings.availability import rebuild_slot_availability
+
+
+class Command(BaseCommand):
+    help = 'Recompute SlotAvailability counters from session bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start_date', help='First date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end_date', help='Last date to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start_date']) if options['start_date'] else None
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else None
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        count = rebuild_slot_availability(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt availability for {count} slots'))
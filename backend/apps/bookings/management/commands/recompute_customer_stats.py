@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.bookings.customers import recompute_customer_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute customer lifetime stats (booking counts, total spent, last visit) from bookings'
+
+    def handle(self, *args, **options):
+        count = recompute_customer_stats()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed stats for {count} customer(s)'))
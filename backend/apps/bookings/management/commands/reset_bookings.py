@@ -60,13 +60,21 @@ class Command(BaseCommand):
                     bookings_partybookinghistory, 
                     bookings_booking, 
                     bookings_partybooking, 
-                    bookings_customer
+                    bookings_customer,
+                    bookings_slotavailability,
+                    bookings_slothold,
+                    bookings_bookingnumbersequence,
+                    core_dailymetrics
                 RESTART IDENTITY CASCADE;
                 """
                 
                 cursor.execute(sql)
                 self.stdout.write(self.style.SUCCESS('Successfully truncated tables and reset sequences.'))
                 
+                # TRUNCATE bypasses signals; drop the removed rows from global search
+                from apps.core.search_index import rebuild_search_index
+                rebuild_search_index()
+                
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Error occurred: {str(e)}'))
                 return
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:53
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_slot_availability(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    SlotAvailability = apps.get_model('bookings', 'SlotAvailability')
+
+    totals = Booking.objects.exclude(
+        Q(booking_status='CANCELLED') | Q(status='CANCELLED')
+    ).order_by().values('date', 'time').annotate(
+        total_adults=Sum('adults'),
+        total_kids=Sum('kids'),
+        total_spectators=Sum('spectators'),
+        total_bookings=Count('id'),
+    )
+    SlotAvailability.objects.bulk_create([
+        SlotAvailability(
+            date=row['date'],
+            time=row['time'],
+            adults=row['total_adults'] or 0,
+            kids=row['total_kids'] or 0,
+            spectators=row['total_spectators'] or 0,
+            booking_count=row['total_bookings'],
+        )
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0017_booking_bookings_bo_name_562a70_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('adults', models.IntegerField(default=0)),
+                ('kids', models.IntegerField(default=0)),
+                ('spectators', models.IntegerField(default=0)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Slot Availability',
+                'verbose_name_plural': 'Slot Availability',
+                'ordering': ['date', 'time'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time'), name='unique_slot_availability')],
+            },
+        ),
+        migrations.RunPython(backfill_slot_availability, migrations.RunPython.noop),
+    ]
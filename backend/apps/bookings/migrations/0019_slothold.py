@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0018_slotavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('adults', models.IntegerField(default=0)),
+                ('kids', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CONVERTED', 'Converted'), ('EXPIRED', 'Expired'), ('RELEASED', 'Released')], default='ACTIVE', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='slot_hold', to='bookings.booking')),
+            ],
+            options={
+                'verbose_name': 'Slot Hold',
+                'verbose_name_plural': 'Slot Holds',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='bookings_sl_status_ce12cf_idx'), models.Index(fields=['date', 'time'], name='bookings_sl_date_1f6258_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:57
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_booking_number_sequences(apps, schema_editor):
+    """
+    Start each day's sequence above the numbers already issued (legacy numbers
+    used the booking id as suffix), so new numbers never collide with them.
+    """
+    highest = {}
+    for model_name in ('Booking', 'PartyBooking'):
+        Model = apps.get_model('bookings', model_name)
+        for number in Model.objects.exclude(booking_number__isnull=True).values_list('booking_number', flat=True).iterator():
+            parts = number.split('-')
+            if len(parts) != 3 or not parts[2].isdigit():
+                continue
+            try:
+                day = datetime.strptime(parts[1], '%Y%m%d').date()
+            except ValueError:
+                continue
+            key = (parts[0], day)
+            highest[key] = max(highest.get(key, 0), int(parts[2]))
+
+    BookingNumberSequence = apps.get_model('bookings', 'BookingNumberSequence')
+    BookingNumberSequence.objects.bulk_create([
+        BookingNumberSequence(prefix=prefix, date=day, last_value=value)
+        for (prefix, day), value in highest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0019_slothold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Booking Number Sequence',
+                'verbose_name_plural': 'Booking Number Sequences',
+                'constraints': [models.UniqueConstraint(fields=('prefix', 'date'), name='unique_booking_number_sequence')],
+            },
+        ),
+        migrations.RunPython(seed_booking_number_sequences, migrations.RunPython.noop),
+    ]
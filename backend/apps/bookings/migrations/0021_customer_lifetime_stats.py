@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+def backfill_customer_stats(apps, schema_editor):
+    from apps.bookings.customers import recompute_customer_stats
+    recompute_customer_stats(
+        apps.get_model('bookings', 'Customer'),
+        apps.get_model('bookings', 'Booking'),
+        apps.get_model('bookings', 'PartyBooking'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0020_bookingnumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='booking_count',
+            field=models.IntegerField(default=0, help_text='Session bookings'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_visit',
+            field=models.DateField(blank=True, help_text='Latest booking date', null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='party_booking_count',
+            field=models.IntegerField(default=0, help_text='Party bookings'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Sum of booking amounts', max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-booking_count', 'id'], name='bookings_cu_booking_86cef7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-party_booking_count', 'id'], name='bookings_cu_party_b_bda6fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-total_spent', 'id'], name='bookings_cu_total_s_192476_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-last_visit', 'id'], name='bookings_cu_last_vi_5f5bd6_idx'),
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
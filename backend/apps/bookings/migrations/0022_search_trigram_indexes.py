@@ -0,0 +1,63 @@
+# Trigram indexes for admin search (see apps/core/search.py)
+
+import logging
+
+from django.db import DatabaseError, migrations
+
+logger = logging.getLogger(__name__)
+
+# table -> searchable text columns
+TRIGRAM_COLUMNS = {
+    'bookings_booking': ('name', 'email', 'phone', 'booking_number', 'uuid'),
+    'bookings_partybooking': ('name', 'email', 'phone', 'booking_number', 'uuid'),
+    'bookings_customer': ('name', 'email', 'phone'),
+    'bookings_waiver': ('name', 'email', 'phone'),
+}
+
+
+def _index_name(table, column):
+    return f'{table}_{column}_trgm'
+
+
+def create_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    try:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as e:
+        # Needs a privileged role; search still works without the indexes
+        logger.warning(f'pg_trgm unavailable, skipping trigram indexes: {e}')
+        return
+    quote = connection.ops.quote_name
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            # Same expression as Django's icontains SQL, so existing queries use it.
+            # CONCURRENTLY keeps the tables writable while the index builds.
+            schema_editor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(_index_name(table, column))} '
+                f'ON {quote(table)} USING gin ((UPPER(({quote(column)})::text)) gin_trgm_ops)'
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.connection.ops.quote_name
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {quote(_index_name(table, column))}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('bookings', '0021_customer_lifetime_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
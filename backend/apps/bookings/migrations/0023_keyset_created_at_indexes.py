@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0022_search_trigram_indexes'),
+        ('shop', '0003_add_min_hours_before_slot'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_created_7d6386_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='bookings_cu_created_4c11c6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='partybooking',
+            name='bookings_pa_created_fe0d07_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='waiver',
+            name='bookings_wa_created_7f2027_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['-created_at', 'id'], name='bookings_bo_created_5c6a1b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-created_at', 'id'], name='bookings_cu_created_55fabd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partybooking',
+            index=models.Index(fields=['-created_at', 'id'], name='bookings_pa_created_e40a4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waiver',
+            index=models.Index(fields=['-created_at', 'id'], name='bookings_wa_created_61db12_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0023_keyset_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slothold',
+            name='previous_booking_status',
+            field=models.CharField(blank=True, default='', help_text='Booking status before the sweeper cancelled it, restored if the places are won back', max_length=20),
+        ),
+    ]
@@ -1,20 +1,34 @@
-from django.db import models
+from django.db import models, transaction, connection
+from django.db.models import F
 from apps.shop.models import Voucher
 import uuid
-from datetime import datetime
+from datetime import datetime, date as date_cls, time as time_cls
 
 class Customer(models.Model):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=50, null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
+
+    # Lifetime stats over non-cancelled bookings, kept current by signals
+    # (see customers.refresh_customer_stats)
+    booking_count = models.IntegerField(default=0, help_text="Session bookings")
+    party_booking_count = models.IntegerField(default=0, help_text="Party bookings")
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Sum of booking amounts")
+    last_visit = models.DateField(null=True, blank=True, help_text="Latest booking date")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['email']),
-            models.Index(fields=['-created_at']),  # For sorting by newest
+            models.Index(fields=['-created_at', 'id']),  # Newest first, and keyset pages
+            # For sorting the customer list by lifetime stats
+            models.Index(fields=['-booking_count', 'id']),
+            models.Index(fields=['-party_booking_count', 'id']),
+            models.Index(fields=['-total_spent', 'id']),
+            models.Index(fields=['-last_visit', 'id']),
         ]
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
@@ -22,6 +36,58 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
 
+class BookingNumberSequence(models.Model):
+    """
+    Per-day counter used to hand out booking numbers before the booking row is inserted.
+    One row per (prefix, date), e.g. ('NIP', 2026-01-15) -> last_value 42.
+    """
+    prefix = models.CharField(max_length=20)
+    date = models.DateField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'date'], name='unique_booking_number_sequence'),
+        ]
+        verbose_name = 'Booking Number Sequence'
+        verbose_name_plural = 'Booking Number Sequences'
+
+    def __str__(self):
+        return f"{self.prefix}-{self.date:%Y%m%d}: {self.last_value}"
+
+    @classmethod
+    def next_value(cls, prefix, day):
+        """
+        Atomically allocate the next number for (prefix, day).
+
+        On PostgreSQL this is a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING,
+        so concurrent workers never get the same value. Other databases lock the row.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {cls._meta.db_table} (prefix, date, last_value)
+                    VALUES (%s, %s, 1)
+                    ON CONFLICT (prefix, date)
+                    DO UPDATE SET last_value = {cls._meta.db_table}.last_value + 1
+                    RETURNING last_value
+                    """,
+                    [prefix, day]
+                )
+                return cursor.fetchone()[0]
+
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(prefix=prefix, date=day)
+            cls.objects.filter(pk=sequence.pk).update(last_value=F('last_value') + 1)
+            return sequence.last_value + 1
+
+
+def format_booking_number(prefix, day, value):
+    """PREFIX-YYYYMMDD-XXXX"""
+    return f"{prefix}-{day:%Y%m%d}-{str(value).zfill(4)}"
+
+
 class Booking(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     STATUS_CHOICES = [
@@ -89,7 +155,7 @@ class Booking(models.Model):
             models.Index(fields=['uuid']),  # For ticket retrieval
             models.Index(fields=['booking_status']),  # For filtering by status
             models.Index(fields=['payment_status']),  # For payment tracking
-            models.Index(fields=['-created_at']),  # For sorting by newest
+            models.Index(fields=['-created_at', 'id']),  # Newest first, and keyset pages
             models.Index(fields=['customer']),  # Foreign key lookup
         ]
         ordering = ['-created_at']
@@ -110,26 +176,53 @@ class Booking(models.Model):
         return self.booking_number or f"NIP-TEMP-{self.id}"
     
     def generate_booking_number(self):
-        """Generate unique booking number: NIP-YYYYMMDD-XXXX"""
-        date = datetime.now()
-        year = date.year
-        month = str(date.month).zfill(2)
-        day = str(date.day).zfill(2)
-        
-        # Use booking ID for uniqueness instead of random number
-        # This ensures no collisions
-        booking_id = str(self.id).zfill(4)
-        
-        return f"NIP-{year}{month}{day}-{booking_id}"
-    
+        """Generate unique booking number: NIP-YYYYMMDD-XXXX (booking date + per-day sequence)"""
+        day = self.date or datetime.now().date()
+        if isinstance(day, str):
+            day = date_cls.fromisoformat(day)
+        return format_booking_number('NIP', day, BookingNumberSequence.next_value('NIP', day))
+    
+    # Fields that decide which slot a booking occupies and how much of it
+    SLOT_FIELDS = ('date', 'time', 'adults', 'kids', 'spectators', 'status', 'booking_status')
+
+    # Fields (attnames) the customer's lifetime stats depend on
+    CUSTOMER_STATS_FIELDS = ('customer_id', 'amount', 'date', 'status', 'booking_status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        deferred = instance.get_deferred_fields()
+        # Remember the slot usage as loaded so the availability signals can apply deltas
+        if not deferred.intersection(cls.SLOT_FIELDS):
+            instance._slot_usage = instance.slot_usage()
+        # Likewise for customer stats, so unrelated saves skip the refresh
+        if not deferred.intersection(cls.CUSTOMER_STATS_FIELDS):
+            instance._customer_stats_key = instance.customer_stats_key()
+        return instance
+
+    def customer_stats_key(self):
+        return tuple(getattr(self, field) for field in self.CUSTOMER_STATS_FIELDS)
+
+    def slot_usage(self):
+        """
+        Return (date, time, adults, kids, spectators) this booking holds in its slot,
+        or None when it does not count towards capacity (cancelled / no slot).
+        """
+        if self.booking_status == 'CANCELLED' or self.status == 'CANCELLED':
+            return None
+        if not self.date or not self.time:
+            return None
+        slot_date = date_cls.fromisoformat(self.date) if isinstance(self.date, str) else self.date
+        slot_time = time_cls.fromisoformat(self.time) if isinstance(self.time, str) else self.time
+        return (slot_date, slot_time, self.adults or 0, self.kids or 0, self.spectators or 0)
+
     def save(self, *args, **kwargs):
-        # Generate booking number on first save
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        if is_new and not self.booking_number:
-            self.booking_number = self.generate_booking_number()
-            super().save(update_fields=['booking_number'])
+        # Slot counters are maintained by signals, keep them in the same transaction as the row
+        with transaction.atomic():
+            # Allocate the booking number before the INSERT so creation is a single write
+            if not self.booking_number and not kwargs.get('update_fields'):
+                self.booking_number = self.generate_booking_number()
+            super().save(*args, **kwargs)
 
 class PartyBooking(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -193,7 +286,7 @@ class PartyBooking(models.Model):
             models.Index(fields=['phone']),  # For global search
             models.Index(fields=['uuid']),  # For ticket retrieval
             models.Index(fields=['status']),  # For filtering by status
-            models.Index(fields=['-created_at']),  # For sorting by newest
+            models.Index(fields=['-created_at', 'id']),  # Newest first, and keyset pages
             models.Index(fields=['customer']),  # Foreign key lookup
         ]
         ordering = ['-created_at']
@@ -213,26 +306,35 @@ class PartyBooking(models.Model):
         """Canonical booking reference for display and search"""
         return self.booking_number or f"NIPARTY-TEMP-{self.id}"
     
+    # Fields (attnames) the customer's lifetime stats depend on
+    CUSTOMER_STATS_FIELDS = ('customer_id', 'amount', 'date', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stats inputs as loaded, so unrelated saves skip the customer refresh
+        if not instance.get_deferred_fields().intersection(cls.CUSTOMER_STATS_FIELDS):
+            instance._customer_stats_key = instance.customer_stats_key()
+        return instance
+
+    def customer_stats_key(self):
+        return tuple(getattr(self, field) for field in self.CUSTOMER_STATS_FIELDS)
+
     def generate_booking_number(self):
-        """Generate unique booking number: NIPARTY-YYYYMMDD-XXXX"""
-        date = datetime.now()
-        year = date.year
-        month = str(date.month).zfill(2)
-        day = str(date.day).zfill(2)
-        
-        # Use booking ID for uniqueness
-        booking_id = str(self.id).zfill(4)
-        
-        return f"NIPARTY-{year}{month}{day}-{booking_id}"
+        """Generate unique booking number: NIPARTY-YYYYMMDD-XXXX (party date + per-day sequence)"""
+        day = self.date or datetime.now().date()
+        if isinstance(day, str):
+            day = date_cls.fromisoformat(day)
+        return format_booking_number('NIPARTY', day, BookingNumberSequence.next_value('NIPARTY', day))
     
     def save(self, *args, **kwargs):
-        # Generate booking number on first save
-        is_new = self.pk is None
+        # Allocate the booking number before the INSERT so creation is a single write
+        if not self.booking_number and not kwargs.get('update_fields'):
+            with transaction.atomic():
+                self.booking_number = self.generate_booking_number()
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
-        
-        if is_new and not self.booking_number:
-            self.booking_number = self.generate_booking_number()
-            super().save(update_fields=['booking_number'])
 
 class Waiver(models.Model):
     PARTICIPANT_TYPE_CHOICES = [
@@ -276,7 +378,7 @@ class Waiver(models.Model):
             models.Index(fields=['party_booking']),  # Foreign key lookup
             models.Index(fields=['customer']),  # Foreign key lookup
             models.Index(fields=['participant_type']),  # For filtering
-            models.Index(fields=['-created_at']),  # For sorting by newest
+            models.Index(fields=['-created_at', 'id']),  # Newest first, and keyset pages
         ]
         ordering = ['-created_at']
         verbose_name = 'Waiver'
@@ -333,6 +435,78 @@ class BookingBlock(models.Model):
     def __str__(self):
         return f"[{self.type}] {self.reason} ({self.start_date.date()} - {self.end_date.date()})"
 
+class SlotAvailability(models.Model):
+    """
+    Running head-count for a session slot (date + start time).
+    Kept in step with Booking rows by signals (see apps/bookings/availability.py),
+    so availability is answered from this table without scanning bookings.
+    """
+    date = models.DateField()
+    time = models.TimeField()
+    adults = models.IntegerField(default=0)
+    kids = models.IntegerField(default=0)
+    spectators = models.IntegerField(default=0)
+    booking_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also serves as the (date, time) index for range lookups
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_slot_availability'),
+        ]
+        ordering = ['date', 'time']
+        verbose_name = 'Slot Availability'
+        verbose_name_plural = 'Slot Availability'
+
+    def __str__(self):
+        return f"Slot {self.date} {self.time} ({self.participants} participants)"
+
+    @property
+    def participants(self):
+        """Jumpers occupying the slot (spectators do not use capacity)"""
+        return self.adults + self.kids
+
+class SlotHold(models.Model):
+    """
+    Short-lived reservation of a session booking's places while the customer pays.
+    Created with the booking (slot row locked), converted on payment success and
+    expired by the sweeper, which cancels the unpaid booking and frees its places.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('CONVERTED', 'Converted'),
+        ('EXPIRED', 'Expired'),
+        ('RELEASED', 'Released'),
+    ]
+
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='slot_hold')
+    date = models.DateField()
+    time = models.TimeField()
+    adults = models.IntegerField(default=0)
+    kids = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
+    expires_at = models.DateTimeField()
+    previous_booking_status = models.CharField(
+        max_length=20, blank=True, default='',
+        help_text="Booking status before the sweeper cancelled it, restored if the places are won back"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),  # For the expiry sweeper
+            models.Index(fields=['date', 'time']),  # Per-slot sweeps
+        ]
+        ordering = ['-created_at']
+        verbose_name = 'Slot Hold'
+        verbose_name_plural = 'Slot Holds'
+
+    def __str__(self):
+        return f"Hold for Booking {self.booking_id} ({self.status} until {self.expires_at})"
+
 class SessionBookingHistory(models.Model):
     """
     Stores session bookings that were paid but not saved due to system errors.
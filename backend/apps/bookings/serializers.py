@@ -1,16 +1,18 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
 from .models import Customer, Booking, Waiver, Transaction, BookingBlock, PartyBooking, SessionBookingHistory, PartyBookingHistory
+from . import availability
+from .customers import resolve_customer
 # from apps.shop.serializers import VoucherSerializer
 
 class CustomerSerializer(serializers.ModelSerializer):
-    booking_count = serializers.IntegerField(read_only=True)
-    total_spent = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    last_visit = serializers.DateField(read_only=True)
-
     class Meta:
         model = Customer
         fields = ['id', 'name', 'email', 'phone', 'notes', 'created_at', 'updated_at', 
-                  'booking_count', 'total_spent', 'last_visit']
+                  'booking_count', 'party_booking_count', 'total_spent', 'last_visit']
+        # Maintained by booking signals
+        read_only_fields = ['booking_count', 'party_booking_count', 'total_spent', 'last_visit']
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -107,9 +109,20 @@ class BookingSerializer(serializers.ModelSerializer):
                   'created_at', 'updated_at']
         read_only_fields = ['booking_reference']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the serializer reads in a fixed number of queries"""
+        return queryset.select_related('customer').prefetch_related('transactions').annotate(
+            has_waivers=Exists(Waiver.objects.filter(booking=OuterRef('pk')))
+        )
+
     def get_waiver_status(self, obj):
         # Dynamically check if any waiver is linked to this booking
-        if obj.waivers.exists():
+        # (annotated by setup_eager_loading, single instances fall back to a query)
+        has_waivers = getattr(obj, 'has_waivers', None)
+        if has_waivers is None:
+            has_waivers = obj.waivers.exists()
+        if has_waivers:
             return 'SIGNED'
         return obj.waiver_status or 'PENDING'
         
@@ -131,43 +144,45 @@ class BookingSerializer(serializers.ModelSerializer):
             if blocks.exists():
                 block = blocks.first()
                 raise serializers.ValidationError(f"This date is not available due to {block.reason}")
+        
+        # Slot capacity is checked in create(), under the slot's row lock
                 
         return data
     
     def create(self, validated_data):
         """Override create to automatically create/link customer"""
-        # Extract customer data
-        email = validated_data.get('email')
-        name = validated_data.get('name')
-        phone = validated_data.get('phone')
-        
-        # Get or create customer by email
-        if email:
-            customer, created = Customer.objects.get_or_create(
-                email=email,
-                defaults={
-                    'name': name,
-                    'phone': phone
-                }
-            )
-            
-            # Update customer info if changed
-            if not created:
-                updated = False
-                if customer.name != name:
-                    customer.name = name
-                    updated = True
-                if phone and customer.phone != phone:
-                    customer.phone = phone
-                    updated = True
-                if updated:
-                    customer.save()
-            
-            # Link customer to booking
+        # Get or create customer by email (single upsert, memoized per request)
+        customer = resolve_customer(
+            validated_data.get('email'),
+            validated_data.get('name'),
+            validated_data.get('phone'),
+            request=self.context.get('request'),
+        )
+        if customer:
             validated_data['customer'] = customer
         
-        # Create booking with linked customer
-        booking = super().create(validated_data)
+        # Reserve the slot under its row lock and create the booking in the same
+        # transaction, so two checkouts cannot both take the last places
+        with transaction.atomic():
+            slot_date = validated_data.get('date')
+            slot_time = validated_data.get('time')
+            if slot_date and slot_time:
+                participants = (validated_data.get('adults') or 0) + (validated_data.get('kids') or 0)
+                try:
+                    availability.reserve_slot(slot_date, slot_time, participants)
+                except availability.SlotUnavailable as e:
+                    raise serializers.ValidationError(str(e))
+
+            # Create booking with linked customer
+            booking = super().create(validated_data)
+
+            # Unpaid public checkouts only keep their places for the hold TTL;
+            # staff bookings (e.g. the admin manual booking form) are not held,
+            # and nothing is held while slot capacity is not enforced
+            request = self.context.get('request')
+            is_staff = bool(request and request.user and request.user.is_staff)
+            if booking.payment_status == 'PENDING' and not is_staff and availability.get_slot_capacity():
+                availability.place_hold(booking)
         return booking
 
 class PartyBookingSerializer(serializers.ModelSerializer):
@@ -205,8 +220,18 @@ class PartyBookingSerializer(serializers.ModelSerializer):
             return 'PAID'
         return 'PENDING'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotate waiver presence so listing does not query per row"""
+        return queryset.annotate(
+            has_waivers=Exists(Waiver.objects.filter(party_booking=OuterRef('pk')))
+        )
+
     def get_waiver_status(self, obj):
-        if obj.waivers.exists():
+        has_waivers = getattr(obj, 'has_waivers', None)
+        if has_waivers is None:
+            has_waivers = obj.waivers.exists()
+        if has_waivers:
             return 'SIGNED'
         return 'SIGNED' if obj.waiver_signed else 'PENDING'
 
@@ -232,34 +257,14 @@ class PartyBookingSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """Override create to automatically create/link customer"""
-        # Extract customer data
-        email = validated_data.get('email')
-        name = validated_data.get('name')
-        phone = validated_data.get('phone')
-        
-        # Get or create customer by email
-        if email:
-            customer, created = Customer.objects.get_or_create(
-                email=email,
-                defaults={
-                    'name': name,
-                    'phone': phone
-                }
-            )
-            
-            # Update customer info if changed
-            if not created:
-                updated = False
-                if customer.name != name:
-                    customer.name = name
-                    updated = True
-                if phone and customer.phone != phone:
-                    customer.phone = phone
-                    updated = True
-                if updated:
-                    customer.save()
-            
-            # Link customer to booking
+        # Get or create customer by email (single upsert, memoized per request)
+        customer = resolve_customer(
+            validated_data.get('email'),
+            validated_data.get('name'),
+            validated_data.get('phone'),
+            request=self.context.get('request'),
+        )
+        if customer:
             validated_data['customer'] = customer
         
         # Create party booking with linked customer
@@ -1,55 +1,101 @@
 """
-Django signals to automatically create Customer records when bookings are created.
+Django signals to automatically create Customer records when bookings are created,
+to keep slot availability counters in step with session bookings, and to keep
+customer lifetime stats current.
 """
 
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Booking, PartyBooking, Customer
+from .models import Booking, PartyBooking
+from . import availability
+from .customers import resolve_customer, refresh_customer_stats
 
 @receiver(pre_save, sender=Booking)
 def create_customer_for_booking(sender, instance, **kwargs):
     """
     Automatically create or link a Customer record when a Booking is created.
     """
-    if not instance.customer and instance.email:
-        # Try to find existing customer by email
-        customer, created = Customer.objects.get_or_create(
-            email=instance.email,
-            defaults={
-                'name': instance.name,
-                'phone': instance.phone,
-            }
-        )
-        
-        # Update customer info if it was just created or if fields are empty
-        if created or not customer.name:
-            customer.name = instance.name
-            customer.phone = instance.phone
-            customer.save()
-        
-        # Link the booking to the customer
-        instance.customer = customer
+    if not instance.customer_id and instance.email:
+        # Serializers and views link the customer themselves; this covers other saves
+        instance.customer = resolve_customer(instance.email, instance.name, instance.phone, overwrite=False)
 
 @receiver(pre_save, sender=PartyBooking)
 def create_customer_for_party_booking(sender, instance, **kwargs):
     """
     Automatically create or link a Customer record when a PartyBooking is created.
     """
-    if not instance.customer and instance.email:
-        # Try to find existing customer by email
-        customer, created = Customer.objects.get_or_create(
-            email=instance.email,
-            defaults={
-                'name': instance.name,
-                'phone': instance.phone,
-            }
-        )
-        
-        # Update customer info if it was just created or if fields are empty
-        if created or not customer.name:
-            customer.name = instance.name
-            customer.phone = instance.phone
-            customer.save()
-        
-        # Link the booking to the customer
-        instance.customer = customer
+    if not instance.customer_id and instance.email:
+        # Serializers and views link the customer themselves; this covers other saves
+        instance.customer = resolve_customer(instance.email, instance.name, instance.phone, overwrite=False)
+
+
+@receiver(pre_save, sender=Booking)
+def capture_booking_slot_usage(sender, instance, **kwargs):
+    """
+    Make sure the slot the booking held before this save is known.
+    Instances loaded normally already carry it (Booking.from_db); this only
+    queries for instances built by hand or loaded with deferred slot fields.
+    """
+    if hasattr(instance, '_slot_usage'):
+        return
+    if instance._state.adding:
+        instance._slot_usage = None
+        return
+    previous = Booking.objects.filter(pk=instance.pk).only(*Booking.SLOT_FIELDS).first()
+    instance._slot_usage = previous.slot_usage() if previous else None
+
+
+@receiver(post_save, sender=Booking)
+def update_slot_availability(sender, instance, update_fields=None, **kwargs):
+    """Apply the booking's head-count change (create / cancel / move) to slot counters."""
+    if update_fields is not None and not set(update_fields).intersection(Booking.SLOT_FIELDS):
+        return
+    new_usage = instance.slot_usage()
+    availability.sync_booking_slot(getattr(instance, '_slot_usage', None), new_usage)
+    instance._slot_usage = new_usage
+
+
+@receiver(post_delete, sender=Booking)
+def release_slot_availability(sender, instance, **kwargs):
+    """Give a deleted booking's head-count back to its slot."""
+    availability.sync_booking_slot(getattr(instance, '_slot_usage', None), None)
+    instance._slot_usage = None
+
+
+def capture_customer_stats(sender, instance, **kwargs):
+    """
+    Make sure the stats inputs before this save are known. Instances loaded
+    normally already carry them (from_db); this only queries for instances
+    built by hand or loaded with deferred fields.
+    """
+    if hasattr(instance, '_customer_stats_key'):
+        return
+    if instance._state.adding:
+        instance._customer_stats_key = None
+        return
+    previous = sender.objects.filter(pk=instance.pk).only(*sender.CUSTOMER_STATS_FIELDS).first()
+    instance._customer_stats_key = previous.customer_stats_key() if previous else None
+
+
+def update_customer_stats(sender, instance, update_fields=None, **kwargs):
+    """Refresh the stats of the booking's customer (and the previous one after a relink)."""
+    if update_fields is not None:
+        tracked = set(sender.CUSTOMER_STATS_FIELDS) | {'customer'}
+        if not tracked.intersection(update_fields):
+            return
+    previous = getattr(instance, '_customer_stats_key', None)
+    current = instance.customer_stats_key()
+    if previous != current:
+        refresh_customer_stats(previous[0] if previous else None, instance.customer_id)
+    instance._customer_stats_key = current
+
+
+def remove_customer_stats(sender, instance, **kwargs):
+    """Take a deleted booking out of its customer's stats."""
+    refresh_customer_stats(instance.customer_id)
+
+
+for model in (Booking, PartyBooking):
+    pre_save.connect(capture_customer_stats, sender=model, dispatch_uid=f'capture_customer_stats_{model.__name__}')
+    post_save.connect(update_customer_stats, sender=model, dispatch_uid=f'update_customer_stats_{model.__name__}')
+    post_delete.connect(remove_customer_stats, sender=model, dispatch_uid=f'remove_customer_stats_{model.__name__}')
@@ -0,0 +1,119 @@
+"""
+Tests for the slot availability engine
+"""
+import pytest
+from datetime import date, time, timedelta
+from django.test import override_settings
+from rest_framework.test import APIClient
+from apps.bookings.models import Booking, SlotAvailability
+from apps.bookings.availability import rebuild_slot_availability, remaining_capacity
+
+
+SLOT_DATE = date.today() + timedelta(days=3)
+
+
+def make_booking(**kwargs):
+    data = {
+        'name': 'Test User',
+        'email': 'test@example.com',
+        'phone': '1234567890',
+        'date': SLOT_DATE,
+        'time': time(14, 0),
+        'duration': 60,
+        'adults': 2,
+        'kids': 1,
+        'spectators': 1,
+        'amount': 1000.00,
+    }
+    data.update(kwargs)
+    return Booking.objects.create(**data)
+
+
+def get_slot(slot_date=SLOT_DATE, slot_time=time(14, 0)):
+    return SlotAvailability.objects.get(date=slot_date, time=slot_time)
+
+
+@pytest.mark.django_db
+class TestSlotCounters:
+    """Counters follow booking create / cancel / move / delete"""
+
+    def test_create_increments_slot(self):
+        make_booking()
+        make_booking(adults=1, kids=0, spectators=0)
+        slot = get_slot()
+        assert (slot.adults, slot.kids, slot.spectators, slot.booking_count) == (3, 1, 1, 2)
+
+    def test_cancel_releases_slot(self):
+        booking = make_booking()
+        booking.booking_status = 'CANCELLED'
+        booking.save()
+        slot = get_slot()
+        assert slot.participants == 0
+        assert slot.booking_count == 0
+
+    def test_move_between_slots(self):
+        booking = Booking.objects.get(pk=make_booking().pk)
+        booking.time = time(16, 0)
+        booking.adults = 4
+        booking.save()
+        assert get_slot().participants == 0
+        moved = get_slot(slot_time=time(16, 0))
+        assert (moved.adults, moved.kids, moved.booking_count) == (4, 1, 1)
+
+    def test_delete_releases_slot(self):
+        make_booking().delete()
+        assert get_slot().booking_count == 0
+
+    def test_rebuild_matches_bookings(self):
+        make_booking()
+        make_booking(booking_status='CANCELLED')
+        SlotAvailability.objects.all().delete()
+        assert rebuild_slot_availability() == 1
+        slot = get_slot()
+        assert (slot.adults, slot.kids, slot.booking_count) == (2, 1, 1)
+
+    @override_settings(SESSION_SLOT_CAPACITY=5)
+    def test_remaining_capacity(self):
+        make_booking()
+        assert remaining_capacity(SLOT_DATE, time(14, 0)) == 2
+        assert remaining_capacity(SLOT_DATE, time(18, 0)) == 5
+
+
+@pytest.mark.django_db
+class TestAvailabilityEndpoint:
+    """Public availability endpoint"""
+
+    def test_lists_booked_slots_in_range(self):
+        make_booking()
+        make_booking(date=SLOT_DATE + timedelta(days=60))
+        client = APIClient()
+        response = client.get('/api/v1/bookings/availability/', {
+            'from': SLOT_DATE.isoformat(),
+            'to': (SLOT_DATE + timedelta(days=30)).isoformat(),
+        })
+        assert response.status_code == 200
+        assert len(response.data['slots']) == 1
+        assert response.data['slots'][0]['participants'] == 3
+
+    def test_rejects_invalid_range(self):
+        client = APIClient()
+        response = client.get('/api/v1/bookings/availability/', {'from': '2026-02-10', 'to': '2026-01-01'})
+        assert response.status_code == 400
+
+    @override_settings(SESSION_SLOT_CAPACITY=4)
+    def test_booking_create_rejected_when_slot_full(self):
+        make_booking()
+        client = APIClient()
+        response = client.post('/api/v1/bookings/bookings/', {
+            'name': 'Late Comer',
+            'email': 'late@example.com',
+            'phone': '999',
+            'date': SLOT_DATE.isoformat(),
+            'time': '14:00',
+            'duration': 60,
+            'adults': 2,
+            'kids': 0,
+            'amount': '1798.00',
+        }, format='json')
+        assert response.status_code == 400
+        assert get_slot().booking_count == 1
@@ -0,0 +1,58 @@
+"""
+Tests for booking number allocation
+"""
+import pytest
+from datetime import date, time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from apps.bookings.models import Booking, PartyBooking, BookingNumberSequence
+
+
+def make_booking(**kwargs):
+    data = {
+        'name': 'Test User',
+        'email': 'test@example.com',
+        'phone': '1234567890',
+        'date': date(2026, 3, 14),
+        'time': time(14, 0),
+        'duration': 60,
+        'adults': 1,
+        'kids': 0,
+        'amount': 899.00,
+    }
+    data.update(kwargs)
+    return Booking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestBookingNumbers:
+
+    def test_number_uses_booking_date_and_daily_sequence(self):
+        first = make_booking()
+        second = make_booking()
+        other_day = make_booking(date=date(2026, 3, 15))
+        assert first.booking_number == 'NIP-20260314-0001'
+        assert second.booking_number == 'NIP-20260314-0002'
+        assert other_day.booking_number == 'NIP-20260315-0001'
+
+    def test_number_assigned_without_follow_up_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            booking = make_booking()
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "bookings_booking"')]
+        assert updates == []
+        assert Booking.objects.get(pk=booking.pk).booking_number == booking.booking_number
+
+    def test_party_bookings_have_own_sequence(self):
+        make_booking()
+        party = PartyBooking.objects.create(
+            name='Party Host', email='party@example.com', phone='123',
+            date=date(2026, 3, 14), time=time(12, 0), kids=10, adults=2, amount=5000,
+        )
+        assert party.booking_number == 'NIPARTY-20260314-0001'
+        assert BookingNumberSequence.objects.get(prefix='NIP', date=date(2026, 3, 14)).last_value == 1
+
+    def test_existing_number_is_kept(self):
+        booking = make_booking(booking_number='NIP-20260314-9999')
+        booking.adults = 2
+        booking.save()
+        assert Booking.objects.get(pk=booking.pk).booking_number == 'NIP-20260314-9999'
@@ -0,0 +1,108 @@
+"""
+Tests for stored customer lifetime stats
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from apps.bookings.models import Booking, Customer, PartyBooking
+from apps.core.tests.query_budget import capture_queries, staff_client
+
+
+def make_booking(email='guest@example.com', days_ahead=3, **kwargs):
+    data = dict(
+        name='Guest', email=email, phone='5550000',
+        date=timezone.localdate() + timedelta(days=days_ahead), time=time(11, 0),
+        duration=60, adults=2, kids=0, amount=Decimal('1000.00'),
+    )
+    data.update(kwargs)
+    return Booking.objects.create(**data)
+
+
+def make_party(email='guest@example.com', days_ahead=10, **kwargs):
+    data = dict(
+        name='Guest', email=email, phone='5550000',
+        date=timezone.localdate() + timedelta(days=days_ahead), time=time(12, 0),
+        package_name='Ninja', kids=8, amount=Decimal('5000.00'),
+    )
+    data.update(kwargs)
+    return PartyBooking.objects.create(**data)
+
+
+def stats(email='guest@example.com'):
+    customer = Customer.objects.get(email=email)
+    return customer.booking_count, customer.party_booking_count, customer.total_spent, customer.last_visit
+
+
+@pytest.mark.django_db
+class TestCustomerStats:
+
+    def test_kept_current_by_signals(self):
+        today = timezone.localdate()
+        booking = make_booking()
+        make_booking(days_ahead=5)
+        party = make_party()
+        assert stats() == (2, 1, Decimal('7000.00'), today + timedelta(days=10))
+
+        party.status = 'CANCELLED'
+        party.save()
+        assert stats() == (2, 0, Decimal('2000.00'), today + timedelta(days=5))
+
+        booking.amount = Decimal('1500.00')
+        booking.save(update_fields=['amount'])
+        assert stats()[2] == Decimal('2500.00')
+
+        booking.delete()
+        assert stats() == (1, 0, Decimal('1000.00'), today + timedelta(days=5))
+
+    def test_relinking_updates_both_customers(self):
+        booking = make_booking()
+        make_booking(email='other@example.com')
+        booking.customer = Customer.objects.get(email='other@example.com')
+        booking.save()
+        assert stats()[:2] == (0, 0)
+        assert stats()[3] is None
+        assert stats('other@example.com')[0] == 2
+
+    def test_unrelated_save_skips_refresh(self):
+        booking = make_booking()
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.arrived = True
+        _, queries = capture_queries(booking.save)
+        assert not [q for q in queries if 'UPDATE "bookings_customer"' in q]
+
+    def test_recompute_command(self):
+        booking = make_booking()
+        make_party()
+        Customer.objects.update(booking_count=0, party_booking_count=0, total_spent=0, last_visit=None)
+        Booking.objects.filter(pk=booking.pk).update(amount=Decimal('10.00'))  # bypasses signals
+        call_command('recompute_customer_stats')
+        assert stats() == (1, 1, Decimal('5010.00'), timezone.localdate() + timedelta(days=10))
+
+
+@pytest.mark.django_db
+class TestCustomerList:
+
+    def test_ordering_by_stats(self):
+        make_booking(email='a@example.com', amount=Decimal('100.00'))
+        make_booking(email='b@example.com', amount=Decimal('900.00'))
+        make_party(email='c@example.com')
+        client = staff_client()
+
+        response = client.get('/api/v1/bookings/customers/', {'ordering': '-total_spent'})
+        assert [row['email'] for row in response.data] == ['c@example.com', 'b@example.com', 'a@example.com']
+        assert response.data[0]['party_booking_count'] == 1
+
+        response = client.get('/api/v1/bookings/customers/', {'ordering': 'total_spent', 'paginate': 'cursor', 'page_size': 2})
+        assert [row['email'] for row in response.data['results']] == ['a@example.com', 'b@example.com']
+        response = client.get(response.data['next'])
+        assert [row['email'] for row in response.data['results']] == ['c@example.com']
+
+    def test_invalid_ordering(self):
+        client = staff_client()
+        assert client.get('/api/v1/bookings/customers/', {'ordering': 'email'}).status_code == 400
+        assert client.get('/api/v1/bookings/customers/', {'ordering': 'last_visit', 'paginate': 'cursor'}).status_code == 400
+        assert client.get('/api/v1/bookings/customers/', {'ordering': '-last_visit'}).status_code == 200
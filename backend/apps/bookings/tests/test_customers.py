@@ -0,0 +1,186 @@
+"""
+Tests for customer resolution on booking create
+"""
+import pytest
+from datetime import date, timedelta
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.bookings.models import Booking, Customer, PartyBooking
+from apps.bookings import customers
+from apps.bookings.customers import resolve_customer
+from apps.core.models import DailyMetrics
+
+
+BOOKING_DATE = date.today() + timedelta(days=7)
+
+# Booking create (savepoints excluded): booking blocks check, customer upsert
+# (2 on SQLite), slot lock (3), booking number (3), booking insert, notification,
+# slot counter update (2), hold (2), daily metrics upserts for the customer and
+# the booking plus the repeat-customer count, the customer stats refresh, the
+# search document upsert and the response's waivers/transactions.
+BOOKING_CREATE_QUERY_BUDGET = 22
+
+
+def booking_payload(**kwargs):
+    data = {
+        'name': 'Repeat Customer',
+        'email': 'repeat@example.com',
+        'phone': '5550001',
+        'date': BOOKING_DATE.isoformat(),
+        'time': '15:00',
+        'duration': 60,
+        'adults': 1,
+        'kids': 0,
+        'amount': '899.00',
+    }
+    data.update(kwargs)
+    return data
+
+
+@pytest.mark.django_db
+class TestResolveCustomer:
+
+    def test_creates_then_reuses_customer(self):
+        first = resolve_customer('a@example.com', 'Alice', '1')
+        second = resolve_customer('a@example.com', 'Alice', '1')
+        assert first.pk == second.pk
+        assert Customer.objects.count() == 1
+
+    def test_overwrite_updates_details(self):
+        resolve_customer('a@example.com', 'Alice', '1')
+        customer = resolve_customer('a@example.com', 'Alice Smith', '')
+        customer.refresh_from_db()
+        assert (customer.name, customer.phone) == ('Alice Smith', '1')
+
+    def test_fill_blanks_keeps_existing_details(self):
+        resolve_customer('a@example.com', 'Alice', '')
+        customer = resolve_customer('a@example.com', 'Old Name', '2', overwrite=False)
+        customer.refresh_from_db()
+        assert (customer.name, customer.phone) == ('Alice', '2')
+
+    def test_request_memo_skips_queries(self):
+        class FakeRequest:
+            pass
+        request = FakeRequest()
+        resolve_customer('a@example.com', 'Alice', '1', request=request)
+        with CaptureQueriesContext(connection) as ctx:
+            resolve_customer('a@example.com', 'Alice', '1', request=request)
+        assert len(ctx.captured_queries) == 0
+
+
+class FakeUpsertCursor:
+    """Cursor answering the PostgreSQL upsert with one RETURNING row."""
+
+    def __init__(self, row):
+        self.row = row
+        self.sql = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.sql = sql
+
+    def fetchone(self):
+        return self.row
+
+
+def upsert_on_postgresql(inserted):
+    now = timezone.now()
+    values = {'id': 42, 'name': 'Alice', 'email': 'a@example.com', 'phone': '1', 'booking_count': 0,
+              'party_booking_count': 0, 'total_spent': 0, 'created_at': now, 'updated_at': now}
+    row = tuple(values.get(field.attname) for field in Customer._meta.concrete_fields) + (inserted,)
+    cursor = FakeUpsertCursor(row)
+    fake_connection = mock.Mock(vendor='postgresql', alias=connection.alias, ops=connection.ops)
+    fake_connection.cursor.return_value = cursor
+    with mock.patch.object(customers, 'connection', fake_connection):
+        customer = resolve_customer('a@example.com', 'Alice', '1')
+    return customer, cursor
+
+
+@pytest.mark.django_db
+class TestPostgresqlUpsert:
+
+    def new_customers_today(self):
+        row = DailyMetrics.objects.filter(date=timezone.localdate()).first()
+        return row.new_customers if row else 0
+
+    def test_created_customer_counts_in_metrics(self):
+        customer, cursor = upsert_on_postgresql(inserted=True)
+        assert 'ON CONFLICT (email)' in cursor.sql
+        assert (customer.pk, customer.email) == (42, 'a@example.com')
+        assert self.new_customers_today() == 1
+
+    def test_updated_customer_is_not_counted_again(self):
+        upsert_on_postgresql(inserted=False)
+        assert self.new_customers_today() == 0
+
+
+@pytest.mark.django_db
+class TestBookingCreateQueries:
+
+    def test_session_booking_links_customer_within_budget(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json')
+        assert response.status_code == 201
+        queries = [q['sql'] for q in ctx.captured_queries if 'SAVEPOINT' not in q['sql']]
+        assert len(queries) <= BOOKING_CREATE_QUERY_BUDGET, '\n'.join(queries)
+        # One lookup by email; the daily metrics read the refreshed booking_count by id
+        customer_selects = [q for q in queries if 'FROM "bookings_customer" WHERE "bookings_customer"."email"' in q]
+        assert len(customer_selects) <= 1, '\n'.join(customer_selects)
+
+        booking = Booking.objects.get(pk=response.data['id'])
+        assert booking.customer.email == 'repeat@example.com'
+
+    def test_existing_customer_is_updated_not_duplicated(self):
+        Customer.objects.create(name='Old', email='repeat@example.com')
+        client = APIClient()
+        response = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json')
+        assert response.status_code == 201
+        customer = Customer.objects.get(email='repeat@example.com')
+        assert customer.name == 'Repeat Customer'
+        assert Customer.objects.count() == 1
+
+    def test_party_booking_view_links_customer(self):
+        client = APIClient()
+        response = client.post('/api/v1/bookings/party-bookings/', {
+            'name': 'Party Host',
+            'email': 'repeat@example.com',
+            'phone': '5550001',
+            'date': BOOKING_DATE.isoformat(),
+            'time': '12:00',
+            'kids': 10,
+            'adults': 2,
+            'amount': 5000,
+        }, format='json')
+        assert response.status_code in (200, 201), response.data
+        party = PartyBooking.objects.get()
+        assert party.customer.email == 'repeat@example.com'
+
+    def test_party_booking_view_keeps_customer_details(self):
+        Customer.objects.create(name='Old Name', email='repeat@example.com', phone='5559999')
+        Customer.objects.create(name='', email='blank@example.com')
+        client = APIClient()
+        for email in ('repeat@example.com', 'blank@example.com'):
+            response = client.post('/api/v1/bookings/party-bookings/', {
+                'name': 'Party Host',
+                'email': email,
+                'phone': '5550001',
+                'date': BOOKING_DATE.isoformat(),
+                'time': '12:00',
+                'kids': 10,
+                'adults': 2,
+                'amount': 5000,
+            }, format='json')
+            assert response.status_code in (200, 201), response.data
+        kept = Customer.objects.get(email='repeat@example.com')
+        assert (kept.name, kept.phone) == ('Old Name', '5559999')
+        filled = Customer.objects.get(email='blank@example.com')
+        assert (filled.name, filled.phone) == ('Party Host', '5550001')
@@ -0,0 +1,178 @@
+"""
+Tests for checkout slot holds
+"""
+import pytest
+from datetime import date, time, timedelta
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.bookings.models import Booking, SlotAvailability, SlotHold
+from apps.bookings import availability
+from apps.core.tests.query_budget import staff_client
+from apps.payments.services import PaymentService
+
+
+SLOT_DATE = date.today() + timedelta(days=5)
+
+
+def post_booking(client, adults=2, email='hold@example.com', **extra):
+    return client.post('/api/v1/bookings/bookings/', {
+        **extra,
+        'name': 'Hold Tester',
+        'email': email,
+        'phone': '999',
+        'date': SLOT_DATE.isoformat(),
+        'time': '11:00',
+        'duration': 60,
+        'adults': adults,
+        'kids': 0,
+        'amount': '1798.00',
+    }, format='json')
+
+
+def get_slot():
+    return SlotAvailability.objects.get(date=SLOT_DATE, time=time(11, 0))
+
+
+def age_hold(booking):
+    SlotHold.objects.filter(booking=booking).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+
+@pytest.fixture(autouse=True)
+def slot_capacity(settings):
+    settings.SESSION_SLOT_CAPACITY = 4
+    settings.SLOT_HOLD_TTL_MINUTES = 15
+    # Many checkouts from one client; counts from other test modules share the cache
+    settings.RATE_LIMITS = {}
+
+
+@pytest.mark.django_db
+class TestSlotHolds:
+    """Unpaid checkouts hold places for a TTL"""
+
+    def test_public_booking_gets_active_hold(self):
+        response = post_booking(APIClient())
+        assert response.status_code == 201
+        hold = SlotHold.objects.get(booking_id=response.data['id'])
+        assert hold.status == 'ACTIVE'
+        assert hold.expires_at > timezone.now()
+        assert get_slot().participants == 2
+
+    def test_staff_booking_is_not_held(self):
+        response = post_booking(staff_client())
+        assert response.status_code == 201
+        assert not SlotHold.objects.filter(booking_id=response.data['id']).exists()
+        assert availability.expire_holds(now=timezone.now() + timedelta(days=1)) == 0
+        assert Booking.objects.get(pk=response.data['id']).booking_status != 'CANCELLED'
+
+    def test_no_hold_without_capacity(self, settings):
+        settings.SESSION_SLOT_CAPACITY = 0
+        response = post_booking(APIClient())
+        assert response.status_code == 201
+        assert not SlotHold.objects.filter(booking_id=response.data['id']).exists()
+        assert availability.expire_holds(now=timezone.now() + timedelta(days=1)) == 0
+        assert Booking.objects.get(pk=response.data['id']).booking_status != 'CANCELLED'
+
+    def test_expired_hold_releases_places(self):
+        response = post_booking(APIClient())
+        booking = Booking.objects.get(pk=response.data['id'])
+        age_hold(booking)
+
+        assert availability.expire_holds() == 1
+        booking.refresh_from_db()
+        assert booking.booking_status == 'CANCELLED'
+        assert SlotHold.objects.get(booking=booking).status == 'EXPIRED'
+        assert get_slot().participants == 0
+
+    def test_full_slot_sweeps_expired_holds(self):
+        client = APIClient()
+        first = Booking.objects.get(pk=post_booking(client, adults=4).data['id'])
+        assert post_booking(client, adults=2, email='other@example.com').status_code == 400
+
+        age_hold(first)
+        response = post_booking(client, adults=2, email='other@example.com')
+        assert response.status_code == 201
+        assert get_slot().participants == 2
+
+    def test_paid_booking_is_not_cancelled(self):
+        booking = Booking.objects.get(pk=post_booking(APIClient()).data['id'])
+        Booking.objects.filter(pk=booking.pk).update(payment_status='PAID')
+        age_hold(booking)
+
+        availability.expire_holds()
+        booking.refresh_from_db()
+        assert booking.booking_status == 'PENDING'
+
+    def test_payment_order_revives_expired_hold(self):
+        booking = Booking.objects.get(pk=post_booking(APIClient()).data['id'])
+        age_hold(booking)
+        availability.expire_holds()
+
+        PaymentService().create_payment_order(booking.id, 'session')
+        booking.refresh_from_db()
+        assert booking.booking_status == 'PENDING'
+        assert SlotHold.objects.get(booking=booking).status == 'ACTIVE'
+        assert get_slot().participants == 2
+
+    def test_payment_order_fails_when_places_taken(self):
+        client = APIClient()
+        booking = Booking.objects.get(pk=post_booking(client, adults=3).data['id'])
+        age_hold(booking)
+        availability.expire_holds()
+        assert post_booking(client, adults=3, email='other@example.com').status_code == 201
+
+        with pytest.raises(ValueError):
+            PaymentService().create_payment_order(booking.id, 'session')
+
+    def test_revived_hold_restores_previous_status(self):
+        response = post_booking(APIClient(), booking_status='CONFIRMED', payment_status='PENDING')
+        booking = Booking.objects.get(pk=response.data['id'])
+        assert booking.booking_status == 'CONFIRMED'
+        age_hold(booking)
+        availability.expire_holds()
+        assert SlotHold.objects.get(booking=booking).previous_booking_status == 'CONFIRMED'
+
+        PaymentService().create_payment_order(booking.id, 'session')
+        booking.refresh_from_db()
+        assert booking.booking_status == 'CONFIRMED'
+
+    def test_late_payment_reinstates_when_places_free(self):
+        booking = Booking.objects.get(pk=post_booking(APIClient()).data['id'])
+        age_hold(booking)
+        availability.expire_holds()
+
+        availability.convert_hold(Booking.objects.get(pk=booking.pk))
+        booking.refresh_from_db()
+        assert booking.booking_status == 'PENDING'
+        assert SlotHold.objects.get(booking=booking).status == 'CONVERTED'
+        assert get_slot().participants == 2
+
+    def test_late_payment_does_not_overbook(self):
+        client = APIClient()
+        booking = Booking.objects.get(pk=post_booking(client, adults=3).data['id'])
+        age_hold(booking)
+        availability.expire_holds()
+        assert post_booking(client, adults=3, email='other@example.com').status_code == 201
+
+        availability.convert_hold(Booking.objects.get(pk=booking.pk))
+        booking.refresh_from_db()
+        assert booking.booking_status == 'CANCELLED'
+        assert SlotHold.objects.get(booking=booking).status == 'EXPIRED'
+        assert get_slot().participants == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_payment_order_calls_gateway_outside_transaction(monkeypatch):
+    booking = Booking.objects.get(pk=post_booking(APIClient()).data['id'])
+    service = PaymentService()
+    gateway = service.gateway
+    seen = {}
+
+    def create_order(booking, amount):
+        seen['in_atomic_block'] = connection.in_atomic_block
+        return {'order_id': 'order_test'}
+
+    monkeypatch.setattr(gateway, 'create_order', create_order)
+    monkeypatch.setattr(PaymentService, 'gateway', gateway)
+    service.create_payment_order(booking.id, 'session')
+    assert seen == {'in_atomic_block': False}
@@ -0,0 +1,35 @@
+"""
+Query budget tests for bookings list endpoints: query count must not grow with rows
+"""
+import pytest
+from apps.core.tests.query_budget import (
+    assert_constant_queries, staff_client, seed_session_bookings, seed_party_bookings,
+)
+
+
+@pytest.mark.django_db
+class TestBookingsQueryBudget:
+
+    def test_session_bookings_list(self):
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/bookings/', seed_session_bookings)
+
+    def test_party_bookings_list(self):
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/party-bookings/', seed_party_bookings)
+
+    def test_party_bookings_viewset_list(self):
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/party-bookings-old/', seed_party_bookings)
+
+    def test_waivers_list(self):
+        def seed(n):
+            seed_session_bookings(n)
+            seed_party_bookings(n)
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/waivers/', seed)
+
+    def test_customers_list(self):
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/customers/', seed_session_bookings)
+
+    def test_calendar(self):
+        def seed(n):
+            seed_session_bookings(n)
+            seed_party_bookings(n)
+        assert_constant_queries(staff_client().get, '/api/v1/bookings/calendar/', seed)
@@ -9,6 +9,7 @@ from .views import (
     PublicBookingBlockViewSet, PublicSiteAlertViewSet
 )
 from .calendar_views import calendar_bookings
+from .availability_views import slot_availability
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet)
@@ -27,6 +28,8 @@ router.register(r'site-alerts', PublicSiteAlertViewSet, basename='site-alerts')
 urlpatterns = [
     # Calendar endpoint
     path('calendar/', calendar_bookings, name='calendar-bookings'),
+    # Public slot availability (served from SlotAvailability counters)
+    path('availability/', slot_availability, name='slot-availability'),
     # Custom party booking endpoints (bypasses serializer bug)
     path('party-bookings/', create_party_booking_view, name='party-bookings-list-create'),
     path('party-bookings/<int:id>/', party_booking_detail_view, name='party-booking-detail'),
@@ -5,6 +5,14 @@ from rest_framework import status
 from .models import Customer, Booking, Waiver, Transaction, BookingBlock, PartyBooking, SessionBookingHistory, PartyBookingHistory
 from .serializers import CustomerSerializer, BookingSerializer, WaiverSerializer, TransactionSerializer, BookingBlockSerializer, PartyBookingSerializer, SessionBookingHistorySerializer, PartyBookingHistorySerializer
 from .permissions import IsStaffUser, IsSuperAdminOnly
+from .customers import resolve_customer
+from apps.core.middleware.query_diagnostics import diagnostics_enabled, logger as diagnostics_logger
+from apps.core.exports import EXPORT_ACTION
+from apps.core.idempotency import idempotent
+from apps.core.pagination import KeysetOrderingMixin, KeysetPagination
+from apps.core.search import (
+    BOOKING_SEARCH_FIELDS, CUSTOMER_SEARCH_FIELDS, PARTY_BOOKING_SEARCH_FIELDS, WAIVER_SEARCH_FIELDS, search_filter,
+)
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from reportlab.pdfgen import canvas
@@ -15,36 +23,54 @@ from django.utils import timezone
 from django.db import transaction
 import json
 
-from django.db.models import Sum, Count, Max, Q
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(KeysetOrderingMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsStaffUser]  # Allow employees to access customers
 
+    # ?ordering=<field> or -<field>; lifetime stats are stored columns, so every
+    # ordering is an index scan
+    ORDERING_FIELDS = ('created_at', 'name', 'booking_count', 'party_booking_count', 'total_spent', 'last_visit')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.get_ordering()[0].lstrip('-') == 'last_visit' and self.pagination_class().is_requested(self.request):
+                # Keyset comparisons cannot step over customers without a visit
+                raise ValidationError({'ordering': 'Cursor pagination does not support ordering by last_visit'})
+        return super().paginator
+
     def get_queryset(self):
-        queryset = Customer.objects.annotate(
-            booking_count=Count('bookings'),
-            total_spent=Sum('bookings__amount'),
-            last_visit=Max('bookings__date')
-        )
+        queryset = Customer.objects.all()
         
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search)
-            )
-            
+            queryset = search_filter(queryset, CUSTOMER_SEARCH_FIELDS, search)
+        
+        if self.action == 'list':
+            ordering = self.get_ordering()
+            if ordering[0] == '-last_visit':
+                # Customers without bookings go last
+                queryset = queryset.order_by(F('last_visit').desc(nulls_last=True), 'id')
+            elif ordering[0] == 'last_visit':
+                queryset = queryset.order_by(F('last_visit').asc(nulls_last=True), 'id')
+            else:
+                queryset = queryset.order_by(*ordering)
         return queryset
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(KeysetOrderingMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
+    # Opt-in cursor pages (?paginate=cursor) in ?ordering order, plain array otherwise
+    ORDERING_FIELDS = ('created_at', 'date', 'time', 'name', 'amount')
     
     def get_queryset(self):
         queryset = Booking.objects.all()
+        if self.action != EXPORT_ACTION:  # Exports project their own columns
+            queryset = BookingSerializer.setup_eager_loading(queryset)
         
         # Filtering
         booking_type = self.request.query_params.get('type', None)
@@ -62,12 +88,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search) |
-                Q(uuid__icontains=search)
-            )
+            queryset = search_filter(queryset, BOOKING_SEARCH_FIELDS, search)
         
         # Arrival status filter
         has_arrived = self.request.query_params.get('has_arrived', None)
@@ -77,19 +98,14 @@ class BookingViewSet(viewsets.ModelViewSet):
             elif has_arrived.lower() == 'false':
                 queryset = queryset.filter(arrived=False)
             
-        # Ordering
-        ordering = self.request.query_params.get('ordering', None)
-        if ordering:
-            queryset = queryset.order_by(ordering)
-        else:
-            queryset = queryset.order_by('-created_at') # Default to newest first
-        
-        # DEBUG: Print queryset info
-        print(f"[DEBUG] BookingViewSet.get_queryset()")
-        print(f"[DEBUG] Query params: {dict(self.request.query_params)}")
-        print(f"[DEBUG] Queryset count: {queryset.count()}")
-        if queryset.count() > 0:
-            print(f"[DEBUG] First booking: ID={queryset.first().id}, Name={queryset.first().name}")
+        # Ordering (newest first by default), also the cursor pages' sort key
+        queryset = queryset.order_by(*self.get_ordering())
+        
+        # Opt-in diagnostics (QUERY_DIAGNOSTICS / X-Query-Diagnostics header), no SQL issued here
+        if diagnostics_enabled(self.request):
+            diagnostics_logger.info(
+                f"BookingViewSet.{self.action}: params={dict(self.request.query_params)} sql={queryset.query}"
+            )
             
         return queryset
     
@@ -100,6 +116,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [IsStaffUser()]  # Allow employees to access bookings
     
+    @idempotent('booking-create')
     def create(self, request, *args, **kwargs):
         """Override create to trigger confirmation email"""
         from django.conf import settings
@@ -255,6 +272,10 @@ class WaiverViewSet(viewsets.ModelViewSet):
         if party_booking_id:
             queryset = queryset.filter(party_booking_id=party_booking_id)
             
+        search = self.request.query_params.get('search', None)
+        if search:
+            queryset = search_filter(queryset, WAIVER_SEARCH_FIELDS, search)
+            
         ordering = self.request.query_params.get('ordering', None)
         if ordering:
             queryset = queryset.order_by(ordering)
@@ -381,36 +402,13 @@ class WaiverViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        """Export all waivers to CSV"""
-        import csv
-        from django.http import HttpResponse
-        
-        waivers = self.get_queryset()
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="waivers.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Name', 'Email', 'Phone', 'Type', 'Signed Date', 'Booking Type', 'Booking ID', 'DOB', 'Emergency Contact'])
-        
-        for waiver in waivers:
-            booking_type = 'Session' if waiver.booking else ('Party' if waiver.party_booking else 'Walk-in')
-            booking_id = waiver.booking.id if waiver.booking else (waiver.party_booking.id if waiver.party_booking else 'N/A')
-            
-            writer.writerow([
-                waiver.id,
-                waiver.name,
-                waiver.email or '',
-                waiver.phone or '',
-                waiver.participant_type,
-                waiver.signed_at.strftime('%Y-%m-%d %H:%M') if waiver.signed_at else '',
-                booking_type,
-                booking_id,
-                waiver.dob.strftime('%Y-%m-%d') if waiver.dob else '',
-                waiver.emergency_contact or ''
-            ])
-        
-        return response
+        """
+        Export waivers to CSV (streamed, same filters as the list) in the
+        original column layout. The full layout (separate session / party
+        booking ids, verification, XLSX) is /core/exports/waivers/.
+        """
+        from apps.core.exports import export_response
+        return export_response('waivers-legacy', request)
     
     @action(detail=False, methods=['get'])
     def by_booking(self, request):
@@ -439,7 +437,7 @@ def waiver_list_view(request):
         if not (request.user and request.user.is_authenticated and request.user.is_staff):
             return Response({'detail': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        # List all waivers
+        # List all waivers (only ids of the related rows are used below)
         queryset = Waiver.objects.all()
         
         # Filter by booking
@@ -451,7 +449,18 @@ def waiver_list_view(request):
         if party_booking_id:
             queryset = queryset.filter(party_booking_id=party_booking_id)
             
+        search = request.query_params.get('search', None)
+        if search:
+            queryset = search_filter(queryset, WAIVER_SEARCH_FIELDS, search)
+            
         waivers = queryset.order_by('-created_at')
+        
+        # Opt-in cursor pages, full list otherwise
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        if page is not None:
+            waivers = page
+        
         data = []
         for waiver in waivers:
             waiver_data = {
@@ -469,25 +478,27 @@ def waiver_list_view(request):
                 'minors': waiver.minors,
                 'adults': waiver.adults,
                 'is_verified': waiver.is_verified,  # Add this field
-                'booking': waiver.booking.id if waiver.booking else None,
-                'party_booking': waiver.party_booking.id if waiver.party_booking else None,
-                'customer': waiver.customer.id if waiver.customer else None,
+                'booking': waiver.booking_id,
+                'party_booking': waiver.party_booking_id,
+                'customer': waiver.customer_id,
                 'created_at': waiver.created_at.isoformat(),
                 'updated_at': waiver.updated_at.isoformat(),
             }
             
             # Add booking reference
-            if waiver.booking:
-                waiver_data['booking_reference'] = f"Session #{waiver.booking.id}"
+            if waiver.booking_id:
+                waiver_data['booking_reference'] = f"Session #{waiver.booking_id}"
                 waiver_data['booking_type'] = 'SESSION'
-            elif waiver.party_booking:
-                waiver_data['booking_reference'] = f"Party #{waiver.party_booking.id}"
+            elif waiver.party_booking_id:
+                waiver_data['booking_reference'] = f"Party #{waiver.party_booking_id}"
                 waiver_data['booking_type'] = 'PARTY'
             else:
                 waiver_data['booking_reference'] = "Walk-in"
                 waiver_data['booking_type'] = 'UNKNOWN'
             
             data.append(waiver_data)
+        if page is not None:
+            return paginator.get_paginated_response(data)
         return Response(data)
     
     elif request.method == 'POST':
@@ -681,11 +692,19 @@ class PublicSiteAlertViewSet(viewsets.ReadOnlyModelViewSet):
 # Custom function-based view for party booking creation (bypasses serializer bug)
 @api_view(['POST', 'GET'])
 @permission_classes([permissions.AllowAny])
+@idempotent('party-booking-create')
 def create_party_booking_view(request):
     """Custom view to create party bookings without using ModelSerializer"""
     if request.method == 'GET':
         # List all party bookings
         bookings = PartyBooking.objects.all().order_by('-created_at')
+        
+        # Opt-in cursor pages, full list otherwise
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(bookings, request)
+        if page is not None:
+            bookings = page
+        
         data = []
         for booking in bookings:
             data.append({
@@ -706,26 +725,16 @@ def create_party_booking_view(request):
                 'created_at': booking.created_at.isoformat(),
                 'updated_at': booking.updated_at.isoformat(),
             })
+        if page is not None:
+            return paginator.get_paginated_response(data)
         return Response(data)
     
     elif request.method == 'POST':
         try:
             data = request.data
             
-            # Create or get customer
-            customer = None
-            if data.get('email'):
-                customer, created = Customer.objects.get_or_create(
-                    email=data['email'],
-                    defaults={
-                        'name': data.get('name', ''),
-                        'phone': data.get('phone', ''),
-                    }
-                )
-                if not created and not customer.name:
-                    customer.name = data.get('name', '')
-                    customer.phone = data.get('phone', '')
-                    customer.save()
+            # Create or get customer (existing details are kept, only blanks are filled in)
+            customer = resolve_customer(data.get('email'), data.get('name'), data.get('phone'), overwrite=False, request=request)
             
             # Create party booking
             booking = PartyBooking.objects.create(
@@ -776,6 +785,8 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = PartyBooking.objects.all()
+        if self.action != EXPORT_ACTION:  # Exports project their own columns
+            queryset = PartyBookingSerializer.setup_eager_loading(queryset)
         
         # Status filter
         status = self.request.query_params.get('status', None)
@@ -790,12 +801,7 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
         # Search filter
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) | 
-                Q(phone__icontains=search) |
-                Q(uuid__icontains=search)
-            )
+            queryset = search_filter(queryset, PARTY_BOOKING_SEARCH_FIELDS, search)
         
         # Arrival status filter
         has_arrived = self.request.query_params.get('has_arrived', None)
@@ -820,6 +826,7 @@ class PartyBookingViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [IsStaffUser()]  # Allow employees to access party bookings
     
+    @idempotent('party-booking-create')
     def create(self, request, *args, **kwargs):
         """Override create to trigger confirmation email"""
         from django.conf import settings
@@ -1212,19 +1219,7 @@ class SessionBookingHistoryViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Create or get customer
-                customer = None
-                if history.email:
-                    customer, created = Customer.objects.get_or_create(
-                        email=history.email,
-                        defaults={
-                            'name': history.name,
-                            'phone': history.phone,
-                        }
-                    )
-                    if not created and not customer.name:
-                        customer.name = history.name
-                        customer.phone = history.phone
-                        customer.save()
+                customer = resolve_customer(history.email, history.name, history.phone, overwrite=False, request=request)
                 
                 # Create new booking from history data
                 booking = Booking.objects.create(
@@ -1314,19 +1309,7 @@ class PartyBookingHistoryViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Create or get customer
-                customer = None
-                if history.email:
-                    customer, created = Customer.objects.get_or_create(
-                        email=history.email,
-                        defaults={
-                            'name': history.name,
-                            'phone': history.phone,
-                        }
-                    )
-                    if not created and not customer.name:
-                        customer.name = history.name
-                        customer.phone = history.phone
-                        customer.save()
+                customer = resolve_customer(history.email, history.name, history.phone, overwrite=False, request=request)
                 
                 # Create new party booking from history data
                 party_booking = PartyBooking.objects.create(
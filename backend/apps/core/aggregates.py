@@ -0,0 +1,158 @@
+"""
+Single-pass conditional aggregation for stats endpoints.
+
+Instead of one COUNT/SUM query per figure, every figure of a table is written
+as an aggregate with a filter (Count('id', filter=Q(...))) and the whole set is
+computed by one aggregate() call, i.e. one scan with CASE WHEN / FILTER clauses.
+Time series come from one GROUP BY Trunc query with missing buckets filled in.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import DateField, DateTimeField, Q
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+
+def day_start(day):
+    """Aware datetime of local midnight at the start of `day`."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_windows(date_field='created_at', today=None):
+    """
+    Q filters on a datetime field for the usual dashboard windows:
+    today, yesterday, week (since Monday), last_7_days (today and the six
+    days before) and month (since the 1st), all in local time.
+    """
+    today = today or timezone.localdate()
+    start = day_start(today)
+    return {
+        'today': Q(**{f'{date_field}__gte': start}),
+        'yesterday': Q(**{f'{date_field}__gte': start - timedelta(days=1), f'{date_field}__lt': start}),
+        'week': Q(**{f'{date_field}__gte': day_start(today - timedelta(days=today.weekday()))}),
+        'last_7_days': Q(**{f'{date_field}__gte': day_start(today - timedelta(days=6))}),
+        'month': Q(**{f'{date_field}__gte': day_start(today.replace(day=1))}),
+    }
+
+
+def _with_filter(aggregate, condition):
+    """Copy of `aggregate` restricted to rows matching `condition` as well."""
+    clone = aggregate.copy()
+    clone.filter = condition if clone.filter is None else clone.filter & condition
+    return clone
+
+
+def conditional_aggregate(queryset, measures, windows=None, window_measures=None,
+                          breakdowns=None, breakdown_measures=None):
+    """
+    Compute measures overall, per window and per breakdown value in one query.
+
+    Args:
+        queryset: Rows to aggregate.
+        measures: {name: aggregate}, e.g. {'revenue': Sum('amount', filter=Q(status='SUCCESS'))}.
+        windows: {name: Q}, e.g. date_windows().
+        window_measures: Measure names computed per window (default: all).
+        breakdowns: {field: [values]}, e.g. {'provider': ['MOCK', 'RAZORPAY']}.
+        breakdown_measures: Measure names computed per breakdown value (default: all).
+
+    Returns:
+        {'total': {measure: value},
+         'windows': {window: {measure: value}},
+         'breakdowns': {field: {value: {measure: value}}}}
+    """
+    windows = windows or {}
+    breakdowns = breakdowns or {}
+    window_measures = list(measures) if window_measures is None else window_measures
+    breakdown_measures = list(measures) if breakdown_measures is None else breakdown_measures
+
+    expressions = {}
+    slots = []  # (path in the result, alias)
+
+    def add(path, aggregate):
+        alias = f'm{len(slots)}'
+        expressions[alias] = aggregate
+        slots.append((path, alias))
+
+    for name, aggregate in measures.items():
+        add(('total', name), aggregate)
+    for window, condition in windows.items():
+        for name in window_measures:
+            add(('windows', window, name), _with_filter(measures[name], condition))
+    for field, values in breakdowns.items():
+        for value in values:
+            for name in breakdown_measures:
+                add(('breakdowns', field, value, name), _with_filter(measures[name], Q(**{field: value})))
+
+    row = queryset.order_by().aggregate(**expressions)
+
+    result = {'total': {}, 'windows': {}, 'breakdowns': {}}
+    for path, alias in slots:
+        target = result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = row[alias]
+    return result
+
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def period_start(day, granularity):
+    """First day of the day / week (Monday) / month bucket containing `day`."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def periods(start, end, granularity='day'):
+    """Start dates of every bucket overlapping start..end inclusive."""
+    result = []
+    current = period_start(start, granularity)
+    while current <= end:
+        result.append(current)
+        current = next_period(current, granularity)
+    return result
+
+
+def time_series(queryset, values, start, end, date_field='created_at', granularity='day'):
+    """
+    [(period_start, {name: value}), ...] for every day / week / month bucket
+    from start to end inclusive, computed with one GROUP BY Trunc query.
+    Buckets without rows get 0. `values` maps names to aggregates; date_field
+    may be a DateField or a DateTimeField (bucketed in local time).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unsupported granularity: {granularity}')
+
+    field = queryset.model._meta.get_field(date_field)
+    if isinstance(field, DateTimeField):
+        queryset = queryset.filter(**{
+            f'{date_field}__gte': day_start(start),
+            f'{date_field}__lt': day_start(end + timedelta(days=1)),
+        })
+    else:
+        queryset = queryset.filter(**{f'{date_field}__gte': start, f'{date_field}__lte': end})
+
+    rows = (
+        queryset
+        .annotate(period=Trunc(date_field, granularity, output_field=DateField()))
+        .order_by()
+        .values('period')
+        .annotate(**values)
+    )
+    by_period = {row['period']: row for row in rows}
+    series = []
+    for period in periods(start, end, granularity):
+        row = by_period.get(period, {})
+        series.append((period, {name: row.get(name) or 0 for name in values}))
+    return series
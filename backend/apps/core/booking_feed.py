@@ -0,0 +1,152 @@
+"""
+Unified session + party booking feed for the admin dashboard.
+
+Both tables are projected to one row shape and combined with UNION ALL, so
+filtering, ordering by created_at and the page limit all run in the database
+and only the rows of the requested page reach Python.
+"""
+from django.db.models import Case, CharField, F, IntegerField, Value, When
+
+from apps.bookings.models import Booking, PartyBooking
+from .search import BOOKING_SEARCH_FIELDS, PARTY_BOOKING_SEARCH_FIELDS, search_filter
+
+# Columns read straight from both tables, in SELECT order
+COMMON_FIELDS = (
+    'id', 'uuid', 'name', 'email', 'phone', 'date', 'time',
+    'adults', 'kids', 'amount', 'created_at', 'customer_id',
+)
+
+# Columns computed per table, in SELECT order (names must not clash with model fields)
+PROJECTED_FIELDS = (
+    'row_type', 'row_duration', 'row_spectators', 'row_booking_status',
+    'row_payment_status', 'row_waiver_status', 'row_birthday_child_name',
+    'row_birthday_child_age', 'row_package_name',
+    'customer_name', 'customer_email', 'customer_phone',
+)
+
+# Sort key of the feed; row_type breaks created_at ties between the tables
+FEED_ORDERING = ('-created_at', 'row_type', 'id')
+
+SESSION = 'SESSION'
+PARTY = 'PARTY'
+
+
+def _customer_columns():
+    return {
+        'customer_name': F('customer__name'),
+        'customer_email': F('customer__email'),
+        'customer_phone': F('customer__phone'),
+    }
+
+
+def session_rows(status=None, search=None):
+    """Session bookings projected to the feed shape."""
+    queryset = Booking.objects.all()
+    if status:
+        queryset = queryset.filter(booking_status=status)
+    if search:
+        queryset = search_filter(queryset, BOOKING_SEARCH_FIELDS, search)
+    return queryset.annotate(
+        row_type=Value(SESSION, output_field=CharField()),
+        row_duration=F('duration'),
+        row_spectators=F('spectators'),
+        row_booking_status=F('booking_status'),
+        row_payment_status=F('payment_status'),
+        row_waiver_status=F('waiver_status'),
+        row_birthday_child_name=Value(None, output_field=CharField()),
+        row_birthday_child_age=Value(None, output_field=IntegerField()),
+        row_package_name=Value(None, output_field=CharField()),
+        **_customer_columns()
+    )
+
+
+def party_rows(status=None, search=None):
+    """Party bookings projected to the feed shape."""
+    queryset = PartyBooking.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    if search:
+        queryset = search_filter(queryset, PARTY_BOOKING_SEARCH_FIELDS, search)
+    return queryset.annotate(
+        row_type=Value(PARTY, output_field=CharField()),
+        row_duration=Value(120, output_field=IntegerField()),  # Default party duration
+        row_spectators=Value(0, output_field=IntegerField()),  # Not tracked for party bookings
+        row_booking_status=F('status'),
+        row_payment_status=Value('PENDING', output_field=CharField()),  # Not tracked separately for party bookings
+        row_waiver_status=Case(
+            When(waiver_signed=True, then=Value('SIGNED')),
+            default=Value('PENDING'),
+            output_field=CharField(),
+        ),
+        row_birthday_child_name=F('birthday_child_name'),
+        row_birthday_child_age=F('birthday_child_age'),
+        row_package_name=F('package_name'),
+        **_customer_columns()
+    )
+
+
+def build_feed(booking_type=None, status=None, search=None, paginator=None, position=None):
+    """
+    Return the UNION ALL queryset of feed rows (dicts), newest first.
+
+    booking_type 'session' / 'party' limits the feed to one table. With a
+    KeysetPagination paginator and cursor position, each branch is filtered to
+    rows after the position before the union.
+    """
+    branches = []
+    if booking_type != 'party':
+        branches.append((SESSION, session_rows(status, search)))
+    if booking_type != 'session':
+        branches.append((PARTY, party_rows(status, search)))
+
+    parts = []
+    for row_type, queryset in branches:
+        if paginator is not None and position is not None:
+            condition = paginator.keyset_q(position, constants={'row_type': row_type})
+            if condition is None:
+                continue
+            queryset = queryset.filter(condition)
+        parts.append(queryset.order_by().values(*COMMON_FIELDS, *PROJECTED_FIELDS))
+
+    if not parts:
+        return Booking.objects.none().values(*COMMON_FIELDS)
+    feed = parts[0]
+    if len(parts) > 1:
+        feed = feed.union(*parts[1:], all=True)
+    return feed.order_by(*FEED_ORDERING)
+
+
+def format_row(row):
+    """Feed row -> the dashboard's booking dict."""
+    data = {
+        'id': row['id'],
+        'uuid': str(row['uuid']),
+        'type': row['row_type'],
+        'name': row['name'],
+        'email': row['email'],
+        'phone': row['phone'],
+        'date': str(row['date']) if row['date'] else None,
+        'time': str(row['time']) if row['time'] else None,
+        'duration': row['row_duration'],
+        'adults': row['adults'],
+        'kids': row['kids'],
+        'spectators': row['row_spectators'],
+        'amount': float(row['amount']) if row['amount'] else 0,
+        'booking_status': row['row_booking_status'],
+        'payment_status': row['row_payment_status'],
+        'waiver_status': row['row_waiver_status'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+    }
+    if row['row_type'] == PARTY:
+        data['birthday_child_name'] = row['row_birthday_child_name']
+        data['birthday_child_age'] = row['row_birthday_child_age']
+        data['package_name'] = row['row_package_name']
+
+    has_customer = row['customer_id'] is not None
+    data['customer'] = {
+        'id': row['customer_id'],
+        'name': row['customer_name'] if has_customer else row['name'],
+        'email': row['customer_email'] if has_customer else row['email'],
+        'phone': row['customer_phone'] if has_customer else row['phone'],
+    } if has_customer or row['name'] else None
+    return data
@@ -0,0 +1,193 @@
+"""
+Cache helpers for endpoints and services.
+
+Keys are namespaced and versioned: every key of a namespace embeds the
+namespace's version number, so invalidate(namespace) drops all of them with
+one atomic incr instead of tracking individual keys.
+
+get_or_set() protects expensive producers from stampedes: on a miss one
+caller (across threads and worker processes) takes a short lock with
+cache.add() and computes the value while the others wait for it.
+
+With CACHE_TWO_LEVEL, values are read through the per-process 'local' cache
+(kept for CACHE_LOCAL_TTL seconds) before the shared 'default' cache.
+
+The cache is never required: when a backend call fails (e.g. Redis is down)
+the error is logged, reads count as misses and writes are skipped, so
+callers fall back to computing values.
+
+Usage:
+    data = cache.get_or_set('cms-pages', ('page', slug), lambda: build_page(slug), timeout=300)
+    cache.invalidate('cms-pages')  # e.g. from a post_save receiver
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks while another caller computes a value
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def _shared():
+    return caches['default']
+
+
+def _local():
+    return caches['local'] if getattr(settings, 'CACHE_TWO_LEVEL', False) else None
+
+
+def _local_timeout(timeout):
+    local_ttl = getattr(settings, 'CACHE_LOCAL_TTL', 5)
+    if timeout is DEFAULT_TIMEOUT or timeout is None:
+        return local_ttl
+    return min(timeout, local_ttl)
+
+
+def _version_key(namespace):
+    return f'ns-version:{namespace}'
+
+
+def _call(operation, key, func, *args, fallback=None):
+    """func(*args), or `fallback` when the cache backend fails."""
+    try:
+        return func(*args)
+    except Exception as e:
+        logger.warning(f'Cache {operation} for {key} failed, continuing without cache: {e}')
+        return fallback
+
+
+def namespace_version(namespace):
+    """Current version of a namespace (1 until first invalidated)."""
+    key = _version_key(namespace)
+    local = _local()
+    if local is not None:
+        version = _call('get', key, local.get, key)
+        if version is not None:
+            return version
+    version = _call('get', key, _shared().get, key, 1, fallback=1)
+    if local is not None:
+        _call('set', key, local.set, key, version, _local_timeout(None))
+    return version
+
+
+def _bump_version(shared, key):
+    try:
+        shared.incr(key)
+    except ValueError:
+        if not shared.add(key, 2, None):
+            shared.incr(key)
+
+
+def invalidate(namespace):
+    """Drop every key of the namespace."""
+    key = _version_key(namespace)
+    try:
+        _bump_version(_shared(), key)
+    except Exception as e:
+        # Cached values of the namespace stay until their timeout
+        logger.error(f'Cache invalidation of {namespace} failed: {e}')
+    local = _local()
+    if local is not None:
+        _call('delete', key, local.delete, key)
+
+
+def make_key(namespace, key):
+    """'namespace:version:key'; `key` may be a string or a tuple of parts."""
+    if isinstance(key, (tuple, list)):
+        key = ':'.join(str(part) for part in key)
+    return f'{namespace}:{namespace_version(namespace)}:{key}'
+
+
+def _read(full_key, shared_only=False):
+    local = None if shared_only else _local()
+    if local is not None:
+        wrapped = _call('get', full_key, local.get, full_key)
+        if wrapped is not None:
+            return wrapped[0]
+    wrapped = _call('get', full_key, _shared().get, full_key)
+    if wrapped is None:
+        return _MISSING
+    if local is not None:
+        _call('set', full_key, local.set, full_key, wrapped, _local_timeout(None))
+    return wrapped[0]
+
+
+def _write(full_key, value, timeout):
+    # Stored as a 1-tuple so a cached None is told apart from a miss
+    _call('set', full_key, _shared().set, full_key, (value,), timeout)
+    local = _local()
+    if local is not None:
+        _call('set', full_key, local.set, full_key, (value,), _local_timeout(timeout))
+
+
+def get(namespace, key, default=None):
+    value = _read(make_key(namespace, key))
+    return default if value is _MISSING else value
+
+
+def set(namespace, key, value, timeout=DEFAULT_TIMEOUT):
+    _write(make_key(namespace, key), value, timeout)
+
+
+def add(namespace, key, value, timeout=DEFAULT_TIMEOUT):
+    """
+    Store the value only if the key is not set yet (in the shared cache, so it
+    works as a lock across workers). True if stored; also True when the
+    backend fails, so callers go ahead as they would on a miss.
+    """
+    full_key = make_key(namespace, key)
+    return _call('add', full_key, _shared().add, full_key, value, timeout, fallback=True)
+
+
+def delete(namespace, key):
+    full_key = make_key(namespace, key)
+    _call('delete', full_key, _shared().delete, full_key)
+    local = _local()
+    if local is not None:
+        _call('delete', full_key, local.delete, full_key)
+
+
+def get_or_set(namespace, key, producer, timeout=DEFAULT_TIMEOUT, lock_timeout=10):
+    """
+    Cached value, or producer() stored under the key. Concurrent misses wait
+    up to `lock_timeout` seconds for the first caller's value instead of all
+    running the producer.
+    """
+    full_key = make_key(namespace, key)
+    value = _read(full_key)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{full_key}:lock'
+    shared = _shared()
+    locked = _call('add', lock_key, shared.add, lock_key, 1, lock_timeout, fallback=_MISSING)
+    if locked is _MISSING:
+        # Backend down: nothing to wait on
+        return producer()
+    if locked:
+        try:
+            value = producer()
+            _write(full_key, value, timeout)
+            return value
+        finally:
+            _call('delete', lock_key, shared.delete, lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = _read(full_key, shared_only=True)
+        if value is not _MISSING:
+            return value
+        if _call('get', lock_key, shared.get, lock_key) is None:
+            break  # The holder failed without storing a value
+    logger.warning(f'Cache lock wait for {full_key} gave up, computing the value')
+    value = producer()
+    _write(full_key, value, timeout)
+    return value
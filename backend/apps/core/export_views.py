@@ -0,0 +1,35 @@
+"""
+Data export API View.
+
+Streams admin data as CSV (or XLSX) downloads.
+"""
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework import status
+from apps.bookings.permissions import IsStaffUser
+from .exports import export_response, ExportError, EXPORTS, CSV
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffUser])
+def export_data(request, name):
+    """
+    Download an export.
+    
+    GET /api/v1/core/exports/{name}/?file_type=csv|xlsx&<list filters>
+    
+    name: waivers | waivers-legacy | bookings | party-bookings | customers | payments | email-logs
+    
+    Accepts the same filters as the matching list endpoint
+    (e.g. status, date, search for bookings).
+    """
+    file_type = request.query_params.get('file_type', CSV).lower()
+    try:
+        return export_response(name, request, file_type)
+    except ExportError as e:
+        code = status.HTTP_404_NOT_FOUND if name not in EXPORTS else status.HTTP_400_BAD_REQUEST
+        return Response({'error': str(e)}, status=code)
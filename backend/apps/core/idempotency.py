@@ -0,0 +1,160 @@
+"""
+Idempotency-Key support for POST endpoints that create things.
+
+Clients on flaky networks retry requests whose response they never saw. When
+a request carries an Idempotency-Key header, the first response is stored
+for IDEMPOTENCY_KEY_TTL seconds and a retry with the same key gets that
+response back (with Idempotent-Replayed: true) without running the view
+again, so no second booking, Payment row or gateway order is created.
+
+Keys live in the IdempotencyKey table, not the cache: its unique
+(scope, key) constraint holds across every worker process and survives
+cache restarts, so two workers can never both run the view for one key.
+
+- Keys are scoped per endpoint and per user (anonymous clients share one
+  scope, so their keys must be random, e.g. a UUID per attempt).
+- Reusing a key with a different request body is a client bug: 422.
+- A retry arriving while the first request is still running: 409. A key
+  whose request never finished (worker killed) is taken over after
+  IDEMPOTENCY_LOCK_TIMEOUT seconds.
+- Stored and replayed: every response below 500 except 409. 5xx and 409
+  responses (and views raising) release the key, so those requests can be
+  retried for real.
+
+Expired keys are deleted by the purge_idempotency_keys command.
+
+Usage (below @api_view, or on a ViewSet method):
+    @idempotent('payment-order')
+    def create_payment_order(request): ...
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict from form posts
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.path}:{body}'.encode()).hexdigest()
+
+
+def _error(message, http_status):
+    return Response({'error': message}, status=http_status)
+
+
+def _is_stored(response):
+    return response.status_code < 500 and response.status_code != status.HTTP_409_CONFLICT
+
+
+def _claim(scope, key, fingerprint):
+    """
+    (entry, None) when this request owns the key and must run the view, else
+    (None, response) with the stored response or an error.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(scope=scope, key=key, fingerprint=fingerprint, created_at=now), None
+    except IntegrityError:
+        pass
+
+    entry = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if entry is None:
+        # Released by the first request between the two queries
+        return None, _error(f'A request with this {HEADER} was just released, retry it', status.HTTP_409_CONFLICT)
+
+    expired = entry.created_at <= now - _ttl()
+    if entry.response_status is not None and not expired:
+        return None, _replay(entry, fingerprint)
+
+    lock_timeout = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    if expired or entry.created_at <= now - lock_timeout:
+        # Expired, or its request died without an answer: take the key over.
+        # Conditional on created_at so only one of several retries wins.
+        taken = IdempotencyKey.objects.filter(pk=entry.pk, created_at=entry.created_at).update(
+            fingerprint=fingerprint, response_status=None, response_data=None, created_at=now,
+        )
+        if taken:
+            entry.fingerprint, entry.created_at = fingerprint, now
+            return entry, None
+
+    return None, _error(f'A request with this {HEADER} is still being processed', status.HTTP_409_CONFLICT)
+
+
+def idempotent(scope):
+    """Replay stored responses for POSTs repeating an Idempotency-Key."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            key = request.headers.get(HEADER)
+            if request.method != 'POST' or not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters', status.HTTP_400_BAD_REQUEST)
+
+            user = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+            entry, response = _claim(f'{scope}:{user}', hashlib.sha256(key.encode()).hexdigest(), _fingerprint(request))
+            if entry is None:
+                return response
+
+            stored = False
+            try:
+                response = view(*args, **kwargs)
+                if _is_stored(response):
+                    entry.response_status = response.status_code
+                    entry.response_data = response.data
+                    try:
+                        entry.save(update_fields=['response_status', 'response_data'])
+                        stored = True
+                    except Exception as e:
+                        # The view's work is done; only replays are lost
+                        logger.error(f'Could not store the response for {HEADER} scope {entry.scope}: {e}')
+                return response
+            finally:
+                if not stored:
+                    IdempotencyKey.objects.filter(pk=entry.pk, created_at=entry.created_at).delete()
+        return wrapper
+    return decorator
+
+
+def _replay(entry, fingerprint):
+    if entry.fingerprint != fingerprint:
+        return _error(
+            f'{HEADER} was already used for a different request',
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    logger.info(f'Replaying stored response for {HEADER} scope {entry.scope}')
+    response = Response(entry.response_data, status=entry.response_status)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def purge_expired(now=None):
+    """Delete keys older than IDEMPOTENCY_KEY_TTL. Returns the number deleted."""
+    cutoff = (now or timezone.now()) - _ttl()
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lte=cutoff).delete()
+    return deleted
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records older than IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        count = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} idempotency key(s)'))
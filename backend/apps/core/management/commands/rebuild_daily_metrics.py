@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.core.metrics import rebuild_daily_metrics
+from apps.core.models import DailyMetrics
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard daily metrics rollup from bookings, payments, waivers and customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Only rebuild when the rollup table has no rows (first deploy)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and DailyMetrics.objects.exists():
+            self.stdout.write('Daily metrics already populated, skipping')
+            return
+        count = rebuild_daily_metrics()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily metrics for {count} day(s)'))
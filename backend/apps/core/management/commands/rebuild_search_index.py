@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from apps.core.models import SearchDocument
+from apps.core.search_index import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the global search index from bookings, users, payments, vouchers, waivers, campaigns and messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Only rebuild when the index has no rows (first deploy)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and SearchDocument.objects.exists():
+            self.stdout.write('Search index already populated, skipping')
+            return
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} search document(s)'))
@@ -0,0 +1,328 @@
+"""
+Daily metrics rollup for the admin dashboard.
+
+Every booking, party booking, payment, waiver and customer contributes to the
+DailyMetrics row of one or two days (see the *_contribution functions). The
+contribution of an instance as loaded is remembered on it (post_init), and on
+save/delete only the difference is added to the affected rows, in one upsert
+and in the same transaction as the write (see signals.py).
+
+rebuild_daily_metrics() recomputes the whole table from the source tables, for
+first deploys and after bulk changes that bypass signals (queryset.update(),
+raw SQL, data imports).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date as date_cls, datetime
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.bookings.models import Booking, Customer, PartyBooking, Waiver
+from apps.payments.models import Payment
+from .models import DailyMetrics
+
+logger = logging.getLogger(__name__)
+
+# Additive DailyMetrics columns; dashboard totals are sums of these over all rows
+SUM_FIELDS = (
+    'session_bookings', 'party_bookings', 'session_revenue', 'party_revenue',
+    'pending_waivers', 'bookings_created', 'payments', 'payments_amount',
+    'waivers', 'new_customers', 'repeat_customers',
+)
+
+# Attribute holding an instance's contribution as loaded / last saved
+SNAPSHOT_ATTR = '_daily_metrics'
+
+
+def _to_date(value):
+    """Local calendar date of a date, datetime or ISO string (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if 'T' in value or ' ' in value else date_cls.fromisoformat(value)
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _add(result, day, **values):
+    if day is None:
+        return
+    row = result.setdefault(day, {})
+    for field, value in values.items():
+        row[field] = row.get(field, 0) + value
+
+
+# ----------------------------------------------------------------------
+# Contributions
+# ----------------------------------------------------------------------
+
+def booking_contribution(booking):
+    result = {}
+    if booking.booking_status == 'CANCELLED' or booking.status == 'CANCELLED':
+        return result
+    _add(
+        result, _to_date(booking.date),
+        session_bookings=1,
+        session_revenue=booking.amount or 0,
+        pending_waivers=1 if booking.waiver_status == 'PENDING' else 0,
+    )
+    _add(result, _to_date(booking.created_at), bookings_created=1)
+    return result
+
+
+def party_booking_contribution(party_booking):
+    result = {}
+    if party_booking.status == 'CANCELLED':
+        return result
+    _add(
+        result, _to_date(party_booking.date),
+        party_bookings=1,
+        party_revenue=party_booking.amount or 0,
+        pending_waivers=0 if party_booking.waiver_signed else 1,
+    )
+    _add(result, _to_date(party_booking.created_at), bookings_created=1)
+    return result
+
+
+def payment_contribution(payment):
+    result = {}
+    if payment.status == 'SUCCESS' and payment.amount and payment.amount > 0:
+        _add(result, _to_date(payment.created_at), payments=1, payments_amount=payment.amount)
+    return result
+
+
+def waiver_contribution(waiver):
+    result = {}
+    _add(result, _to_date(waiver.signed_at), waivers=1)
+    return result
+
+
+def customer_contribution(customer):
+    result = {}
+    _add(result, _to_date(customer.created_at), new_customers=1)
+    return result
+
+
+CONTRIBUTIONS = {
+    Booking: (booking_contribution, ('date', 'amount', 'status', 'booking_status', 'waiver_status', 'created_at')),
+    PartyBooking: (party_booking_contribution, ('date', 'amount', 'status', 'waiver_signed', 'created_at')),
+    Payment: (payment_contribution, ('status', 'amount', 'created_at')),
+    Waiver: (waiver_contribution, ('signed_at',)),
+    Customer: (customer_contribution, ('created_at',)),
+}
+
+
+def tracked_fields(model):
+    return CONTRIBUTIONS[model][1]
+
+
+def contribution(instance):
+    return CONTRIBUTIONS[type(instance)][0](instance)
+
+
+# ----------------------------------------------------------------------
+# Applying changes
+# ----------------------------------------------------------------------
+
+def _upsert_rows(rows):
+    """
+    INSERT ... ON CONFLICT (date) DO UPDATE adding the values, one statement
+    for all days (PostgreSQL and SQLite).
+    """
+    table = DailyMetrics._meta.db_table
+    quote = connection.ops.quote_name
+    columns = ('date',) + SUM_FIELDS + ('updated_at',)
+    now = timezone.now()
+    params = []
+    for day, values in rows.items():
+        row = {'date': day, 'updated_at': now, **{field: values.get(field, 0) for field in SUM_FIELDS}}
+        params.extend(
+            DailyMetrics._meta.get_field(column).get_db_prep_value(row[column], connection)
+            for column in columns
+        )
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    assignments = ', '.join(
+        f'{quote(field)} = {table}.{quote(field)} + EXCLUDED.{quote(field)}' for field in SUM_FIELDS
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({', '.join(quote(column) for column in columns)})
+            VALUES {placeholders}
+            ON CONFLICT (date) DO UPDATE
+            SET {assignments}, updated_at = EXCLUDED.updated_at
+            """,
+            params
+        )
+
+
+def _update_row(day, values):
+    """F() update, creating the row first if needed, for other databases."""
+    updates = {field: F(field) + value for field, value in values.items()}
+    updates['updated_at'] = timezone.now()
+    if DailyMetrics.objects.filter(date=day).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyMetrics.objects.create(date=day, **values)
+    except IntegrityError:
+        # Another writer created the row first
+        DailyMetrics.objects.filter(date=day).update(**updates)
+
+
+def apply_metrics_changes(changes):
+    """
+    Atomically add (or subtract, with negative values) to several days.
+    `changes` maps date -> {field: value}.
+    """
+    rows = {}
+    for day, values in changes.items():
+        values = {field: value for field, value in values.items() if value}
+        if values:
+            rows[day] = values
+    if not rows:
+        return
+    if connection.vendor in ('postgresql', 'sqlite'):
+        _upsert_rows(rows)
+    else:
+        for day, values in rows.items():
+            _update_row(day, values)
+
+
+def apply_metrics_delta(day, **values):
+    """Atomically add (or subtract, with negative values) to the row for `day`."""
+    apply_metrics_changes({day: values})
+
+
+def sync_contribution(old, new):
+    """Move an instance's contribution from `old` to `new` (either may be empty)."""
+    changes = {}
+    for day in set(old) | set(new):
+        before = old.get(day, {})
+        after = new.get(day, {})
+        changes[day] = {
+            field: after.get(field, 0) - before.get(field, 0)
+            for field in set(before) | set(after)
+        }
+    apply_metrics_changes(changes)
+
+
+def _counted_bookings(customer_id):
+    """The customer's session bookings that count towards Customer.booking_count."""
+    return Booking.objects.filter(customer_id=customer_id).exclude(Q(booking_status='CANCELLED') | Q(status='CANCELLED'))
+
+
+def customer_booking_changed(customer_id, booking, added):
+    """
+    Track repeat customers (two or more non-cancelled session bookings, credited
+    to the creation day of the second one, as in rebuild_daily_metrics) when
+    `booking` starts (added=True) or stops counting for a customer.
+
+    Reads the customer's stored booking_count, which the bookings app has
+    already refreshed for this change; only the 1 <-> 2 transition queries
+    the customer's other booking, for the day.
+    """
+    if not customer_id:
+        return
+    count = Customer.objects.filter(pk=customer_id).values_list('booking_count', flat=True).first()
+    if count != (2 if added else 1):
+        return
+    # Of the two bookings, the later created one made the customer a repeat customer
+    other = _counted_bookings(customer_id).exclude(pk=booking.pk).values_list('created_at', flat=True).first()
+    created = max(value for value in (booking.created_at, other) if value is not None)
+    apply_metrics_delta(_to_date(created), repeat_customers=1 if added else -1)
+
+
+def customer_deleted(customer):
+    """Take a repeat customer that is being deleted out of the rollup."""
+    if customer.booking_count < 2:
+        return
+    second = _counted_bookings(customer.pk).order_by('created_at', 'id').values_list('created_at', flat=True)[1:2]
+    if second:
+        apply_metrics_delta(_to_date(second[0]), repeat_customers=-1)
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+def metrics_totals():
+    """Sums of every DailyMetrics column over all days."""
+    totals = DailyMetrics.objects.aggregate(**{field: Sum(field) for field in SUM_FIELDS})
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def metrics_by_day(start, end):
+    """{date: DailyMetrics} for start..end inclusive (days without a row are missing)."""
+    return {row.date: row for row in DailyMetrics.objects.filter(date__gte=start, date__lte=end)}
+
+
+# ----------------------------------------------------------------------
+# Rebuild
+# ----------------------------------------------------------------------
+
+@transaction.atomic
+def rebuild_daily_metrics():
+    """
+    Recompute every DailyMetrics row from the source tables.
+    Returns the number of rows written.
+    """
+    days = {}
+
+    sessions = Booking.objects.exclude(Q(booking_status='CANCELLED') | Q(status='CANCELLED'))
+    for row in sessions.order_by().values('date').annotate(
+        count=Count('id'),
+        revenue=Sum('amount'),
+        pending=Count('id', filter=Q(waiver_status='PENDING')),
+    ):
+        _add(days, row['date'], session_bookings=row['count'], session_revenue=row['revenue'] or 0,
+             pending_waivers=row['pending'])
+
+    parties = PartyBooking.objects.exclude(status='CANCELLED')
+    for row in parties.order_by().values('date').annotate(
+        count=Count('id'),
+        revenue=Sum('amount'),
+        pending=Count('id', filter=Q(waiver_signed=False)),
+    ):
+        _add(days, row['date'], party_bookings=row['count'], party_revenue=row['revenue'] or 0,
+             pending_waivers=row['pending'])
+
+    for queryset in (sessions, parties):
+        for row in queryset.order_by().annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')):
+            _add(days, row['day'], bookings_created=row['count'])
+
+    successful = Payment.objects.filter(status='SUCCESS', amount__gt=0)
+    for row in successful.order_by().annotate(day=TruncDate('created_at')).values('day').annotate(
+        count=Count('id'), total=Sum('amount')
+    ):
+        _add(days, row['day'], payments=row['count'], payments_amount=row['total'] or 0)
+
+    for row in Waiver.objects.order_by().annotate(day=TruncDate('signed_at')).values('day').annotate(count=Count('id')):
+        _add(days, row['day'], waivers=row['count'])
+
+    for row in Customer.objects.order_by().annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')):
+        _add(days, row['day'], new_customers=row['count'])
+
+    # A customer becomes a repeat customer on the day of their second non-cancelled
+    # session booking (the bookings counted in Customer.booking_count)
+    seen = defaultdict(int)
+    linked = Booking.objects.filter(customer__isnull=False).exclude(
+        Q(booking_status='CANCELLED') | Q(status='CANCELLED')
+    ).order_by('customer_id', 'created_at', 'id')
+    for customer_id, created_at in linked.values_list('customer_id', 'created_at').iterator(chunk_size=2000):
+        seen[customer_id] += 1
+        if seen[customer_id] == 2:
+            _add(days, _to_date(created_at), repeat_customers=1)
+
+    DailyMetrics.objects.all().delete()
+    DailyMetrics.objects.bulk_create(
+        [DailyMetrics(date=day, **values) for day, values in days.items()],
+        batch_size=500,
+    )
+    logger.info(f'Rebuilt daily metrics for {len(days)} days')
+    return len(days)
@@ -1,4 +1,5 @@
 from .rate_limit import RateLimitMiddleware
 from .security import SecurityMiddleware
+from .query_diagnostics import QueryDiagnosticsMiddleware
 
-__all__ = ['RateLimitMiddleware', 'SecurityMiddleware']
+__all__ = ['RateLimitMiddleware', 'SecurityMiddleware', 'QueryDiagnosticsMiddleware']
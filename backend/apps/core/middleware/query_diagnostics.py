@@ -0,0 +1,92 @@
+"""
+Opt-in SQL diagnostics per request.
+
+Enabled for every request with QUERY_DIAGNOSTICS=True, or per request with the
+`X-Query-Diagnostics: 1` header when QUERY_DIAGNOSTICS_ALLOW_HEADER=True.
+When enabled, each query is timed and a summary (count, total time, repeated
+statements) is logged to the `apps.query_diagnostics` logger and returned in
+X-Query-Count / X-Query-Time-Ms response headers.
+
+When disabled the middleware only checks a flag and a header; no query is
+wrapped or recorded.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('apps.query_diagnostics')
+
+HEADER = 'HTTP_X_QUERY_DIAGNOSTICS'
+REQUEST_FLAG = '_query_diagnostics'
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def diagnostics_enabled(request):
+    """True when query diagnostics are active for this request."""
+    request = getattr(request, '_request', request)  # unwrap DRF Request
+    return getattr(request, REQUEST_FLAG, None) is not None
+
+
+class QueryRecorder:
+    """connection.execute_wrapper callable collecting SQL and timings."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, minimum=2):
+        """Statements (literals stripped) that ran at least `minimum` times."""
+        counts = Counter(_LITERALS.sub('?', sql) for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= minimum]
+
+
+class QueryDiagnosticsMiddleware:
+    """Record and log the SQL issued by a request when diagnostics are enabled"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.always = getattr(settings, 'QUERY_DIAGNOSTICS', False)
+        self.allow_header = getattr(settings, 'QUERY_DIAGNOSTICS_ALLOW_HEADER', False)
+
+    def __call__(self, request):
+        if not (self.always or (self.allow_header and request.META.get(HEADER) in ('1', 'true'))):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        setattr(request, REQUEST_FLAG, recorder)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        total_ms = recorder.total_ms
+        response['X-Query-Count'] = str(len(recorder.queries))
+        response['X-Query-Time-Ms'] = f'{total_ms:.1f}'
+
+        logger.info(
+            f'{request.method} {request.path}: {len(recorder.queries)} queries in {total_ms:.1f} ms',
+            extra={
+                'path': request.path,
+                'query_count': len(recorder.queries),
+                'query_time_ms': round(total_ms, 1),
+            }
+        )
+        for sql, count in recorder.repeated():
+            logger.warning(f'{request.method} {request.path}: repeated {count}x: {sql}')
+        if logger.isEnabledFor(logging.DEBUG):
+            for sql, duration in recorder.queries:
+                logger.debug(f'{duration:.1f} ms: {sql}')
+        return response
@@ -1,79 +1,150 @@
 """
 Rate limiting middleware for API protection
+
+Per-route policies (login, booking create, voucher validate, waiver create)
+are counted per client IP with a sliding window: the count of the current
+fixed window plus the previous window's count weighted by how much of it
+still overlaps. Counters are bumped with the cache's atomic incr, so
+concurrent requests are never lost, and with a shared cache (Redis) every
+worker process sees the same counts. Requests that match no policy touch
+the cache not at all.
+
+Limits are configured in settings.RATE_LIMITS as 'count/seconds'.
+
+Booking, voucher, waiver and login calls mostly arrive from the Next.js
+server actions, i.e. from the frontend server's IP. The frontend passes the
+visitor's X-Forwarded-For on. The client is the rightmost address in that
+chain that is not in RATE_LIMIT_TRUSTED_PROXIES, so each visitor gets their
+own count and a spoofed left-hand entry cannot pick someone else's bucket.
+RATE_LIMIT_TRUSTED_PROXIES defaults to the loopback and private ranges, so a
+frontend on the same host or private network is trusted out of the box.
 """
+import ipaddress
+import logging
+import math
+import re
+import time
+
+from django.conf import settings
 from django.core.cache import cache
 from django.http import JsonResponse
-import time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'rate-limit'
+
+# name -> (methods, path pattern); limits come from settings.RATE_LIMITS
+ROUTES = {
+    'login': (('POST',), re.compile(r'^/api/token/$')),
+    'booking_create': (('POST',), re.compile(r'^/api/v1/bookings/(bookings|party-bookings)/$')),
+    'voucher_validate': (('POST',), re.compile(r'^/api/v1/shop/vouchers/validate/$')),
+    'waiver_create': (('POST',), re.compile(r'^/api/v1/bookings/waivers/$')),
+}
+
+MESSAGES = {
+    'login': 'Too many login attempts. Please try again in a minute.',
+}
+
+
+def parse_rate(rate):
+    """'5/60' -> (5, 60); None for an empty or zero rate (policy disabled)."""
+    if not rate:
+        return None
+    count, _, seconds = str(rate).partition('/')
+    count, seconds = int(count), int(seconds or 60)
+    return (count, seconds) if count > 0 and seconds > 0 else None
+
+
+def hit(key, limit, window, now=None):
+    """
+    Count a request against `key` and decide whether it is allowed.
+    Returns (allowed, retry_after_seconds).
+
+    Fails open: when the cache backend errors the request is let through
+    (and the error logged) rather than rate limiting everyone.
+    """
+    now = time.time() if now is None else now
+    current_window, offset = divmod(now, window)
+    current_key = f'{KEY_PREFIX}:{key}:{int(current_window)}'
+    retry_after = max(1, math.ceil(window - offset))
+    try:
+        try:
+            count = cache.incr(current_key)
+        except ValueError:
+            # First request of the window; add() keeps a concurrent first request's count
+            cache.add(current_key, 0, window * 2)
+            count = cache.incr(current_key)
+        if count > limit:
+            return False, retry_after
+        previous = cache.get(f'{KEY_PREFIX}:{key}:{int(current_window) - 1}', 0)
+    except Exception as e:
+        logger.warning(f'Rate limit counter {key} unavailable, letting the request through: {e}')
+        return True, retry_after
+    estimated = previous * (1 - offset / window) + count
+    return estimated <= limit, retry_after
 
 
 class RateLimitMiddleware:
     """
-    Simple rate limiting middleware
-    Limits requests per IP address
+    Rejects requests over their route's limit with 429 and Retry-After
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy, strict=False)
+            for proxy in getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', [])
+        ]
+        self.policies = []
+        for name, rate in getattr(settings, 'RATE_LIMITS', {}).items():
+            parsed = parse_rate(rate)
+            if parsed and name in ROUTES:
+                methods, pattern = ROUTES[name]
+                self.policies.append((name, methods, pattern) + parsed)
+
     def __call__(self, request):
-        # Skip rate limiting for static files
-        if request.path.startswith('/static/') or request.path.startswith('/media/'):
-            return self.get_response(request)
-        
-        # Get client IP
-        ip = self.get_client_ip(request)
-        
-        # Check rate limit for login endpoint
-        if request.path == '/api/v1/auth/login/' and request.method == 'POST':
-            if not self.check_rate_limit(f'login_{ip}', limit=5, window=60):
-                return JsonResponse({
-                    'error': 'Too many login attempts. Please try again in 1 minute.'
-                }, status=429)
-        
-        # Check rate limit for API endpoints
-        if request.path.startswith('/api/'):
-            if not self.check_rate_limit(f'api_{ip}', limit=100, window=60):
-                return JsonResponse({
-                    'error': 'Rate limit exceeded. Please slow down.'
-                }, status=429)
-        
-        response = self.get_response(request)
-        return response
-    
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
+        for name, methods, pattern, limit, window in self.policies:
+            if request.method in methods and pattern.match(request.path):
+                ip = self.get_client_ip(request)
+                allowed, retry_after = hit(f'{name}:{ip}', limit, window)
+                if not allowed:
+                    logger.warning(f'Rate limit {name} exceeded by {ip}')
+                    response = JsonResponse({
+                        'error': MESSAGES.get(name, 'Too many requests. Please slow down and try again shortly.')
+                    }, status=429)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+                break
+
+        return self.get_response(request)
+
+    def is_trusted_proxy(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    @staticmethod
+    def strip_port(ip):
+        # Azure's front end appends the client port ("1.2.3.4:5678", "[::1]:5678")
+        if ip.startswith('['):
+            return ip[1:].split(']')[0]
+        if ip.count(':') == 1:
+            return ip.split(':')[0]
         return ip
-    
-    def check_rate_limit(self, key, limit, window):
+
+    def get_client_ip(self, request):
         """
-        Check if request is within rate limit
-        Returns True if allowed, False if exceeded
+        Client IP: the rightmost X-Forwarded-For hop that is not a trusted
+        proxy (the frontend server), else REMOTE_ADDR.
         """
-        cache_key = f'rate_limit_{key}'
-        
-        # Get current count and timestamp
-        data = cache.get(cache_key, {'count': 0, 'start': time.time()})
-        
-        current_time = time.time()
-        
-        # Reset if window has passed
-        if current_time - data['start'] > window:
-            data = {'count': 1, 'start': current_time}
-            cache.set(cache_key, data, window)
-            return True
-        
-        # Increment count
-        data['count'] += 1
-        
-        # Check if limit exceeded
-        if data['count'] > limit:
-            return False
-        
-        # Update cache
-        cache.set(cache_key, data, window)
-        return True
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if not x_forwarded_for:
+            return request.META.get('REMOTE_ADDR')
+        hops = [self.strip_port(hop.strip()) for hop in x_forwarded_for.split(',') if hop.strip()]
+        for ip in reversed(hops):
+            if not self.is_trusted_proxy(ip):
+                return ip
+        # Every hop is a trusted proxy: the call came from the frontend itself
+        return hops[0]
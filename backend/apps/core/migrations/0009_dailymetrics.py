@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_create_rbac_users'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('session_bookings', models.IntegerField(default=0)),
+                ('party_bookings', models.IntegerField(default=0)),
+                ('session_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('party_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending_waivers', models.IntegerField(default=0)),
+                ('bookings_created', models.IntegerField(default=0)),
+                ('payments', models.IntegerField(default=0)),
+                ('payments_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('waivers', models.IntegerField(default=0)),
+                ('new_customers', models.IntegerField(default=0)),
+                ('repeat_customers', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daily Metrics',
+                'verbose_name_plural': 'Daily Metrics',
+                'ordering': ['date'],
+            },
+        ),
+    ]
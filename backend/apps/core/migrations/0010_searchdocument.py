@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:20
+
+import logging
+
+import django.contrib.postgres.search
+from django.db import DatabaseError, migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def create_search_indexes(apps, schema_editor):
+    """GIN indexes for the tsvector and for substring matches (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_searchdocument_vector_gin '
+        'ON core_searchdocument USING gin (search_vector)'
+    )
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as e:
+        logger.warning(f'pg_trgm unavailable, skipping search_text trigram index: {e}')
+        return
+    # Same expression as Django's icontains SQL
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_searchdocument_text_trgm '
+        'ON core_searchdocument USING gin ((UPPER(("search_text")::text)) gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_searchdocument_vector_gin')
+    schema_editor.execute('DROP INDEX IF EXISTS core_searchdocument_text_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_dailymetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('module', models.CharField(max_length=30)),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('route', models.CharField(max_length=255)),
+                ('search_text', models.TextField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('occurred_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['module'], name='core_search_module_b100aa_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doc_type', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
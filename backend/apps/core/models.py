@@ -1,4 +1,6 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 class User(AbstractUser):
@@ -117,3 +119,104 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.type}: {self.title}"
 
+
+
+class DailyMetrics(models.Model):
+    """
+    Per-day rollup of the dashboard figures.
+    Kept in step with bookings, payments, waivers and customers by signals
+    (see apps/core/metrics.py), so the dashboard reads a few rows instead of
+    aggregating every table on each poll. Totals are sums over all rows.
+    """
+    date = models.DateField(unique=True)
+
+    # Non-cancelled bookings by booking date
+    session_bookings = models.IntegerField(default=0)
+    party_bookings = models.IntegerField(default=0)
+    session_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    party_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pending_waivers = models.IntegerField(default=0)
+
+    # Non-cancelled bookings (session + party) by creation date
+    bookings_created = models.IntegerField(default=0)
+
+    # Successful payments by payment date
+    payments = models.IntegerField(default=0)
+    payments_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    waivers = models.IntegerField(default=0)
+    new_customers = models.IntegerField(default=0)
+    # Customers whose second non-cancelled session booking was made on this day
+    repeat_customers = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = "Daily Metrics"
+        verbose_name_plural = "Daily Metrics"
+
+    def __str__(self):
+        return f"Metrics {self.date}"
+
+
+class SearchDocument(models.Model):
+    """
+    One row per searchable admin record (booking, waiver, payment, ...), kept
+    in step by signals (see apps/core/search_index.py). Global search reads
+    this table alone: one indexed, ranked query with the role's modules
+    filtered in SQL, instead of a query per module.
+    """
+    doc_type = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    # GlobalSearchService module the record belongs to; roles see a subset of modules
+    module = models.CharField(max_length=30)
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    route = models.CharField(max_length=255)
+    # Lower-cased searchable values; trigram indexed on PostgreSQL
+    search_text = models.TextField()
+    # to_tsvector('simple', search_text), PostgreSQL only (NULL elsewhere)
+    search_vector = SearchVectorField(null=True, blank=True)
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'object_id'], name='unique_search_document'),
+        ]
+        indexes = [
+            models.Index(fields=['module']),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type} {self.object_id}: {self.title}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key of a POST and the response it got (see apps/core/idempotency.py).
+    The unique (scope, key) pair makes the database, shared by every worker,
+    decide which of two concurrent requests with the same key runs the view.
+    response_status is NULL while that first request is still running.
+    """
+    # Endpoint scope and user, e.g. 'booking-create:anon'
+    scope = models.CharField(max_length=100)
+    # sha256 of the client's Idempotency-Key header
+    key = models.CharField(max_length=64)
+    # sha256 of the request path and body
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),  # Purging expired keys
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key[:12]} ({self.response_status or 'in flight'})"
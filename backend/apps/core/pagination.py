@@ -0,0 +1,244 @@
+"""
+Opt-in keyset (cursor) pagination for admin list endpoints.
+
+List endpoints keep returning plain arrays, which the frontend expects. A
+client opts in per request with either:
+
+    ?paginate=cursor                      (first page)
+    ?cursor=<token>                       (following pages)
+    Accept: application/json; pagination=cursor
+
+and then gets {"next": url, "next_cursor": token, "results": [...]}.
+
+Pages are fetched with a WHERE on the sort key instead of OFFSET, e.g.
+created_at < :c OR (created_at = :c AND id > :id) ORDER BY created_at DESC, id,
+so every page is an index range scan no matter how deep the client pages.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a fixed sort key, only active when requested.
+
+    paginate_queryset() returns None for requests that did not opt in, so
+    DRF list views and function views fall back to returning the full array.
+    """
+    # Sort key; a leading '-' means descending. Must be unique as a whole.
+    ordering = ('-created_at', 'id')
+    page_size = 50
+    max_page_size = 500
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    mode_query_param = 'paginate'
+    accept_media_param = 'pagination'
+    mode_value = 'cursor'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.page = None
+        self.next_position = None
+        self.base_url = None
+
+    # ------------------------------------------------------------------
+    # Opt-in detection
+    # ------------------------------------------------------------------
+
+    def is_requested(self, request):
+        """True when the client asked for cursor pages."""
+        params = request.query_params if hasattr(request, 'query_params') else request.GET
+        if self.cursor_query_param in params:
+            return True
+        if params.get(self.mode_query_param) == self.mode_value:
+            return True
+        accept = request.META.get('HTTP_ACCEPT', '')
+        return f'{self.accept_media_param}={self.mode_value}' in accept.replace(' ', '')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------------------------------------------------
+    # Cursor encoding
+    # ------------------------------------------------------------------
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_position(self, item):
+        """Sort key values of a model instance or values() dict."""
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    # ------------------------------------------------------------------
+    # Keyset filtering
+    # ------------------------------------------------------------------
+
+    def keyset_q(self, position, constants=None):
+        """
+        Q selecting rows strictly after `position` in sort order.
+
+        `constants` maps sort fields that are fixed for the queryset being
+        filtered (e.g. {'type': 'SESSION'} for one branch of a UNION) to their
+        value; comparisons on them are resolved here instead of in SQL.
+        Returns None when no row of this queryset can follow the position.
+
+        The OR chain is ANDed with a plain bound on the leading sort field
+        (e.g. created_at <= x), which the planner can use as an index range
+        condition; the OR alone leads to a full index scan.
+        """
+        constants = constants or {}
+        result = Q(pk__in=[])
+        matched = False
+        bound = None
+        prefix = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            value = position[index]
+
+            if name in constants:
+                constant = constants[name]
+                after = constant < value if descending else constant > value
+                if after:
+                    result |= prefix
+                    matched = True
+                if constant != value:
+                    # Later fields only matter while all earlier ones are equal
+                    break
+                continue
+
+            if bound is None:
+                bound = Q(**{f'{name}__lte' if descending else f'{name}__gte': value})
+            lookup = f'{name}__lt' if descending else f'{name}__gt'
+            result |= prefix & Q(**{lookup: value})
+            matched = True
+            prefix &= Q(**{name: value})
+
+        if not matched:
+            return None
+        return bound & result if bound is not None else result
+
+    def order_queryset(self, queryset):
+        return queryset.order_by(*self.ordering)
+
+    # ------------------------------------------------------------------
+    # DRF pagination API
+    # ------------------------------------------------------------------
+
+    def start(self, request):
+        """Read page size and cursor position for an opted-in request."""
+        self.base_url = request.build_absolute_uri()
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        return self.get_page_size(request), position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        page_size, position = self.start(request)
+        queryset = self.order_queryset(queryset)
+        if position is not None:
+            condition = self.keyset_q(position)
+            if condition is None:
+                queryset = queryset.none()
+            else:
+                queryset = queryset.filter(condition)
+
+        rows = list(queryset[:page_size + 1])
+        return self.paginate_rows(rows, page_size)
+
+    def paginate_rows(self, rows, page_size):
+        """Trim an already ordered list fetched with page_size + 1 rows."""
+        has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.next_position = self.get_position(self.page[-1]) if has_next and self.page else None
+        return self.page
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = remove_query_param(self.base_url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.get_next_cursor()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOrderingMixin:
+    """
+    ViewSet mixin making ?ordering=<field> / -<field> the single sort source:
+    get_ordering() orders the list queryset and is the KeysetPagination sort
+    key, with 'id' appended so the key is unique.
+    """
+    pagination_class = KeysetPagination
+
+    # Non-null columns accepted in ?ordering
+    ORDERING_FIELDS = ('created_at',)
+    DEFAULT_ORDERING = ('-created_at', 'id')
+
+    def get_ordering(self):
+        ordering = self.request.query_params.get('ordering')
+        if not ordering:
+            return self.DEFAULT_ORDERING
+        if ordering.lstrip('-') not in self.ORDERING_FIELDS:
+            raise ValidationError({'ordering': f"Must be one of: {', '.join(self.ORDERING_FIELDS)} (prefix - for descending)"})
+        return (ordering, 'id')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = self.pagination_class(ordering=self.get_ordering())
+        return self._paginator
@@ -0,0 +1,150 @@
+"""
+Text search backends for admin list and search endpoints.
+
+Every search box filters with search_filter(queryset, fields, term), which
+delegates to the configured backend:
+
+- TrigramSearchBackend (PostgreSQL with pg_trgm): substring matches are
+  served by GIN trigram indexes on UPPER(column::text), the exact expression
+  Django generates for icontains. Terms shorter than three characters have no
+  trigrams, so those searches scan, but they still match substrings like every
+  other backend. Results can be ranked by trigram similarity.
+- SearchBackend (SQLite and anything else): plain icontains, no ranking.
+
+SEARCH_BACKEND = 'auto' (default) picks trigram when the database is
+PostgreSQL and the pg_trgm extension is installed (checked once per database
+connection); 'trigram' / 'basic' force one.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+# A term that could be part of a UUID (hex digits and dashes)
+UUID_FRAGMENT = re.compile(r'^[0-9a-fA-F-]{4,36}$')
+
+# Searchable fields of the front-desk models; the text columns have trigram
+# indexes (bookings migration 0022)
+BOOKING_SEARCH_FIELDS = ('name', 'email', 'phone', 'booking_number', 'uuid', 'id')
+PARTY_BOOKING_SEARCH_FIELDS = ('name', 'email', 'phone', 'booking_number', 'uuid', 'id')
+CUSTOMER_SEARCH_FIELDS = ('name', 'email', 'phone')
+WAIVER_SEARCH_FIELDS = ('name', 'email', 'phone')
+
+
+def _resolve_field(model, path):
+    """Model field at the end of a lookup path like 'booking__email'."""
+    field = None
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            model = field.related_model
+    return field
+
+
+class SearchBackend:
+    """Case-insensitive substring matching without index support."""
+    name = 'basic'
+
+    def text_lookup(self, term):
+        return 'icontains'
+
+    def field_q(self, model, path, term):
+        """Q for one field, or None when the term cannot match that field type."""
+        field = _resolve_field(model, path)
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            # Numeric ids match exactly, never as substrings
+            return Q(**{path: int(term)}) if term.isdigit() else None
+        if isinstance(field, models.UUIDField):
+            return Q(**{f'{path}__icontains': term}) if UUID_FRAGMENT.match(term) else None
+        return Q(**{f'{path}__{self.text_lookup(term)}': term})
+
+    def filter_q(self, model, fields, term):
+        """Q matching `term` in any of `fields` (empty result when nothing can match)."""
+        condition = Q()
+        for path in fields:
+            field_condition = self.field_q(model, path, term)
+            if field_condition is not None:
+                condition |= field_condition
+        return condition or Q(pk__in=[])
+
+    def rank(self, queryset, fields, term):
+        """Order by relevance where supported; unchanged otherwise."""
+        return queryset
+
+
+class TrigramSearchBackend(SearchBackend):
+    """PostgreSQL pg_trgm backed search (see module docstring)."""
+    name = 'trigram'
+
+    # pg_trgm needs at least three characters to use the index
+    MIN_TRIGRAM_LENGTH = 3
+
+    def rank(self, queryset, fields, term):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        text_fields = [
+            path for path in fields
+            if isinstance(_resolve_field(queryset.model, path), (models.CharField, models.TextField))
+        ]
+        if not text_fields:
+            return queryset
+        similarities = [TrigramSimilarity(path, term) for path in text_fields]
+        score = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        return queryset.annotate(search_rank=score).order_by('-search_rank')
+
+
+def _trigram_installed():
+    """
+    Whether pg_trgm is installed. Remembered for the current database
+    connection only, so installing the extension (or a failed check) is
+    picked up when the connection is next reopened.
+    """
+    try:
+        connection.ensure_connection()
+        checked = getattr(connection, '_pg_trgm_installed', None)
+        if checked is not None and checked[0] is connection.connection:
+            return checked[1]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            installed = cursor.fetchone() is not None
+    except Exception as e:
+        logger.warning(f'Could not check for pg_trgm: {e}')
+        return False
+    connection._pg_trgm_installed = (connection.connection, installed)
+    return installed
+
+
+def get_search_backend():
+    """Backend for the default database, per SEARCH_BACKEND."""
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if choice == 'trigram':
+        return TrigramSearchBackend()
+    if choice == 'basic':
+        return SearchBackend()
+    if connection.vendor == 'postgresql' and _trigram_installed():
+        return TrigramSearchBackend()
+    return SearchBackend()
+
+
+def search_filter(queryset, fields, term, rank=False):
+    """
+    Filter `queryset` to rows where `term` matches any of `fields`.
+
+    Args:
+        fields: Lookup paths; integer fields match the term exactly and UUID
+            fields only when the term looks like part of a UUID.
+        rank: Order by relevance (trigram backend only).
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+    backend = get_search_backend()
+    queryset = queryset.filter(backend.filter_q(queryset.model, fields, term))
+    if rank:
+        queryset = backend.rank(queryset, fields, term)
+    return queryset
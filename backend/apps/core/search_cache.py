@@ -0,0 +1,131 @@
+"""
+Short-lived result cache for the admin search box.
+
+The search box queries on every keystroke. Results are cached per role scope
+(the modules the user may search) and normalized query for
+GLOBAL_SEARCH_CACHE_TTL seconds. Any search document write bumps the
+namespace version (the generation) that is part of every key, which drops all
+cached results at once (see signals.py and cache.py).
+
+Typing one more character only narrows the match, so when a shorter prefix is
+cached and complete (no type hit the per-type limit), the longer query is
+answered by filtering the prefix's results in memory. Only index-mode
+results carry the searchable text needed for that. Prefixes shorter than
+MIN_REFINE_LENGTH are never refined: on PostgreSQL they only match word
+prefixes, so their results miss substring matches of the longer query.
+
+Like cache.py, a failing cache backend only costs the cache: lookups miss
+and stores are skipped.
+"""
+import hashlib
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import cache as namespaced_cache
+from .search import TrigramSearchBackend
+from .search_index import RESULTS_PER_TYPE
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'global-search'
+
+MIN_REFINE_LENGTH = TrigramSearchBackend.MIN_TRIGRAM_LENGTH
+
+
+def normalize_query(query):
+    return query.strip().lower()
+
+
+def _ttl():
+    return getattr(settings, 'GLOBAL_SEARCH_CACHE_TTL', 30)
+
+
+def _key(generation, modules, query):
+    # Hashed: queries are user input and may not be valid cache key characters
+    digest = hashlib.sha256(query.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{generation}:{','.join(sorted(modules))}:{digest}"
+
+
+def invalidate():
+    """Drop every cached result (bump the generation in all keys)."""
+    namespaced_cache.invalidate(KEY_PREFIX)
+
+
+def _matches(query, text):
+    """In-memory version of search_index.search_documents' text condition."""
+    if query in text:
+        return True
+    if connection.vendor != 'postgresql':
+        return False
+    words = re.findall(r'\w+', text)
+    return all(any(word.startswith(term) for word in words) for term in re.findall(r'\w+', query))
+
+
+def lookup(modules, query):
+    """
+    (results, generation): cached results for the query, refined from a cached
+    prefix if possible, else None. Pass the generation to store(), so results
+    computed while a write happened are not cached under the new generation.
+    """
+    generation = namespaced_cache.namespace_version(KEY_PREFIX)
+    if not _ttl():
+        return None, generation
+    query = normalize_query(query)
+
+    # Exact query first, then ever shorter prefixes
+    candidates = [query] + [query[:length] for length in range(len(query) - 1, MIN_REFINE_LENGTH - 1, -1)]
+    if query.isdigit():
+        # Exact id matches are not implied by a prefix's results
+        candidates = candidates[:1]
+    keys = {candidate: _key(generation, modules, candidate) for candidate in candidates}
+    try:
+        entries = cache.get_many(keys.values())
+    except Exception as e:
+        logger.warning(f'Search cache lookup failed, searching without cache: {e}')
+        return None, generation
+
+    exact = entries.get(keys[query])
+    if exact is not None:
+        return exact['results'], generation
+
+    for candidate in candidates[1:]:
+        entry = entries.get(keys[candidate])
+        if entry is None or entry['texts'] is None or not entry['complete']:
+            continue
+        results, texts = [], []
+        for result, text in zip(entry['results'], entry['texts']):
+            if _matches(query, text):
+                results.append(result)
+                texts.append(text)
+        _set(keys[query], {'results': results, 'texts': texts, 'complete': True})
+        return results, generation
+    return None, generation
+
+
+def store(generation, modules, query, results, texts=None):
+    """
+    Cache results. `texts` (each result's searchable text, index mode only)
+    lets longer queries be answered from these results.
+    """
+    if not _ttl():
+        return
+    query = normalize_query(query)
+    per_type = Counter(result['type'] for result in results)
+    entry = {
+        'results': results,
+        'texts': texts,
+        'complete': all(count < RESULTS_PER_TYPE for count in per_type.values()),
+    }
+    _set(_key(generation, modules, query), entry)
+
+
+def _set(key, entry):
+    try:
+        cache.set(key, entry, _ttl())
+    except Exception as e:
+        logger.warning(f'Search cache store failed: {e}')
@@ -0,0 +1,348 @@
+"""
+Denormalized global search index.
+
+Every searchable admin record has one SearchDocument row holding what the
+search box shows (title, subtitle, route), the module it belongs to for role
+filtering, and its searchable values as text plus (on PostgreSQL) a tsvector.
+Rows are written on post_save / post_delete (see signals.py) with a single
+upsert statement, so GlobalSearchService answers from one indexed query.
+
+Subtitles that mention a related record (a payment's customer name, a
+waiver's booking number) are refreshed when the record itself is saved;
+rebuild_search_index() rewrites the whole table after bulk changes that
+bypass signals (queryset.update(), raw SQL, imports).
+"""
+import logging
+import re
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from apps.bookings.models import Booking, PartyBooking, Waiver
+from apps.cms.models import ContactMessage
+from apps.marketing.models import MarketingCampaign
+from apps.payments.models import Payment
+from apps.shop.models import Voucher
+from .models import SearchDocument
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Attribute holding the document last written for an instance
+SNAPSHOT_ATTR = '_search_document'
+
+# Result order of the types in the search box
+TYPE_ORDER = ('booking', 'party_booking', 'user', 'payment', 'voucher', 'waiver', 'campaign', 'message')
+
+# Types whose numeric ids can be searched for exactly
+ID_SEARCH_TYPES = ('booking', 'party_booking')
+
+DOCUMENT_COLUMNS = ('title', 'subtitle', 'route', 'module', 'search_text', 'occurred_at')
+
+BATCH_SIZE = 500
+
+# Results per type in the search box
+RESULTS_PER_TYPE = 5
+
+
+def _date_label(value):
+    """'25 Oct 2026' for a date (or an ISO string still unsaved on the instance)"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.strftime('%d %b %Y') if value else ''
+
+
+def _text(*values):
+    return ' '.join(str(value) for value in values if value not in (None, '')).lower()
+
+
+# ----------------------------------------------------------------------
+# Documents
+# ----------------------------------------------------------------------
+
+def booking_document(booking):
+    return {
+        'module': 'bookings',
+        'title': booking.name,
+        'subtitle': f"{booking.booking_number or f'#{booking.id}'} • {_date_label(booking.date)}",
+        'route': f'/admin/session-bookings/{booking.id}',
+        'search_text': _text(booking.booking_number, booking.name, booking.email, booking.phone, booking.uuid),
+        'occurred_at': booking.created_at,
+    }
+
+
+def party_booking_document(booking):
+    return {
+        'module': 'bookings',
+        'title': booking.name,
+        'subtitle': f"{booking.booking_number or f'P#{booking.id}'} • {_date_label(booking.date)}",
+        'route': f'/admin/party-bookings/{booking.id}',
+        'search_text': _text(booking.booking_number, booking.name, booking.email, booking.phone, booking.uuid),
+        'occurred_at': booking.created_at,
+    }
+
+
+def user_document(user):
+    full_name = f"{user.first_name} {user.last_name}".strip() or user.username
+    return {
+        'module': 'users',
+        'title': full_name,
+        'subtitle': f"{user.email} • {getattr(user, 'role', 'User')}",
+        'route': f'/admin/users/{user.id}',
+        'search_text': _text(user.username, user.email, user.first_name, user.last_name, getattr(user, 'name', '')),
+        'occurred_at': user.date_joined,
+    }
+
+
+def payment_document(payment):
+    booking = payment.booking if payment.booking_id else None
+    party_booking = payment.party_booking if payment.party_booking_id else None
+    customer_name = (booking or party_booking).name if (booking or party_booking) else 'Unknown'
+    return {
+        'module': 'payments',
+        'title': f"Order #{payment.order_id}",
+        'subtitle': f"₹{payment.amount:,.0f} • {customer_name} • {payment.status}",
+        'route': f'/admin/payments/{payment.id}',
+        'search_text': _text(
+            payment.order_id, payment.payment_id,
+            booking and booking.email, booking and booking.name,
+            party_booking and party_booking.email, party_booking and party_booking.name,
+        ),
+        'occurred_at': payment.created_at,
+    }
+
+
+def voucher_document(voucher):
+    status = 'Active' if voucher.is_active else 'Inactive'
+    discount = f"{voucher.discount_value}{'%' if voucher.discount_type == 'PERCENTAGE' else '₹'}"
+    return {
+        'module': 'vouchers',
+        'title': voucher.code,
+        'subtitle': f"{discount} Off • {status}",
+        'route': f'/admin/vouchers/{voucher.id}',
+        'search_text': _text(voucher.code, voucher.description),
+        'occurred_at': voucher.created_at,
+    }
+
+
+def waiver_document(waiver):
+    booking_ref = 'Walk-in'
+    booking_number = None
+    if waiver.booking_id:
+        booking_number = waiver.booking.booking_number
+        booking_ref = booking_number or f"#{waiver.booking_id}"
+    elif waiver.party_booking_id:
+        booking_number = waiver.party_booking.booking_number
+        booking_ref = booking_number or f"P#{waiver.party_booking_id}"
+    return {
+        'module': 'waivers',
+        'title': waiver.name,
+        'subtitle': f"{'Signed' if waiver.signed_at else 'Pending'} • {booking_ref}",
+        'route': f'/admin/waivers/{waiver.id}',
+        'search_text': _text(waiver.name, waiver.email, waiver.phone, booking_number),
+        'occurred_at': waiver.signed_at,
+    }
+
+
+def campaign_document(campaign):
+    return {
+        'module': 'campaigns',
+        'title': campaign.title,
+        'subtitle': f"Email • {campaign.status}",
+        'route': f'/admin/marketing/campaigns/{campaign.id}',
+        'search_text': _text(campaign.title, campaign.subject),
+        'occurred_at': campaign.created_at,
+    }
+
+
+def message_document(message):
+    preview = message.message[:50] + '...' if len(message.message) > 50 else message.message
+    return {
+        'module': 'messages',
+        # The search box appends the relative time to the subtitle
+        'title': message.name,
+        'subtitle': preview,
+        'route': f'/admin/messages/{message.id}',
+        'search_text': _text(message.name, message.email, message.phone, message.message),
+        'occurred_at': message.created_at,
+    }
+
+
+# model -> (doc_type, document function, fields the document depends on,
+#           related rows to load with it when rebuilding)
+INDEXED = {
+    Booking: ('booking', booking_document,
+              ('booking_number', 'name', 'email', 'phone', 'date'), ()),
+    PartyBooking: ('party_booking', party_booking_document,
+                   ('booking_number', 'name', 'email', 'phone', 'date'), ()),
+    User: ('user', user_document,
+           ('username', 'email', 'first_name', 'last_name', 'name', 'role'), ()),
+    Payment: ('payment', payment_document,
+              ('order_id', 'payment_id', 'amount', 'status', 'booking', 'party_booking'),
+              ('booking', 'party_booking')),
+    Voucher: ('voucher', voucher_document,
+              ('code', 'description', 'discount_type', 'discount_value', 'is_active'), ()),
+    Waiver: ('waiver', waiver_document,
+             ('name', 'email', 'phone', 'signed_at', 'booking', 'party_booking'),
+             ('booking', 'party_booking')),
+    MarketingCampaign: ('campaign', campaign_document, ('title', 'subject', 'status'), ()),
+    ContactMessage: ('message', message_document, ('name', 'email', 'phone', 'message'), ()),
+}
+
+
+def tracked_fields(model):
+    return INDEXED[model][2]
+
+
+def document(instance):
+    """(doc_type, object_id, {column: value}) of an instance."""
+    doc_type, build = INDEXED[type(instance)][:2]
+    values = build(instance)
+    values['title'] = (values['title'] or '')[:255]
+    values['subtitle'] = (values['subtitle'] or '')[:255]
+    return doc_type, instance.pk, values
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+def _upsert_documents(documents):
+    """
+    INSERT ... ON CONFLICT (doc_type, object_id) DO UPDATE for all documents,
+    one statement per batch (PostgreSQL and SQLite).
+    """
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for doc_type, object_id, values in documents:
+            SearchDocument.objects.update_or_create(doc_type=doc_type, object_id=object_id, defaults=values)
+        return
+
+    table = SearchDocument._meta.db_table
+    quote = connection.ops.quote_name
+    columns = ('doc_type', 'object_id') + DOCUMENT_COLUMNS + ('updated_at',)
+    vector = "to_tsvector('simple', %s)" if connection.vendor == 'postgresql' else 'NULL'
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + f', {vector})'
+    now = timezone.now()
+
+    for start in range(0, len(documents), BATCH_SIZE):
+        batch = documents[start:start + BATCH_SIZE]
+        params = []
+        for doc_type, object_id, values in batch:
+            row = {'doc_type': doc_type, 'object_id': object_id, 'updated_at': now, **values}
+            params.extend(
+                SearchDocument._meta.get_field(column).get_db_prep_value(row[column], connection)
+                for column in columns
+            )
+            if connection.vendor == 'postgresql':
+                params.append(values['search_text'])
+        assignments = ', '.join(
+            f'{quote(column)} = EXCLUDED.{quote(column)}'
+            for column in DOCUMENT_COLUMNS + ('updated_at', 'search_vector')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({', '.join(quote(column) for column in columns + ('search_vector',))})
+                VALUES {', '.join([row_sql] * len(batch))}
+                ON CONFLICT (doc_type, object_id) DO UPDATE SET {assignments}
+                """,
+                params
+            )
+
+
+def index_instance(instance):
+    """
+    Write an instance's document unless it is unchanged since the last write.
+    Returns whether it was written.
+    """
+    doc = document(instance)
+    if getattr(instance, SNAPSHOT_ATTR, None) == doc:
+        return False
+    _upsert_documents([doc])
+    setattr(instance, SNAPSHOT_ATTR, doc)
+    return True
+
+
+def remove_instance(instance):
+    doc_type = INDEXED[type(instance)][0]
+    SearchDocument.objects.filter(doc_type=doc_type, object_id=instance.pk).delete()
+    setattr(instance, SNAPSHOT_ATTR, None)
+
+
+@transaction.atomic
+def rebuild_search_index():
+    """
+    Rewrite every SearchDocument from the source tables.
+    Returns the number of documents written.
+    """
+    SearchDocument.objects.all().delete()
+    count = 0
+    for model, (doc_type, build, fields, related) in INDEXED.items():
+        queryset = model.objects.select_related(*related).order_by('pk')
+        batch = []
+        for instance in queryset.iterator(chunk_size=2000):
+            batch.append(document(instance))
+            if len(batch) >= BATCH_SIZE:
+                _upsert_documents(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            _upsert_documents(batch)
+            count += len(batch)
+    from .search_cache import invalidate
+    transaction.on_commit(invalidate)
+    logger.info(f'Rebuilt search index with {count} documents')
+    return count
+
+
+# ----------------------------------------------------------------------
+# Searching
+# ----------------------------------------------------------------------
+
+def prefix_tsquery(term):
+    """Raw tsquery matching every word of `term` as a prefix, e.g. 'asha:* & rao:*'."""
+    words = re.findall(r'\w+', term.lower())
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_documents(term, modules, per_type=RESULTS_PER_TYPE):
+    """
+    Documents matching `term` in the given modules, at most `per_type` of
+    each type, best matches first, in TYPE_ORDER. One query.
+    """
+    term = term.strip().lower()
+    queryset = SearchDocument.objects.filter(module__in=modules)
+
+    condition = Q(search_text__icontains=term)
+    rank = Value(0.0, output_field=FloatField())
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        raw = prefix_tsquery(term)
+        if raw:
+            query = SearchQuery(raw, search_type='raw', config='simple')
+            # Word prefixes via the tsvector index; substrings via the trigram index
+            condition = Q(search_vector=query) | condition if len(term) >= 3 else Q(search_vector=query)
+            rank = SearchRank(F('search_vector'), query)
+    if term.isdigit():
+        # An exact id outranks text matches
+        id_match = Q(doc_type__in=ID_SEARCH_TYPES, object_id=int(term))
+        condition |= id_match
+        rank = rank + Case(When(id_match, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+    rows = (
+        queryset.filter(condition)
+        .annotate(search_rank=rank)
+        .annotate(type_position=Window(
+            RowNumber(),
+            partition_by=[F('doc_type')],
+            order_by=[F('search_rank').desc(), F('occurred_at').desc(nulls_last=True), F('id').desc()],
+        ))
+        .filter(type_position__lte=per_type)
+    )
+    return sorted(rows, key=lambda row: (TYPE_ORDER.index(row.doc_type), row.type_position))
@@ -4,19 +4,73 @@ Global Search Service for Admin Portal.
 Provides unified search across all admin modules with RBAC filtering.
 """
 
-from django.db.models import Q
-from django.contrib.auth import get_user_model
-from django.db.models import Q
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+
+from . import search_cache, search_index
+from .search import (
+    BOOKING_SEARCH_FIELDS, PARTY_BOOKING_SEARCH_FIELDS, WAIVER_SEARCH_FIELDS, search_filter,
+)
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# Module searches in result order (live modes)
+MODULE_SEARCHES = (
+    ('bookings', '_search_bookings'),
+    ('users', '_search_users'),
+    ('payments', '_search_payments'),
+    ('vouchers', '_search_vouchers'),
+    ('waivers', '_search_waivers'),
+    ('campaigns', '_search_campaigns'),
+    ('messages', '_search_messages'),
+)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    """Process-wide pool for parallel searches; its size bounds the extra DB connections."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'GLOBAL_SEARCH_WORKERS', 4),
+                thread_name_prefix='global-search',
+            )
+        return _executor
+
+
+@contextmanager
+def _statement_timeout(milliseconds):
+    """Have PostgreSQL cancel the module's queries once the budget is spent."""
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET LOCAL statement_timeout = {int(milliseconds)}')
+        yield
+
 
 class GlobalSearchService:
     """
     Unified search service that searches across all admin modules.
     
-    Respects RBAC permissions and returns formatted results.
+    Respects RBAC permissions and returns formatted results. By default
+    (GLOBAL_SEARCH_MODE = 'index') results come from the SearchDocument
+    index in one query; 'live' queries each module's tables in turn and
+    'parallel' queries them concurrently within a time budget. Results are
+    cached briefly per role scope (see search_cache.py).
     """
     
     def __init__(self, user, query):
@@ -24,6 +78,11 @@ class GlobalSearchService:
         self.query = query.strip()
         self.allowed_modules = self._get_allowed_modules()
         self.results = []
+        # Set by parallel searches: modules left out for exceeding the time budget
+        self.partial = False
+        self.timed_out = []
+        # Searchable text per result (index mode), for the result cache's prefix refinement
+        self.result_texts = None
     
     def _get_allowed_modules(self):
         """Return list of modules user can search based on role."""
@@ -58,28 +117,83 @@ class GlobalSearchService:
         if len(self.query) < 2:
             return []
         
-        # Search each module if user has permission
-        if 'bookings' in self.allowed_modules:
-            self._search_bookings()
-        
-        if 'users' in self.allowed_modules:
-            self._search_users()
+        cached, generation = search_cache.lookup(self.allowed_modules, self.query)
+        if cached is not None:
+            self.results = cached
+            return self.results
         
-        if 'payments' in self.allowed_modules:
-            self._search_payments()
-        
-        if 'vouchers' in self.allowed_modules:
-            self._search_vouchers()
-        
-        if 'waivers' in self.allowed_modules:
-            self._search_waivers()
+        mode = getattr(settings, 'GLOBAL_SEARCH_MODE', 'index')
+        if mode == 'index':
+            self._search_index()
+        elif mode == 'parallel':
+            self._search_parallel()
+        else:
+            # Search each module if user has permission
+            for module, method in MODULE_SEARCHES:
+                if module in self.allowed_modules:
+                    getattr(self, method)()
         
-        if 'campaigns' in self.allowed_modules:
-            self._search_campaigns()
+        if not self.partial:
+            search_cache.store(generation, self.allowed_modules, self.query, self.results, self.result_texts)
+        return self.results
+    
+    def _search_parallel(self):
+        """
+        Run the module searches concurrently on the shared pool. Modules that
+        do not finish within GLOBAL_SEARCH_MODULE_TIMEOUT_MS are left out and
+        the result is flagged partial.
+        """
+        budget = getattr(settings, 'GLOBAL_SEARCH_MODULE_TIMEOUT_MS', 1500)
+        modules = [(module, method) for module, method in MODULE_SEARCHES if module in self.allowed_modules]
+        futures = {
+            module: _get_executor().submit(self._run_module, method, budget)
+            for module, method in modules
+        }
+        done, _ = wait(futures.values(), timeout=budget / 1000)
         
-        if 'messages' in self.allowed_modules:
-            self._search_messages()
+        for module, method in modules:
+            future = futures[module]
+            if future not in done:
+                future.cancel()  # No-op once started; the statement timeout ends it
+                self.timed_out.append(module)
+                continue
+            try:
+                self.results.extend(future.result())
+            except Exception as e:
+                logger.warning(f"Global search module {module} failed: {e}")
+                self.timed_out.append(module)
         
+        self.partial = bool(self.timed_out)
+        if self.partial:
+            logger.info(f"Global search '{self.query}' partial, skipped: {', '.join(self.timed_out)}")
+        return self.results
+    
+    def _run_module(self, method, budget):
+        """One module search on a pool thread, with its own connection and result list."""
+        close_old_connections()
+        try:
+            worker = copy.copy(self)
+            worker.results = []
+            with _statement_timeout(budget):
+                getattr(worker, method)()
+            return worker.results
+        finally:
+            close_old_connections()
+    
+    def _search_index(self):
+        """Search the SearchDocument index, limited to the user's modules in SQL."""
+        self.result_texts = []
+        for doc in search_index.search_documents(self.query, self.allowed_modules):
+            self.result_texts.append(doc.search_text)
+            subtitle = doc.subtitle
+            if doc.doc_type == 'message':
+                subtitle = f"{subtitle} • {self._get_time_ago(doc.occurred_at)}"
+            self.results.append({
+                'type': doc.doc_type,
+                'title': doc.title,
+                'subtitle': subtitle,
+                'route': doc.route
+            })
         return self.results
     
     def _search_bookings(self):
@@ -87,13 +201,9 @@ class GlobalSearchService:
         from apps.bookings.models import Booking, PartyBooking
 
         # Session bookings
-        session_bookings = Booking.objects.filter(
-            Q(booking_number__icontains=self.query) |
-            Q(name__icontains=self.query) |
-            Q(email__icontains=self.query) |
-            Q(phone__icontains=self.query) |
-            Q(id__icontains=self.query)
-        ).select_related('customer')[:5]
+        session_bookings = search_filter(
+            Booking.objects.select_related('customer'), BOOKING_SEARCH_FIELDS, self.query, rank=True
+        )[:5]
         
         for booking in session_bookings:
             self.results.append({
@@ -104,12 +214,8 @@ class GlobalSearchService:
             })
         
         # Party bookings
-        party_bookings = PartyBooking.objects.filter(
-            Q(booking_number__icontains=self.query) |
-            Q(name__icontains=self.query) |
-            Q(email__icontains=self.query) |
-            Q(phone__icontains=self.query) |
-            Q(id__icontains=self.query)
+        party_bookings = search_filter(
+            PartyBooking.objects.all(), PARTY_BOOKING_SEARCH_FIELDS, self.query, rank=True
         )[:5]
         
         for booking in party_bookings:
@@ -122,11 +228,8 @@ class GlobalSearchService:
     
     def _search_users(self):
         """Search admin users."""
-        users = User.objects.filter(
-            Q(username__icontains=self.query) |
-            Q(email__icontains=self.query) |
-            Q(first_name__icontains=self.query) |
-            Q(last_name__icontains=self.query)
+        users = search_filter(
+            User.objects.all(), ('username', 'email', 'first_name', 'last_name'), self.query
         )[:5]
         
         for user in users:
@@ -144,14 +247,12 @@ class GlobalSearchService:
         """Search payment records."""
         from apps.payments.models import Payment
 
-        payments = Payment.objects.filter(
-            Q(order_id__icontains=self.query) |
-            Q(payment_id__icontains=self.query) |
-            Q(booking__email__icontains=self.query) |
-            Q(booking__name__icontains=self.query) |
-            Q(party_booking__email__icontains=self.query) |
-            Q(party_booking__name__icontains=self.query)
-        ).select_related('booking', 'party_booking')[:5]
+        payments = search_filter(
+            Payment.objects.select_related('booking', 'party_booking'),
+            ('order_id', 'payment_id', 'booking__email', 'booking__name',
+             'party_booking__email', 'party_booking__name'),
+            self.query
+        )[:5]
         
         for payment in payments:
             customer_name = 'Unknown'
@@ -171,10 +272,7 @@ class GlobalSearchService:
         """Search voucher codes."""
         from apps.shop.models import Voucher
 
-        vouchers = Voucher.objects.filter(
-            Q(code__icontains=self.query) |
-            Q(description__icontains=self.query)
-        )[:5]
+        vouchers = search_filter(Voucher.objects.all(), ('code', 'description'), self.query)[:5]
         
         for voucher in vouchers:
             status = 'Active' if voucher.is_active else 'Inactive'
@@ -191,11 +289,11 @@ class GlobalSearchService:
         """Search waiver records."""
         from apps.bookings.models import Waiver
 
-        waivers = Waiver.objects.filter(
-            Q(name__icontains=self.query) |
-            Q(email__icontains=self.query) |
-            Q(booking__booking_number__icontains=self.query)
-        ).select_related('booking', 'party_booking')[:5]
+        waivers = search_filter(
+            Waiver.objects.select_related('booking', 'party_booking'),
+            WAIVER_SEARCH_FIELDS + ('booking__booking_number',),
+            self.query, rank=True
+        )[:5]
         
         for waiver in waivers:
             booking_ref = 'Walk-in'
@@ -217,17 +315,14 @@ class GlobalSearchService:
         """Search marketing campaigns."""
         try:
             from apps.marketing.models import MarketingCampaign as Campaign
-            campaigns = Campaign.objects.filter(
-                Q(name__icontains=self.query) |
-                Q(subject__icontains=self.query)
-            )[:5]
+            campaigns = search_filter(Campaign.objects.all(), ('title', 'subject'), self.query)[:5]
             
             for campaign in campaigns:
                 status = campaign.status if hasattr(campaign, 'status') else 'Draft'
                 
                 self.results.append({
                     'type': 'campaign',
-                    'title': campaign.name,
+                    'title': campaign.title,
                     'subtitle': f"Email • {status}",
                     'route': f'/admin/marketing/campaigns/{campaign.id}'
                 })
@@ -239,20 +334,18 @@ class GlobalSearchService:
         """Search contact messages."""
         try:
             from apps.cms.models import ContactMessage
-            messages = ContactMessage.objects.filter(
-                Q(name__icontains=self.query) |
-                Q(email__icontains=self.query) |
-                Q(subject__icontains=self.query) |
-                Q(message__icontains=self.query)
+            messages = search_filter(
+                ContactMessage.objects.all(), ('name', 'email', 'phone', 'message'), self.query
             )[:5]
             
             for message in messages:
                 time_ago = self._get_time_ago(message.created_at)
+                preview = message.message[:50] + '...' if len(message.message) > 50 else message.message
                 
                 self.results.append({
                     'type': 'message',
                     'title': message.name,
-                    'subtitle': f"{message.subject} • {time_ago}",
+                    'subtitle': f"{preview} • {time_ago}",
                     'route': f'/admin/messages/{message.id}'
                 })
         except Exception:
@@ -35,7 +35,8 @@ def global_search(request):
                     "route": "/admin/path/to/resource"
                 }
             ],
-            "count": 10
+            "count": 10,
+            "partial": false  // true when slow modules were left out (parallel mode)
         }
     
     Permissions:
@@ -62,7 +63,8 @@ def global_search(request):
         
         return Response({
             'results': results,
-            'count': len(results)
+            'count': len(results),
+            'partial': search_service.partial
         })
         
     except Exception as e:
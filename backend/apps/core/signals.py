@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from apps.bookings.models import Booking, PartyBooking
-from .models import Notification
+from apps.bookings.models import Booking, PartyBooking, Customer
+from .models import GlobalSettings, Notification
+from . import cache, metrics, search_cache, search_index
+# Connect the bookings app's receivers first: the repeat customer tracking
+# below reads the Customer stats they refresh on the same save
+import apps.bookings.signals  # noqa: F401
 
 @receiver(post_save, sender=Booking)
 def create_booking_notification(sender, instance, created, **kwargs):
@@ -47,3 +52,111 @@ try:
 except ImportError:
     # ContactMessage model doesn't exist yet
     pass
+
+
+# ----------------------------------------------------------------------
+# Daily metrics rollup (see metrics.py)
+# ----------------------------------------------------------------------
+
+def snapshot_daily_metrics(sender, instance, **kwargs):
+    """Remember what a loaded instance contributes, so saves only apply the difference"""
+    if not instance.get_deferred_fields().intersection(metrics.tracked_fields(sender)):
+        setattr(instance, metrics.SNAPSHOT_ATTR, metrics.contribution(instance))
+        if sender is Booking:
+            instance._metrics_customer_id = instance.customer_id
+
+
+def capture_daily_metrics(sender, instance, **kwargs):
+    """
+    Make sure the contribution before this save is known. New instances
+    contribute nothing yet; instances loaded with deferred fields are re-read.
+    """
+    if instance._state.adding:
+        setattr(instance, metrics.SNAPSHOT_ATTR, {})
+        instance._metrics_customer_id = None
+    elif not hasattr(instance, metrics.SNAPSHOT_ATTR):
+        previous = sender.objects.filter(pk=instance.pk).first()
+        setattr(instance, metrics.SNAPSHOT_ATTR, getattr(previous, metrics.SNAPSHOT_ATTR, {}))
+        instance._metrics_customer_id = getattr(previous, '_metrics_customer_id', None)
+
+
+def update_daily_metrics(sender, instance, created, update_fields=None, **kwargs):
+    """Apply the instance's change (create / cancel / reschedule / pay) to the rollup"""
+    if update_fields is not None and not set(update_fields).intersection(metrics.tracked_fields(sender)) \
+            and not (sender is Booking and 'customer' in update_fields):
+        return
+    old = getattr(instance, metrics.SNAPSHOT_ATTR, {})
+    new = metrics.contribution(instance)
+    metrics.sync_contribution(old, new)
+    setattr(instance, metrics.SNAPSHOT_ATTR, new)
+
+    if sender is Booking:
+        # A booking counts for its customer while it contributes (is not cancelled)
+        previous = getattr(instance, '_metrics_customer_id', None) if old else None
+        current = instance.customer_id if new else None
+        if previous != current:
+            metrics.customer_booking_changed(previous, instance, added=False)
+            metrics.customer_booking_changed(current, instance, added=True)
+        instance._metrics_customer_id = instance.customer_id
+
+
+def remove_daily_metrics(sender, instance, **kwargs):
+    """Take a deleted instance's contribution out of the rollup"""
+    if hasattr(instance, metrics.SNAPSHOT_ATTR):
+        old = getattr(instance, metrics.SNAPSHOT_ATTR)
+    else:
+        old = metrics.contribution(instance)
+    metrics.sync_contribution(old, {})
+    setattr(instance, metrics.SNAPSHOT_ATTR, {})
+    if sender is Booking and old:
+        metrics.customer_booking_changed(
+            getattr(instance, '_metrics_customer_id', instance.customer_id), instance, added=False
+        )
+
+
+for model in metrics.CONTRIBUTIONS:
+    post_init.connect(snapshot_daily_metrics, sender=model, dispatch_uid=f'daily_metrics_snapshot_{model.__name__}')
+    pre_save.connect(capture_daily_metrics, sender=model, dispatch_uid=f'daily_metrics_capture_{model.__name__}')
+    post_save.connect(update_daily_metrics, sender=model, dispatch_uid=f'daily_metrics_update_{model.__name__}')
+    post_delete.connect(remove_daily_metrics, sender=model, dispatch_uid=f'daily_metrics_remove_{model.__name__}')
+
+
+@receiver(pre_delete, sender=Customer)
+def remove_repeat_customer_metrics(sender, instance, **kwargs):
+    """A deleted repeat customer no longer counts (its bookings are unlinked without signals)"""
+    metrics.customer_deleted(instance)
+
+
+# ----------------------------------------------------------------------
+# Global search index and its result cache (see search_index.py, search_cache.py)
+# ----------------------------------------------------------------------
+
+def update_search_document(sender, instance, update_fields=None, **kwargs):
+    """Rewrite the record's search document when a field it shows or matches on changes"""
+    if update_fields is not None and not set(update_fields).intersection(search_index.tracked_fields(sender)):
+        return
+    if search_index.index_instance(instance):
+        # After commit, so a search racing the write cannot cache the old rows anew
+        transaction.on_commit(search_cache.invalidate)
+
+
+def remove_search_document(sender, instance, **kwargs):
+    search_index.remove_instance(instance)
+    transaction.on_commit(search_cache.invalidate)
+
+
+for model in search_index.INDEXED:
+    post_save.connect(update_search_document, sender=model, dispatch_uid=f'search_document_update_{model.__name__}')
+    post_delete.connect(remove_search_document, sender=model, dispatch_uid=f'search_document_remove_{model.__name__}')
+
+
+# ----------------------------------------------------------------------
+# Cached public settings (see GlobalSettingsViewSet.list)
+# ----------------------------------------------------------------------
+
+def invalidate_global_settings(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.invalidate('global-settings'))
+
+
+post_save.connect(invalidate_global_settings, sender=GlobalSettings, dispatch_uid='global_settings_cache_save')
+post_delete.connect(invalidate_global_settings, sender=GlobalSettings, dispatch_uid='global_settings_cache_delete')
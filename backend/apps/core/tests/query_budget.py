@@ -0,0 +1,155 @@
+"""
+Query budget harness for list endpoints.
+
+Each check seeds a small and a larger data set, calls the endpoint for both and
+requires the number of SQL queries to stay the same. When it grows, the failure
+lists the statements that repeat per row (the N+1), with one example each.
+
+Usage:
+    assert_constant_queries(
+        client.get, '/api/v1/bookings/bookings/',
+        seed=lambda n: [make_booking() for _ in range(n)],
+    )
+"""
+import re
+from collections import Counter
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+# Rows seeded for the two measurements. Any per-row query shows up as a
+# difference of at least LARGE - SMALL statements.
+SMALL = 2
+LARGE = 7
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SAVEPOINT = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b')
+
+
+def normalize_sql(sql):
+    """Replace literals so the same statement for different rows compares equal."""
+    return _LITERALS.sub('?', sql)
+
+
+def capture_queries(func, *args, **kwargs):
+    """Run func and return (result, [sql, ...]) without savepoint bookkeeping."""
+    with CaptureQueriesContext(connection) as ctx:
+        result = func(*args, **kwargs)
+    queries = [q['sql'] for q in ctx.captured_queries if not _SAVEPOINT.match(q['sql'])]
+    return result, queries
+
+
+def describe_growth(small_queries, large_queries):
+    """Explain which normalized statements ran more often for the larger data set."""
+    small_counts = Counter(normalize_sql(sql) for sql in small_queries)
+    large_counts = Counter(normalize_sql(sql) for sql in large_queries)
+    examples = {}
+    for sql in large_queries:
+        examples.setdefault(normalize_sql(sql), sql)
+
+    lines = []
+    for statement, count in large_counts.most_common():
+        grown = count - small_counts.get(statement, 0)
+        if grown > 0:
+            lines.append(f"  +{grown} x {examples[statement]}")
+    return '\n'.join(lines)
+
+
+def assert_constant_queries(request, path, seed, params=None, expected_status=200):
+    """
+    Fail unless `request(path, params)` issues the same number of queries for
+    SMALL and LARGE seeded rows.
+
+    Args:
+        request: Bound client method, e.g. staff_client().get
+        path: Endpoint URL
+        seed: Callable creating `n` more rows of whatever the endpoint lists
+        params: Optional query parameters
+        expected_status: Status code both calls must return
+    """
+    seed(SMALL)
+    response, small_queries = capture_queries(request, path, params or {})
+    assert response.status_code == expected_status, getattr(response, 'data', response)
+
+    seed(LARGE - SMALL)
+    response, large_queries = capture_queries(request, path, params or {})
+    assert response.status_code == expected_status, getattr(response, 'data', response)
+
+    if len(large_queries) != len(small_queries):
+        pytest.fail(
+            f"{path} is not O(1) in rows: {len(small_queries)} queries for {SMALL} rows, "
+            f"{len(large_queries)} for {LARGE}. Per-row statements:\n"
+            + describe_growth(small_queries, large_queries),
+            pytrace=False,
+        )
+    return len(large_queries)
+
+
+def staff_client(role='STAFF'):
+    """APIClient authenticated as a staff user (passes IsStaffUser)."""
+    from apps.core.models import User
+    user = User.objects.create(
+        username=f'budget-{role.lower()}',
+        email=f'budget-{role.lower()}@example.com',
+        name='Query Budget',
+        role=role,
+    )
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def seed_session_bookings(n):
+    """Create n session bookings, each with a customer, a signed waiver and a transaction."""
+    from datetime import time
+    from django.utils import timezone
+    from apps.bookings.models import Booking, Transaction, Waiver
+
+    today = timezone.localdate()
+    bookings = []
+    for i in range(n):
+        suffix = Booking.objects.count()
+        booking = Booking.objects.create(
+            name=f'Session Guest {suffix}',
+            email=f'session{suffix}@example.com',
+            phone='5550000',
+            date=today,
+            time=time(10 + suffix % 8, 0),
+            duration=60,
+            adults=1,
+            kids=1,
+            amount=1000,
+        )
+        Waiver.objects.create(name=booking.name, email=booking.email, booking=booking, customer=booking.customer)
+        Transaction.objects.create(
+            booking=booking, amount=booking.amount, transaction_id=f'TXN-{booking.id}', payment_method='CASH', status='PAID'
+        )
+        bookings.append(booking)
+    return bookings
+
+
+def seed_party_bookings(n):
+    """Create n party bookings, each with a customer and a signed waiver."""
+    from datetime import time
+    from django.utils import timezone
+    from apps.bookings.models import PartyBooking, Waiver
+
+    today = timezone.localdate()
+    bookings = []
+    for i in range(n):
+        suffix = PartyBooking.objects.count()
+        booking = PartyBooking.objects.create(
+            name=f'Party Host {suffix}',
+            email=f'party{suffix}@example.com',
+            phone='5550000',
+            date=today,
+            time=time(12, 0),
+            kids=10,
+            adults=2,
+            amount=5000,
+        )
+        Waiver.objects.create(name=booking.name, email=booking.email, party_booking=booking, customer=booking.customer)
+        bookings.append(booking)
+    return bookings
@@ -0,0 +1,123 @@
+"""
+Tests for the namespaced cache helper and the cached settings endpoint
+"""
+import threading
+import time
+
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIClient
+
+from apps.core import cache
+from apps.core.models import GlobalSettings
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    caches['default'].clear()
+    caches['local'].clear()
+    yield
+    caches['default'].clear()
+    caches['local'].clear()
+
+
+class TestNamespacedCache:
+
+    def test_invalidate_drops_only_its_namespace(self):
+        cache.set('pages', 'home', 1)
+        cache.set('faqs', 'all', 2)
+        cache.invalidate('pages')
+        assert cache.get('pages', 'home') is None
+        assert cache.get('faqs', 'all') == 2
+        assert cache.namespace_version('pages') == 2
+
+    def test_tuple_keys_and_cached_none(self):
+        calls = []
+        producer = lambda: calls.append(1)  # noqa: E731 - returns None
+        assert cache.get_or_set('pages', ('page', 'about'), producer) is None
+        assert cache.get_or_set('pages', ('page', 'about'), producer) is None
+        assert len(calls) == 1
+        assert cache.get('pages', 'missing', default='x') == 'x'
+
+    def test_add_only_stores_new_keys(self):
+        assert cache.add('locks', 'job', 'first', 60) is True
+        assert cache.add('locks', 'job', 'second', 60) is False
+        cache.delete('locks', 'job')
+        assert cache.add('locks', 'job', 'third', 60) is True
+
+    def test_concurrent_misses_run_the_producer_once(self):
+        calls = []
+
+        def producer():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('slow', 'key', producer)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ['value'] * 5
+        assert len(calls) == 1
+
+    def test_failed_producer_releases_the_lock(self):
+        def failing():
+            raise RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_set('pages', 'home', failing)
+        assert cache.get_or_set('pages', 'home', lambda: 'ok') == 'ok'
+
+    def test_two_level_reads_the_local_copy(self, settings):
+        settings.CACHE_TWO_LEVEL = True
+        cache.set('pages', 'home', 'v1')
+        # The shared copy going away does not matter while the local one lives
+        caches['default'].clear()
+        assert cache.get('pages', 'home') == 'v1'
+
+        caches['local'].clear()
+        assert cache.get('pages', 'home') is None
+
+        # Invalidation in this process is seen at once
+        cache.set('pages', 'home', 'v1')
+        cache.invalidate('pages')
+        assert cache.get('pages', 'home') is None
+
+    def test_backend_errors_are_cache_misses(self, monkeypatch):
+        class DownCache:
+            def __getattr__(self, name):
+                def fail(*args, **kwargs):
+                    raise ConnectionError('cache server unreachable')
+                return fail
+
+        monkeypatch.setattr(cache, '_shared', DownCache)
+        cache.set('pages', 'home', 'v1')
+        assert cache.get('pages', 'home', default='miss') == 'miss'
+        assert cache.get_or_set('pages', 'home', lambda: 'computed') == 'computed'
+        assert cache.add('pages', 'lock', 1, 10) is True
+        cache.delete('pages', 'home')
+        cache.invalidate('pages')
+        assert cache.namespace_version('pages') == 1
+
+
+@pytest.mark.django_db
+class TestGlobalSettingsCache:
+
+    def test_list_is_cached_until_save(self, django_assert_num_queries, django_capture_on_commit_callbacks):
+        settings_row = GlobalSettings.objects.create(park_name='Ninja Park')
+        client = APIClient()
+
+        first = client.get('/api/v1/core/settings/')
+        assert first.status_code == 200
+        with django_assert_num_queries(0):
+            assert client.get('/api/v1/core/settings/').json() == first.json()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            settings_row.park_name = 'Ninja Park Bangalore'
+            settings_row.save()
+        assert client.get('/api/v1/core/settings/').json()[0]['park_name'] == 'Ninja Park Bangalore'
@@ -0,0 +1,93 @@
+"""
+Tests for streaming exports
+"""
+import csv
+import io
+import pytest
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
+from apps.bookings.models import Booking
+from apps.emails.models import EmailLog
+from apps.payments.models import Payment
+from apps.core.tests.query_budget import staff_client, seed_session_bookings, seed_party_bookings
+
+
+def read_csv(response):
+    assert isinstance(response, StreamingHttpResponse)
+    content = b''.join(response.streaming_content).decode('utf-8')
+    return list(csv.reader(io.StringIO(content)))
+
+
+@pytest.mark.django_db
+class TestExports:
+
+    @pytest.mark.parametrize('name,expected', [
+        ('bookings', 3), ('party-bookings', 2), ('waivers', 5), ('customers', 5), ('payments', 3), ('email-logs', 1),
+    ])
+    def test_csv_export(self, name, expected):
+        for booking in seed_session_bookings(3):
+            Payment.objects.create(booking=booking, provider='MOCK', order_id=f'order_{booking.id}', amount=booking.amount)
+        seed_party_bookings(2)
+        EmailLog.objects.create(email_type='BOOKING_CONFIRMATION', recipient_email='a@example.com', subject='Hi', template_name='x.html')
+
+        response = staff_client().get(f'/api/v1/core/exports/{name}/')
+        assert response.status_code == 200
+        rows = read_csv(response)
+        assert len(rows) == expected + 1  # header
+
+    def test_bookings_export_applies_list_filters(self):
+        seed_session_bookings(3)
+        Booking.objects.filter(pk=Booking.objects.first().pk).update(booking_status='CANCELLED')
+        response = staff_client().get('/api/v1/core/exports/bookings/', {'status': 'CANCELLED'})
+        rows = read_csv(response)
+        assert len(rows) == 2
+        assert rows[1][13] == 'CANCELLED'
+
+    def test_export_query_count_is_constant(self):
+        seed_session_bookings(5)
+        client = staff_client()
+        response = client.get('/api/v1/core/exports/waivers/')
+        with CaptureQueriesContext(connection) as ctx:
+            rows = read_csv(response)
+        assert len(rows) == 6
+        assert len(ctx.captured_queries) <= 1
+
+    def test_legacy_waiver_export_keeps_its_layout(self):
+        seed_party_bookings(2)
+        session_booking = seed_session_bookings(1)[0]
+        client = staff_client()
+        response = client.get('/api/v1/bookings/waivers/export_csv/')
+        rows = read_csv(response)
+        assert rows[0] == [
+            'ID', 'Name', 'Email', 'Phone', 'Type', 'Signed Date', 'Booking Type', 'Booking ID', 'DOB', 'Emergency Contact',
+        ]
+        assert len(rows) == 4
+        assert {(row[6], row[7]) for row in rows[1:]} >= {('Session', str(session_booking.id))}
+        assert {row[6] for row in rows[1:]} == {'Session', 'Party'}
+
+        full = read_csv(client.get('/api/v1/core/exports/waivers/'))
+        assert full[0][6:8] == ['Session Booking ID', 'Party Booking ID'] and full[0][-1] == 'Verified'
+
+    def test_booking_export_skips_list_annotations(self):
+        seed_session_bookings(2)
+        seed_party_bookings(2)
+        client = staff_client()
+        for name in ('bookings', 'party-bookings'):
+            response = client.get(f'/api/v1/core/exports/{name}/')
+            with CaptureQueriesContext(connection) as ctx:
+                read_csv(response)
+            assert 'bookings_waiver' not in ctx.captured_queries[0]['sql']
+
+    def test_xlsx_export(self):
+        openpyxl = pytest.importorskip('openpyxl')
+        seed_session_bookings(2)
+        response = staff_client().get('/api/v1/core/exports/bookings/', {'file_type': 'xlsx'})
+        assert response.status_code == 200
+        workbook = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        assert workbook.active.max_row == 3
+
+    def test_unknown_export(self):
+        client = staff_client()
+        assert client.get('/api/v1/core/exports/nope/').status_code == 404
+        assert client.get('/api/v1/core/exports/bookings/', {'file_type': 'pdf'}).status_code == 400
@@ -0,0 +1,149 @@
+"""
+Tests for Idempotency-Key handling on booking and payment creation
+"""
+import hashlib
+from datetime import date, timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.bookings.models import Booking, PartyBooking
+from apps.core.idempotency import idempotent, purge_expired
+from apps.core.models import IdempotencyKey
+from apps.payments.models import Payment
+from apps.payments.gateways.transport import reset_transports
+
+BOOKING_DATE = date.today() + timedelta(days=7)
+
+
+def booking_payload(**kwargs):
+    data = {
+        'name': 'Retry Tester',
+        'email': 'retry@example.com',
+        'phone': '5550002',
+        'date': BOOKING_DATE.isoformat(),
+        'time': '12:00',
+        'duration': 60,
+        'adults': 1,
+        'kids': 0,
+        'amount': '899.00',
+    }
+    data.update(kwargs)
+    return data
+
+
+def key_hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def fresh_transports():
+    reset_transports()
+
+
+@pytest.mark.django_db
+class TestIdempotencyKey:
+
+    def test_retried_booking_create_is_replayed(self):
+        client = APIClient()
+        first = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        retry = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        assert first.status_code == retry.status_code == 201
+        assert retry.data == first.data
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert Booking.objects.count() == 1
+
+        # A new key is a new request
+        client.post('/api/v1/bookings/bookings/', booking_payload(time='13:00'), format='json', HTTP_IDEMPOTENCY_KEY='k-2')
+        assert Booking.objects.count() == 2
+
+    def test_key_reused_for_a_different_request(self):
+        client = APIClient()
+        client.post('/api/v1/bookings/bookings/', booking_payload(), format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        response = client.post('/api/v1/bookings/bookings/', booking_payload(adults=2), format='json',
+                               HTTP_IDEMPOTENCY_KEY='k-1')
+        assert response.status_code == 422
+        assert Booking.objects.count() == 1
+
+    def test_request_still_in_flight(self):
+        IdempotencyKey.objects.create(scope='booking-create:anon', key=key_hash('k-1'), fingerprint='x',
+                                      created_at=timezone.now())
+        response = APIClient().post('/api/v1/bookings/bookings/', booking_payload(), format='json',
+                                    HTTP_IDEMPOTENCY_KEY='k-1')
+        assert response.status_code == 409
+        assert not Booking.objects.exists()
+
+    def test_abandoned_and_expired_keys_are_taken_over(self, settings):
+        client = APIClient()
+        # In flight longer than the lock timeout: its worker died
+        IdempotencyKey.objects.create(scope='booking-create:anon', key=key_hash('k-1'), fingerprint='x',
+                                      created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT + 1))
+        response = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        assert response.status_code == 201
+
+        # Past the TTL a stored response is no longer replayed
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1))
+        response = client.post('/api/v1/bookings/bookings/', booking_payload(time='13:00'), format='json',
+                               HTTP_IDEMPOTENCY_KEY='k-1')
+        assert response.status_code == 201 and 'Idempotent-Replayed' not in response
+        assert Booking.objects.count() == 2
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1))
+        assert purge_expired() == 1
+        assert not IdempotencyKey.objects.exists()
+
+    @pytest.mark.parametrize('status_code, replayed', [(400, True), (409, False), (503, False)])
+    def test_stored_responses(self, status_code, replayed):
+        calls = []
+
+        @api_view(['POST'])
+        @permission_classes([AllowAny])
+        @idempotent('test')
+        def view(request):
+            calls.append(1)
+            return Response({'call': len(calls)}, status=status_code)
+
+        factory = APIRequestFactory()
+        responses = [
+            view(factory.post('/test/', {'a': 1}, format='json', HTTP_IDEMPOTENCY_KEY='s-1'))
+            for _ in range(2)
+        ]
+        assert [response.status_code for response in responses] == [status_code, status_code]
+        assert len(calls) == (1 if replayed else 2)
+        assert IdempotencyKey.objects.exists() == replayed
+
+    def test_party_booking_create(self):
+        payload = {
+            'name': 'Party Retry', 'email': 'party@example.com', 'phone': '5550003',
+            'date': BOOKING_DATE.isoformat(), 'time': '14:00', 'kids': 10, 'adults': 2, 'amount': '15000',
+        }
+        client = APIClient()
+        first = client.post('/api/v1/bookings/party-bookings/', payload, format='json', HTTP_IDEMPOTENCY_KEY='p-1')
+        retry = client.post('/api/v1/bookings/party-bookings/', payload, format='json', HTTP_IDEMPOTENCY_KEY='p-1')
+        assert first.status_code == 201 and retry.data['id'] == first.data['id']
+        assert PartyBooking.objects.count() == 1
+
+    def test_payment_order_is_created_once(self):
+        client = APIClient()
+        booking = client.post('/api/v1/bookings/bookings/', booking_payload(), format='json').data
+        order = {'booking_id': booking['id'], 'booking_type': 'session'}
+
+        first = client.post('/api/v1/payments/create-order/', order, format='json', HTTP_IDEMPOTENCY_KEY='o-1')
+        retry = client.post('/api/v1/payments/create-order/', order, format='json', HTTP_IDEMPOTENCY_KEY='o-1')
+        assert first.status_code == 200 and retry.data['order_id'] == first.data['order_id']
+        assert Payment.objects.count() == 1
+
+        verify = {'order_id': first.data['order_id']}
+        paid = client.post('/api/v1/payments/verify/', verify, format='json', HTTP_IDEMPOTENCY_KEY='v-1')
+        replay = client.post('/api/v1/payments/verify/', verify, format='json', HTTP_IDEMPOTENCY_KEY='v-1')
+        assert paid.data['success'] and replay.data == paid.data
+
+    def test_without_header_nothing_changes(self):
+        client = APIClient()
+        client.post('/api/v1/bookings/bookings/', booking_payload(), format='json')
+        client.post('/api/v1/bookings/bookings/', booking_payload(time='13:00'), format='json')
+        assert Booking.objects.count() == 2
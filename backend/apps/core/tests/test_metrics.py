@@ -0,0 +1,231 @@
+"""
+Tests for the daily metrics rollup
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from apps.bookings.models import Booking, Customer, PartyBooking, Waiver
+from apps.core.metrics import rebuild_daily_metrics
+from apps.core.models import DailyMetrics
+from apps.core.tests.query_budget import capture_queries, staff_client, seed_session_bookings, seed_party_bookings
+from apps.payments.models import Payment
+
+
+def rollup():
+    """{date: {field: value}} of the DailyMetrics table without empty rows."""
+    rows = {}
+    for row in DailyMetrics.objects.all():
+        values = {
+            field.name: getattr(row, field.name)
+            for field in DailyMetrics._meta.concrete_fields
+            if field.name not in ('id', 'date', 'updated_at') and getattr(row, field.name)
+        }
+        if values:
+            rows[row.date] = values
+    return rows
+
+
+def make_booking(email='guest@example.com', days_ahead=3, **kwargs):
+    data = dict(
+        name='Guest', email=email, phone='5550000',
+        date=timezone.localdate() + timedelta(days=days_ahead), time=time(11, 0),
+        duration=60, adults=2, kids=0, amount=Decimal('1798.00'),
+    )
+    data.update(kwargs)
+    return Booking.objects.create(**data)
+
+
+@pytest.mark.django_db
+class TestDailyMetricsSignals:
+
+    def test_booking_lifecycle_matches_rebuild(self):
+        booking = make_booking()
+        second = make_booking(days_ahead=5)  # same customer, now a repeat customer
+        party = PartyBooking.objects.create(
+            name='Host', email='host@example.com', phone='5550000',
+            date=timezone.localdate(), time=time(12, 0), package_name='Ninja', kids=8, amount=Decimal('6000.00'),
+        )
+        Waiver.objects.create(name='Guest', email='guest@example.com', booking=booking)
+        payment = Payment.objects.create(booking=booking, provider='MOCK', order_id='order_1', amount=booking.amount)
+        payment.status = 'SUCCESS'
+        payment.save()
+
+        # Reschedule, reprice, cancel and delete
+        booking.date = booking.date + timedelta(days=1)
+        booking.amount = Decimal('2500.00')
+        booking.save()
+        party.status = 'CANCELLED'
+        party.save()
+        second.delete()
+
+        live = rollup()
+        rebuild_daily_metrics()
+        assert live == rollup()
+
+    def test_values(self):
+        booking = make_booking()
+        make_booking(email='other@example.com')
+        day = rollup()[booking.date]
+        assert day['session_bookings'] == 2
+        assert day['session_revenue'] == Decimal('3596.00')
+        assert day['pending_waivers'] == 2
+
+        booking.booking_status = 'CANCELLED'
+        booking.save(update_fields=['booking_status'])
+        day = rollup()[booking.date]
+        assert day['session_bookings'] == 1
+        assert day['session_revenue'] == Decimal('1798.00')
+
+        today = rollup()[timezone.localdate()]
+        assert today['new_customers'] == 2
+        assert today['bookings_created'] == 1
+
+    def test_repeat_customers(self):
+        make_booking()
+        assert DailyMetrics.objects.filter(repeat_customers__gt=0).count() == 0
+        second = make_booking()
+        assert rollup()[timezone.localdate()]['repeat_customers'] == 1
+        second.delete()
+        assert 'repeat_customers' not in rollup()[timezone.localdate()]
+
+    def test_repeat_customer_day_and_cancellations_match_rebuild(self):
+        last_week = timezone.now() - timedelta(days=7)
+        first, second = make_booking(), make_booking(days_ahead=5)
+        Booking.objects.filter(pk__in=[first.pk, second.pk]).update(created_at=last_week)
+        rebuild_daily_metrics()
+        assert rollup()[timezone.localdate(last_week)]['repeat_customers'] == 1
+
+        # Cancelling the second booking ends it on the day it was credited
+        second = Booking.objects.get(pk=second.pk)
+        second.booking_status = 'CANCELLED'
+        second.save()
+        assert 'repeat_customers' not in rollup().get(timezone.localdate(last_week), {})
+        third = make_booking(days_ahead=6)
+        expected = rollup()
+        assert expected[timezone.localdate(third.created_at)]['repeat_customers'] == 1
+        rebuild_daily_metrics()
+        assert rollup() == expected
+
+    def test_repeat_customer_reads_stored_stats(self):
+        make_booking()
+        second, queries = capture_queries(lambda: make_booking(days_ahead=5))
+        assert not any(sql.startswith('SELECT COUNT(*)') for sql in queries)
+        customer = Customer.objects.get(email='guest@example.com')
+        assert customer.booking_count == 2
+        customer.delete()
+        assert 'repeat_customers' not in rollup().get(timezone.localdate(), {})
+
+    def test_deferred_instance_is_reread(self):
+        booking = make_booking()
+        loaded = Booking.objects.only('id', 'amount').get(pk=booking.pk)
+        loaded.amount = Decimal('100.00')
+        loaded.save(update_fields=['amount'])
+        assert rollup()[booking.date]['session_revenue'] == Decimal('100.00')
+
+    def test_customer_delete(self):
+        make_booking()
+        Customer.objects.get(email='guest@example.com').delete()
+        assert 'new_customers' not in rollup().get(timezone.localdate(), {})
+
+
+@pytest.mark.django_db
+class TestRebuildCommand:
+
+    def test_rebuild_repairs_bulk_updates(self):
+        booking = make_booking()
+        Booking.objects.filter(pk=booking.pk).update(booking_status='CANCELLED')  # bypasses signals
+        assert rollup()[booking.date]['session_bookings'] == 1
+        call_command('rebuild_daily_metrics')
+        assert booking.date not in rollup()
+
+    def test_if_empty(self):
+        booking = make_booking()
+        Booking.objects.filter(pk=booking.pk).update(amount=1)
+        call_command('rebuild_daily_metrics', '--if-empty')
+        assert rollup()[booking.date]['session_revenue'] == Decimal('1798.00')
+        DailyMetrics.objects.all().delete()
+        call_command('rebuild_daily_metrics', '--if-empty')
+        assert rollup()[booking.date]['session_revenue'] == Decimal('1.00')
+
+
+@pytest.mark.django_db
+class TestDashboardStats:
+
+    def test_stats_from_rollup(self):
+        seed_session_bookings(3)
+        seed_party_bookings(2)
+        make_booking(email='future@example.com', days_ahead=2)
+
+        client = staff_client()
+        response, queries = capture_queries(client.get, '/api/v1/core/dashboard/stats/')
+        assert response.status_code == 200
+        data = response.data
+        assert data['bookingsToday'] == 5
+        assert data['totalBookings'] == 6
+        assert data['sessionBookings'] == 4
+        assert data['partyBookings'] == 2
+        assert data['totalRevenue'] == Decimal('3000') + Decimal('10000') + Decimal('1798')
+        assert data['todayRevenue'] == 13000.0
+        assert data['monthlyRevenue'][-1]['total'] == 13000.0
+        assert data['thisWeekBookings'] == 6
+        assert data['totalCustomers'] == 6
+        assert data['newCustomersMonth'] == 6
+        assert data['totalWaivers'] == 5
+        assert len(data['recentBookings']) == 5
+        # Rollup totals + window, recent bookings, vouchers, content and messages
+        assert len(queries) <= 10, '\n'.join(queries)
+
+
+@pytest.mark.django_db
+class TestRevenueSeries:
+
+    URL = '/api/v1/core/dashboard/revenue-series/'
+
+    def test_daily_series_fills_gaps(self):
+        today = timezone.localdate()
+        make_booking(days_ahead=0, amount=Decimal('100.00'))
+        make_booking(email='b@example.com', days_ahead=-2, amount=Decimal('50.00'))
+        response = staff_client().get(self.URL, {
+            'from': (today - timedelta(days=3)).isoformat(), 'to': today.isoformat(),
+        })
+        assert response.status_code == 200
+        assert [point['revenue'] for point in response.data['series']] == [0, 50.0, 0, 100.0]
+        assert [point['count'] for point in response.data['series']] == [0, 1, 0, 1]
+        assert response.data['total'] == 150.0
+
+    def test_month_granularity_is_one_query(self):
+        start = (timezone.localdate() - timedelta(days=400)).replace(day=1)
+        for offset in (0, 40, 41, 390):
+            DailyMetrics.objects.create(date=start + timedelta(days=offset), session_revenue=10, session_bookings=1)
+
+        client = staff_client()
+        response, queries = capture_queries(client.get, self.URL, {
+            'from': start.isoformat(), 'to': (start + timedelta(days=399)).isoformat(), 'granularity': 'month',
+        })
+        assert response.status_code == 200
+        series = response.data['series']
+        assert series[0]['period'] == start.isoformat()
+        assert len(series) in (14, 15)
+        assert sum(point['revenue'] for point in series) == 40.0
+        assert max(point['count'] for point in series) == 2
+        assert len(queries) == 1, '\n'.join(queries)
+
+    def test_payments_source(self):
+        booking = make_booking(days_ahead=4)
+        payment = Payment.objects.create(booking=booking, provider='MOCK', order_id='order_series', amount=booking.amount)
+        payment.status = 'SUCCESS'
+        payment.save()
+        response = staff_client().get(self.URL, {'source': 'payments', 'granularity': 'week'})
+        assert response.status_code == 200
+        assert response.data['total'] == 1798.0
+
+    @pytest.mark.parametrize('params', [
+        {'granularity': 'hour'}, {'source': 'vouchers'}, {'from': 'yesterday'},
+        {'from': '2024-02-01', 'to': '2024-01-01'}, {'from': '2000-01-01', 'to': '2024-01-01'},
+    ])
+    def test_invalid_params(self, params):
+        assert staff_client().get(self.URL, params).status_code == 400
@@ -0,0 +1,134 @@
+"""
+Tests for opt-in keyset pagination
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from apps.bookings.models import Booking, PartyBooking
+from apps.core.pagination import KeysetPagination
+from apps.core.tests.query_budget import staff_client, seed_session_bookings, seed_party_bookings
+
+
+def collect_pages(client, url, **params):
+    """Follow next_cursor until exhausted, returning every result row."""
+    rows = []
+    response = client.get(url, {'paginate': 'cursor', **params})
+    while True:
+        assert response.status_code == 200, response.data
+        rows.extend(response.data['results'])
+        if not response.data['next_cursor']:
+            return rows
+        response = client.get(url, {'cursor': response.data['next_cursor'], **params})
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+
+    def test_leading_field_bound_for_the_index(self):
+        created = timezone.now()
+        sql = str(Booking.objects.filter(KeysetPagination().keyset_q((created, 10))).query)
+        assert '"created_at" <= ' in sql and '"created_at" < ' in sql and ' AND (' in sql
+
+        paginator = KeysetPagination(ordering=('date', '-id'))
+        sql = str(Booking.objects.filter(paginator.keyset_q((created.date(), 10))).query)
+        assert '"date" >= ' in sql
+
+    def test_plain_array_by_default(self):
+        seed_session_bookings(3)
+        response = staff_client().get('/api/v1/bookings/bookings/')
+        assert isinstance(response.data, list)
+        assert len(response.data) == 3
+
+    def test_pages_cover_every_row_once_with_ties(self):
+        seed_session_bookings(7)
+        # Same created_at for several rows: id must break the tie
+        Booking.objects.filter(id__lte=4).update(created_at=timezone.now())
+        rows = collect_pages(staff_client(), '/api/v1/bookings/bookings/', page_size=2)
+        ids = [row['id'] for row in rows]
+        assert sorted(ids) == sorted(Booking.objects.values_list('id', flat=True))
+        assert len(ids) == len(set(ids))
+
+    def test_accept_header_enables_pagination(self):
+        seed_party_bookings(3)
+        response = staff_client().get(
+            '/api/v1/bookings/waivers/', {'page_size': 2},
+            HTTP_ACCEPT='application/json; pagination=cursor'
+        )
+        assert response.status_code == 200
+        assert len(response.data['results']) == 2
+        assert response.data['next_cursor']
+
+    def test_customers_and_party_bookings(self):
+        seed_session_bookings(3)
+        seed_party_bookings(3)
+        client = staff_client()
+        assert len(collect_pages(client, '/api/v1/bookings/customers/', page_size=2)) == 6
+        assert len(collect_pages(client, '/api/v1/bookings/party-bookings/', page_size=2)) == 3
+
+    def test_all_bookings_merges_both_tables(self):
+        seed_session_bookings(4)
+        seed_party_bookings(3)
+        now = timezone.now()
+        Booking.objects.update(created_at=now)
+        PartyBooking.objects.update(created_at=now)
+        rows = collect_pages(staff_client(), '/api/v1/core/dashboard/all_bookings/', page_size=3)
+        keys = [(row['type'], row['id']) for row in rows]
+        assert len(keys) == 7
+        assert len(set(keys)) == 7
+
+    def test_pages_follow_the_requested_ordering(self):
+        bookings = seed_session_bookings(5)
+        for days, booking in zip((3, 1, 4, 1, 5), bookings):
+            Booking.objects.filter(pk=booking.pk).update(date=timezone.localdate() + timedelta(days=days))
+        client = staff_client()
+        expected = list(Booking.objects.order_by('-date', 'id').values_list('id', flat=True))
+        rows = collect_pages(client, '/api/v1/bookings/bookings/', page_size=2, ordering='-date')
+        assert [row['id'] for row in rows] == expected
+        assert [row['id'] for row in client.get('/api/v1/bookings/bookings/', {'ordering': '-date'}).data] == expected
+
+        response = client.get('/api/v1/bookings/bookings/', {'ordering': 'email'})
+        assert response.status_code == 400
+
+    def test_invalid_cursor(self):
+        response = staff_client().get('/api/v1/bookings/bookings/', {'cursor': 'not-a-cursor'})
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestAllBookingsFeed:
+
+    def test_single_union_query_newest_first(self):
+        seed_session_bookings(2)
+        seed_party_bookings(2)
+        response = staff_client().get('/api/v1/core/dashboard/all_bookings/')
+        assert response.data['count'] == 4
+        created = [row['created_at'] for row in response.data['results']]
+        assert created == sorted(created, reverse=True)
+        party = next(row for row in response.data['results'] if row['type'] == 'PARTY')
+        assert party['duration'] == 120
+        assert 'package_name' in party
+        assert party['customer']['email'] == party['email']
+
+    def test_filters_and_limit_run_in_sql(self):
+        seed_session_bookings(3)
+        seed_party_bookings(3)
+        client = staff_client()
+        response = client.get('/api/v1/core/dashboard/all_bookings/', {'type': 'party', 'limit': 2})
+        assert response.data['count'] == 3
+        assert [row['type'] for row in response.data['results']] == ['PARTY', 'PARTY']
+
+        response = client.get('/api/v1/core/dashboard/all_bookings/', {'search': 'session1@'})
+        assert [row['email'] for row in response.data['results']] == ['session1@example.com']
+
+    def test_default_and_max_limit(self, monkeypatch):
+        from apps.core.views import DashboardViewSet
+        monkeypatch.setattr(DashboardViewSet, 'ALL_BOOKINGS_DEFAULT_LIMIT', 2)
+        monkeypatch.setattr(DashboardViewSet, 'ALL_BOOKINGS_MAX_LIMIT', 3)
+        seed_session_bookings(5)
+        client = staff_client()
+        response = client.get('/api/v1/core/dashboard/all_bookings/')
+        assert response.data['count'] == 5 and len(response.data['results']) == 2
+        response = client.get('/api/v1/core/dashboard/all_bookings/', {'limit': 50, 'offset': 1})
+        assert len(response.data['results']) == 3
+        assert client.get('/api/v1/core/dashboard/all_bookings/', {'limit': 0}).status_code == 400
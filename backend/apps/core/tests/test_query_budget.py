@@ -0,0 +1,22 @@
+"""
+Query budget tests for dashboard endpoints
+"""
+import pytest
+from apps.core.tests.query_budget import (
+    assert_constant_queries, staff_client, seed_session_bookings, seed_party_bookings,
+)
+
+
+def seed_bookings(n):
+    seed_session_bookings(n)
+    seed_party_bookings(n)
+
+
+@pytest.mark.django_db
+class TestDashboardQueryBudget:
+
+    def test_dashboard_stats(self):
+        assert_constant_queries(staff_client().get, '/api/v1/core/dashboard/stats/', seed_bookings)
+
+    def test_dashboard_all_bookings(self):
+        assert_constant_queries(staff_client().get, '/api/v1/core/dashboard/all_bookings/', seed_bookings)
@@ -0,0 +1,43 @@
+"""
+Tests for the opt-in query diagnostics middleware
+"""
+import pytest
+from apps.core.tests.query_budget import capture_queries, staff_client, seed_session_bookings
+
+BOOKINGS_URL = '/api/v1/bookings/bookings/'
+
+
+@pytest.mark.django_db
+class TestQueryDiagnostics:
+
+    def test_disabled_by_default(self, settings):
+        settings.QUERY_DIAGNOSTICS = False
+        settings.QUERY_DIAGNOSTICS_ALLOW_HEADER = False
+        seed_session_bookings(3)
+        client = staff_client()
+        response, queries = capture_queries(client.get, BOOKINGS_URL, HTTP_X_QUERY_DIAGNOSTICS='1')
+        assert response.status_code == 200
+        assert 'X-Query-Count' not in response
+        # Booking list + transactions prefetch, no debug COUNT(*) queries
+        assert not [sql for sql in queries if 'COUNT(' in sql]
+
+    def test_header_enables_diagnostics(self, settings, caplog):
+        settings.QUERY_DIAGNOSTICS_ALLOW_HEADER = True
+        seed_session_bookings(2)
+        client = staff_client()
+        with caplog.at_level('INFO', logger='apps.query_diagnostics'):
+            response = client.get(BOOKINGS_URL, HTTP_X_QUERY_DIAGNOSTICS='1')
+        assert response.status_code == 200
+        assert int(response['X-Query-Count']) > 0
+        assert any('queries in' in record.message for record in caplog.records)
+
+    def test_header_ignored_unless_allowed(self, settings):
+        settings.QUERY_DIAGNOSTICS = False
+        settings.QUERY_DIAGNOSTICS_ALLOW_HEADER = False
+        response = staff_client().get(BOOKINGS_URL, HTTP_X_QUERY_DIAGNOSTICS='1')
+        assert 'X-Query-Count' not in response
+
+    def test_setting_enables_for_all_requests(self, settings):
+        settings.QUERY_DIAGNOSTICS = True
+        response = staff_client().get(BOOKINGS_URL)
+        assert 'X-Query-Time-Ms' in response
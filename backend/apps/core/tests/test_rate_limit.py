@@ -0,0 +1,124 @@
+"""
+Tests for the rate limiting middleware
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from apps.core.middleware.rate_limit import hit, parse_rate
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestHit:
+
+    def test_fixed_limit_within_window(self):
+        now = 1000.0
+        assert [hit('test', 3, 60, now=now)[0] for _ in range(4)] == [True, True, True, False]
+        allowed, retry_after = hit('test', 3, 60, now=now)
+        assert not allowed and retry_after == 20  # window 960..1020
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(4):
+            hit('test', 4, 60, now=1019.0)  # fills window 960..1020
+        # 5 s into the next window 55/60 of the previous count still apply
+        assert hit('test', 4, 60, now=1025.0)[0] is False
+        # 55 s in, only 5/60 does
+        assert hit('test', 4, 60, now=1075.0)[0] is True
+
+    def test_concurrent_hits_are_all_counted(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: hit('burst', 50, 60, now=2000.0)[0], range(200)))
+        assert results.count(True) == 50
+
+    def test_overhead(self):
+        started = time.perf_counter()
+        for i in range(1000):
+            hit(f'speed:{i % 10}', 10 ** 6, 60)
+        assert (time.perf_counter() - started) / 1000 < 0.0005
+
+    def test_cache_errors_let_requests_through(self, monkeypatch):
+        def broken(*args, **kwargs):
+            raise ConnectionError('cache down')
+
+        monkeypatch.setattr(cache, 'incr', broken)
+        monkeypatch.setattr(cache, 'add', broken)
+        assert [hit('down', 1, 60, now=1000.0)[0] for _ in range(3)] == [True, True, True]
+
+    def test_parse_rate(self):
+        assert parse_rate('5/60') == (5, 60)
+        assert parse_rate('10') == (10, 60)
+        assert parse_rate('0/60') is None
+        assert parse_rate('') is None
+
+
+@pytest.mark.django_db
+class TestRateLimitMiddleware:
+
+    def test_voucher_validate_policy(self, settings):
+        settings.RATE_LIMITS = {'voucher_validate': '2/60'}
+        client = APIClient()
+        statuses = [
+            client.post('/api/v1/shop/vouchers/validate/', {'code': 'NOPE'}, format='json').status_code
+            for _ in range(3)
+        ]
+        assert 429 not in statuses[:2] and statuses[2] == 429
+        response = client.post('/api/v1/shop/vouchers/validate/', {'code': 'NOPE'}, format='json')
+        assert int(response['Retry-After']) >= 1
+
+        # Other clients and other routes are unaffected
+        other = client.post('/api/v1/shop/vouchers/validate/', {'code': 'NOPE'}, format='json',
+                            HTTP_X_FORWARDED_FOR='203.0.113.9:51234')
+        assert other.status_code != 429
+        assert client.get('/api/v1/shop/vouchers/').status_code != 429
+
+    def test_forwarded_port_is_ignored(self, settings):
+        settings.RATE_LIMITS = {'login': '1/60'}
+        client = APIClient()
+        first = client.post('/api/token/', {}, format='json', HTTP_X_FORWARDED_FOR='203.0.113.5:1000')
+        second = client.post('/api/token/', {}, format='json', HTTP_X_FORWARDED_FOR='203.0.113.5:2000')
+        assert first.status_code != 429
+        assert second.status_code == 429
+        assert 'login attempts' in second.json()['error']
+
+    def test_clients_behind_the_trusted_frontend_are_counted_apart(self, settings):
+        settings.RATE_LIMITS = {'voucher_validate': '1/60'}
+        settings.RATE_LIMIT_TRUSTED_PROXIES = ['10.0.0.0/24']
+        client = APIClient()
+
+        def validate(forwarded_for):
+            return client.post('/api/v1/shop/vouchers/validate/', {'code': 'NOPE'}, format='json',
+                               HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        # The frontend server (10.0.0.5) relays two visitors
+        assert validate('198.51.100.1:4000, 10.0.0.5:5000') != 429
+        assert validate('198.51.100.2:4001, 10.0.0.5:5000') != 429
+        assert validate('198.51.100.1:4002, 10.0.0.5:5001') == 429
+
+        # A spoofed entry left of an untrusted hop is ignored
+        assert validate('198.51.100.3, 203.0.113.7') != 429
+        assert validate('198.51.100.4, 203.0.113.7') == 429
+
+    def test_default_trusted_proxies_cover_private_frontends(self, settings):
+        settings.RATE_LIMITS = {'booking_create': '1/60'}
+        # getForwardedHeaders() relays the visitor's X-Forwarded-For from a
+        # frontend on the same host / private network; no proxy setting needed
+        client = APIClient()
+
+        def create(forwarded_for, remote_addr='172.18.0.3'):
+            return client.post('/api/v1/bookings/bookings/', {}, format='json', REMOTE_ADDR=remote_addr,
+                               HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        assert create('198.51.100.1:4000') != 429
+        assert create('198.51.100.2:4001, 10.1.2.3') != 429
+        assert create('198.51.100.1:4002, 127.0.0.1, 192.168.1.10') == 429
+        assert create('198.51.100.3, [::1]:8000', remote_addr='::1') != 429
+        assert create('198.51.100.3, 172.18.0.3') == 429
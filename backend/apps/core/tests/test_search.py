@@ -0,0 +1,286 @@
+"""
+Tests for the admin search backends
+"""
+import time as time_module
+from datetime import time, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from apps.bookings.models import Booking, Waiver
+from apps.core import search, search_index
+from apps.core.models import SearchDocument
+from apps.core.search import (
+    BOOKING_SEARCH_FIELDS, SearchBackend, TrigramSearchBackend, get_search_backend, search_filter,
+)
+from apps.core.search_service import GlobalSearchService
+from apps.core.tests.query_budget import capture_queries, staff_client
+from apps.shop.models import Voucher
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(settings):
+    """Result caching is tested on its own (TestSearchCache)"""
+    settings.GLOBAL_SEARCH_CACHE_TTL = 0
+    cache.clear()
+
+
+def make_booking(name='Asha Rao', email='asha@example.com', phone='9876543210'):
+    return Booking.objects.create(
+        name=name, email=email, phone=phone,
+        date=timezone.localdate() + timedelta(days=2), time=time(11, 0),
+        duration=60, adults=1, kids=0, amount=Decimal('899.00'),
+    )
+
+
+def matches(term):
+    return set(search_filter(Booking.objects.all(), BOOKING_SEARCH_FIELDS, term).values_list('name', flat=True))
+
+
+@pytest.mark.django_db
+class TestSearchFilter:
+
+    def test_text_fields(self):
+        make_booking()
+        make_booking(name='Vikram Shah', email='vikram@example.org', phone='9123400000')
+        assert matches('rao') == {'Asha Rao'}
+        assert matches('EXAMPLE.ORG') == {'Vikram Shah'}
+        assert matches('91234') == {'Vikram Shah'}
+        assert matches('  ') == {'Asha Rao', 'Vikram Shah'}
+
+    def test_booking_number_uuid_and_id(self):
+        booking = make_booking()
+        other = make_booking(name='Vikram Shah', email='vikram@example.org', phone='5550000')
+        assert matches(booking.booking_number) == {'Asha Rao'}
+        assert matches(str(other.uuid)[:8]) == {'Vikram Shah'}
+        # Ids match exactly, not as a substring of other ids or text
+        assert set(search_filter(Booking.objects.all(), ('id',), str(other.id)).values_list('id', flat=True)) == {other.id}
+        assert not search_filter(Booking.objects.all(), ('id', 'uuid'), 'rao').exists()
+
+    def test_backend_selection(self, settings):
+        settings.SEARCH_BACKEND = 'basic'
+        assert type(get_search_backend()) is SearchBackend
+        settings.SEARCH_BACKEND = 'trigram'
+        assert type(get_search_backend()) is TrigramSearchBackend
+        settings.SEARCH_BACKEND = 'auto'
+        assert type(get_search_backend()) is SearchBackend  # SQLite in tests
+
+    def test_pg_trgm_check_is_per_connection(self):
+        fake = SimpleNamespace(vendor='postgresql', connection=object(), ensure_connection=lambda: None,
+                               cursor=mock.MagicMock())
+        cursor = fake.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None
+        with mock.patch.object(search, 'connection', fake):
+            assert type(get_search_backend()) is SearchBackend
+            assert type(get_search_backend()) is SearchBackend
+            assert cursor.execute.call_count == 1
+
+            # Extension installed, then the connection is reopened
+            cursor.fetchone.return_value = (1,)
+            fake.connection = object()
+            assert type(get_search_backend()) is TrigramSearchBackend
+            assert cursor.execute.call_count == 2
+
+    def test_trigram_short_terms_match_substrings(self):
+        q = TrigramSearchBackend().filter_q(Booking, ('name',), 'as')
+        assert q.children == [('name__icontains', 'as')]
+        q = TrigramSearchBackend().filter_q(Booking, ('name',), 'ash')
+        assert q.children == [('name__icontains', 'ash')]
+
+
+@pytest.mark.django_db
+class TestSearchEndpoints:
+
+    def test_list_endpoints(self):
+        booking = make_booking()
+        make_booking(name='Vikram Shah', email='vikram@example.org', phone='5550000')
+        Waiver.objects.create(name='Asha Rao', email='asha@example.com', phone='9876543210', booking=booking)
+        Waiver.objects.create(name='Vikram Shah', email='vikram@example.org')
+
+        client = staff_client()
+        response = client.get('/api/v1/bookings/bookings/', {'search': 'asha'})
+        assert [row['name'] for row in response.data] == ['Asha Rao']
+        response = client.get('/api/v1/bookings/waivers/', {'search': '98765'})
+        assert [row['name'] for row in response.data] == ['Asha Rao']
+        response = client.get('/api/v1/bookings/customers/', {'search': 'vikram'})
+        assert [row['name'] for row in response.data] == ['Vikram Shah']
+        response = client.get('/api/v1/core/dashboard/all_bookings/', {'search': 'example.org'})
+        assert [row['name'] for row in response.data['results']] == ['Vikram Shah']
+
+    def test_global_search(self):
+        booking = make_booking()
+        from apps.core.models import User
+        user = User.objects.create(username='search-admin', email='search-admin@example.com', role='ADMIN')
+        results = GlobalSearchService(user, booking.booking_number).search_all()
+        assert {'type': 'booking', 'title': 'Asha Rao'}.items() <= results[0].items()
+        assert GlobalSearchService(user, 'asha@').search_all()[0]['route'] == f'/admin/session-bookings/{booking.id}'
+
+
+@pytest.mark.django_db
+class TestSearchIndex:
+
+    def make_user(self, role):
+        from apps.core.models import User
+        return User.objects.create(
+            username=f'index-{role.lower()}', email=f'index-{role.lower()}@example.com',
+            first_name='Index', last_name=role.title(), role=role,
+        )
+
+    def test_signals_keep_documents_current(self):
+        booking = make_booking()
+        Waiver.objects.create(name='Asha Rao', email='asha@example.com', booking=booking)
+        doc = SearchDocument.objects.get(doc_type='booking', object_id=booking.id)
+        assert doc.title == 'Asha Rao'
+        assert booking.booking_number.lower() in doc.search_text
+        assert SearchDocument.objects.get(doc_type='waiver').subtitle == f'Signed • {booking.booking_number}'
+
+        booking.name = 'Asha Menon'
+        booking.save()
+        doc.refresh_from_db()
+        assert doc.title == 'Asha Menon'
+
+        booking.delete()
+        assert not SearchDocument.objects.filter(doc_type='booking').exists()
+
+    def test_roles_are_filtered_in_one_query(self):
+        make_booking(name='Index Guest', email='guest@example.com')
+        Voucher.objects.create(code='INDEX10', discount_type='PERCENTAGE', discount_value=10)
+        admin, staff = self.make_user('ADMIN'), self.make_user('STAFF')
+
+        results, queries = capture_queries(GlobalSearchService(admin, 'index').search_all)
+        assert [result['type'] for result in results] == ['booking', 'user', 'user', 'voucher']
+        assert len(queries) == 1, '\n'.join(queries)
+
+        results = GlobalSearchService(staff, 'index').search_all()
+        assert [result['type'] for result in results] == ['booking']
+
+    def test_limit_per_type_and_exact_ids(self):
+        bookings = [make_booking(name=f'Guest {i}', email=f'guest{i}@example.com') for i in range(7)]
+        user = self.make_user('ADMIN')
+        results = GlobalSearchService(user, 'guest').search_all()
+        assert len(results) == 5
+        target = bookings[-1]
+        docs = search_index.search_documents(str(target.id), ['bookings'])
+        assert (docs[0].doc_type, docs[0].object_id) == ('booking', target.id)
+
+    def test_rebuild_and_live_mode_agree(self, settings):
+        booking = make_booking()
+        Booking.objects.filter(pk=booking.pk).update(name='Bulk Renamed')  # bypasses signals
+        call_command('rebuild_search_index')
+        user = self.make_user('ADMIN')
+        indexed = GlobalSearchService(user, 'renamed').search_all()
+        settings.GLOBAL_SEARCH_MODE = 'live'
+        assert GlobalSearchService(user, 'renamed').search_all() == indexed
+        assert indexed[0]['title'] == 'Bulk Renamed'
+
+
+@pytest.mark.django_db(transaction=True)
+class TestParallelSearch:
+    """Pool threads use their own connections, so the data must be committed"""
+
+    def make_admin(self):
+        from apps.core.models import User
+        return User.objects.create(username='parallel-admin', email='parallel-admin@example.com', role='ADMIN')
+
+    def test_matches_serial_results(self, settings):
+        make_booking()
+        Voucher.objects.create(code='ASHA50', discount_type='FIXED', discount_value=50)
+        admin = self.make_admin()
+        settings.GLOBAL_SEARCH_MODE = 'live'
+        serial = GlobalSearchService(admin, 'asha').search_all()
+        settings.GLOBAL_SEARCH_MODE = 'parallel'
+        service = GlobalSearchService(admin, 'asha')
+        assert service.search_all() == serial
+        assert [result['type'] for result in serial] == ['booking', 'voucher']
+        assert service.partial is False
+
+    def test_slow_module_is_left_out(self, settings, monkeypatch):
+        make_booking()
+        admin = self.make_admin()
+        settings.GLOBAL_SEARCH_MODE = 'parallel'
+        settings.GLOBAL_SEARCH_MODULE_TIMEOUT_MS = 200
+        monkeypatch.setattr(GlobalSearchService, '_search_messages', lambda self: time_module.sleep(1))
+
+        started = time_module.monotonic()
+        service = GlobalSearchService(admin, 'asha')
+        results = service.search_all()
+        assert time_module.monotonic() - started < 0.9
+        assert [result['type'] for result in results] == ['booking']
+        assert service.partial is True
+        assert service.timed_out == ['messages']
+
+
+@pytest.mark.django_db
+class TestSearchCache:
+
+    @pytest.fixture(autouse=True)
+    def enable_cache(self, settings):
+        settings.GLOBAL_SEARCH_CACHE_TTL = 30
+
+    def make_user(self, role):
+        from apps.core.models import User
+        return User.objects.create(username=f'cache-{role.lower()}', email=f'cache-{role.lower()}@example.com', role=role)
+
+    def test_repeat_and_refined_queries_skip_the_database(self):
+        make_booking()
+        make_booking(name='Ashok Kumar', email='ashok@example.com', phone='5550000')
+        staff = self.make_user('STAFF')
+        first = GlobalSearchService(staff, 'ash').search_all()
+        assert len(first) == 2
+
+        results, queries = capture_queries(GlobalSearchService(staff, 'ASH ').search_all)
+        assert results == first
+        assert queries == []
+
+        results, queries = capture_queries(GlobalSearchService(staff, 'asho').search_all)
+        assert [result['title'] for result in results] == ['Ashok Kumar']
+        assert queries == []
+
+    def test_short_prefix_is_not_refined(self):
+        make_booking(name='Ashok Kumar', email='ashok@example.com')
+        staff = self.make_user('STAFF')
+        GlobalSearchService(staff, 'as').search_all()
+        _, queries = capture_queries(GlobalSearchService(staff, 'ash').search_all)
+        assert len(queries) == 1
+
+    def test_full_prefix_is_not_refined(self):
+        for i in range(5):
+            make_booking(name=f'Ash {i}', email=f'ash{i}@example.com')
+        staff = self.make_user('STAFF')
+        assert len(GlobalSearchService(staff, 'ash').search_all()) == 5
+        _, queries = capture_queries(GlobalSearchService(staff, 'ash 4').search_all)
+        assert len(queries) == 1
+
+    def test_scoped_by_role(self):
+        Voucher.objects.create(code='CACHE10', discount_type='PERCENTAGE', discount_value=10)
+        admin, staff = self.make_user('ADMIN'), self.make_user('STAFF')
+        assert [result['type'] for result in GlobalSearchService(admin, 'cache10').search_all()] == ['voucher']
+        assert GlobalSearchService(staff, 'cache10').search_all() == []
+
+    def test_writes_invalidate(self, django_capture_on_commit_callbacks):
+        staff = self.make_user('STAFF')
+        assert GlobalSearchService(staff, 'asha').search_all() == []
+        with django_capture_on_commit_callbacks(execute=True):
+            booking = make_booking()
+        assert [result['title'] for result in GlobalSearchService(staff, 'asha').search_all()] == ['Asha Rao']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            booking.delete()
+        assert GlobalSearchService(staff, 'asha').search_all() == []
+
+    def test_cache_errors_fall_back_to_the_database(self, monkeypatch):
+        make_booking()
+        staff = self.make_user('STAFF')
+
+        def broken(*args, **kwargs):
+            raise ConnectionError('cache server unreachable')
+
+        monkeypatch.setattr(cache, 'get_many', broken)
+        monkeypatch.setattr(cache, 'set', broken)
+        for _ in range(2):
+            assert [result['title'] for result in GlobalSearchService(staff, 'asha').search_all()] == ['Asha Rao']
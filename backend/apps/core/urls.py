@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet, GlobalSettingsViewSet, DashboardViewSet, LogoViewSet, NotificationViewSet
 from .search_views import global_search
+from .export_views import export_data
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -13,5 +14,6 @@ router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 urlpatterns = [
     path('', include(router.urls)),
     path('admin/search/', global_search, name='global-search'),  # Global admin search
+    path('exports/<str:name>/', export_data, name='export-data'),  # Streaming CSV/XLSX exports
 ]
 
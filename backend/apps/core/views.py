@@ -2,17 +2,20 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg, Q
-from datetime import timedelta
+from django.db.models import Sum, Count, Q, F
+from datetime import date, timedelta
+import logging
 
-from .models import User, GlobalSettings, Logo, Notification
+from .models import User, GlobalSettings, Logo, Notification, DailyMetrics
 from .serializers import UserSerializer, GlobalSettingsSerializer, LogoSerializer, NotificationSerializer
+from .pagination import KeysetPagination
+from . import aggregates, booking_feed, cache, metrics
 
-from apps.bookings.models import Booking, Waiver, Customer, PartyBooking
-from apps.bookings.serializers import BookingSerializer, PartyBookingSerializer
 from apps.shop.models import Voucher
 from apps.cms.models import Activity, Faq, Banner
 
+logger = logging.getLogger(__name__)
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -73,6 +76,14 @@ class GlobalSettingsViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
 
+    def list(self, request, *args, **kwargs):
+        """Public site settings, read on every page load; cached until a save (see signals.py)"""
+        data = cache.get_or_set(
+            'global-settings', 'list',
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+        )
+        return Response(data)
+
     @action(detail=False, methods=['post', 'get'])
     def fix_db_schema(self, request):
         """Force run bookings migration manually"""
@@ -155,89 +166,78 @@ class DashboardViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        today = timezone.now().date()
+        """
+        Dashboard figures. Booking, revenue, waiver and customer numbers come
+        from the DailyMetrics rollup (totals plus the rows of the last few weeks),
+        so the cost does not grow with booking history.
+        """
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
         first_day_of_month = today.replace(day=1)
+        week_ago = today - timedelta(days=7)
+        two_weeks_ago = today - timedelta(days=14)
 
-        # Session Bookings (Standard Booking model)
-        session_bookings_today = Booking.objects.filter(date=today).exclude(status='CANCELLED').count()
-        total_session_bookings = Booking.objects.exclude(status='CANCELLED').count()
-        session_revenue = Booking.objects.exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-
-        # Party Bookings (New PartyBooking model)
-        party_bookings_today = PartyBooking.objects.filter(date=today).exclude(status='CANCELLED').count()
-        total_party_bookings = PartyBooking.objects.exclude(status='CANCELLED').count()
-        party_revenue = PartyBooking.objects.exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
+        totals = metrics.metrics_totals()
+        days = metrics.metrics_by_day(min(first_day_of_month, two_weeks_ago), today)
 
-        # Aggregated Stats
-        bookings_today = session_bookings_today + party_bookings_today
-        total_bookings = total_session_bookings + total_party_bookings
-        total_revenue = session_revenue + party_revenue
+        def day_total(day, *fields):
+            row = days.get(day)
+            return sum(getattr(row, field) for field in fields) if row else 0
 
-        # Waivers
-        pending_waivers = Booking.objects.filter(waiver_status='PENDING').exclude(status='CANCELLED').count()
-        pending_party_waivers = PartyBooking.objects.filter(waiver_signed=False).exclude(status='CANCELLED').count()
-        total_pending_waivers = pending_waivers + pending_party_waivers
+        def range_total(start, end, *fields):
+            """Sum of fields over start <= day < end"""
+            return sum(
+                getattr(row, field)
+                for day, row in days.items() if start <= day < end
+                for field in fields
+            )
 
-        total_waivers = Waiver.objects.count()
-        signed_waivers = total_waivers 
-
-        # Recent Bookings (Combine and Sort)
-        recent_sessions = Booking.objects.select_related('customer').order_by('-created_at')[:5]
-        recent_parties = PartyBooking.objects.select_related('customer').order_by('-created_at')[:5]
-        
-        # Manually construct data instead of using serializers
-        recent_sessions_data = [{
-            'id': b.id,
-            'uuid': str(b.uuid),
-            'name': b.name,
-            'email': b.email,
-            'type': 'SESSION',
-            'amount': b.amount,
-            'date': b.date.isoformat() if b.date else None,
-            'time': str(b.time) if b.time else None,
-            'status': b.booking_status,
-            'created_at': b.created_at.isoformat()
-        } for b in recent_sessions]
-        
-        recent_parties_data = [{
-            'id': b.id,
-            'uuid': str(b.uuid),
-            'name': b.name,
-            'email': b.email,
-            'type': 'PARTY',
-            'amount': b.amount,
-            'date': b.date.isoformat() if b.date else None,
-            'time': str(b.time) if b.time else None,
-            'status': b.status,
-            'created_at': b.created_at.isoformat()
-        } for b in recent_parties]
-        
-        all_recent = sorted(
-            recent_sessions_data + recent_parties_data, 
-            key=lambda x: x.get('created_at', ''), 
-            reverse=True
-        )[:5]
+        # Bookings (session + party, cancelled excluded)
+        total_session_bookings = totals['session_bookings']
+        total_party_bookings = totals['party_bookings']
+        total_bookings = total_session_bookings + total_party_bookings
+        total_revenue = totals['session_revenue'] + totals['party_revenue']
+        bookings_today = day_total(today, 'session_bookings', 'party_bookings')
+        total_pending_waivers = totals['pending_waivers']
+
+        total_waivers = totals['waivers']
+        signed_waivers = total_waivers
+
+        # Recent Bookings (newest five across both tables)
+        all_recent = [{
+            'id': row['id'],
+            'uuid': str(row['uuid']),
+            'name': row['name'],
+            'email': row['email'],
+            'type': row['row_type'],
+            'amount': row['amount'],
+            'date': row['date'].isoformat() if row['date'] else None,
+            'time': str(row['time']) if row['time'] else None,
+            'status': row['row_booking_status'],
+            'created_at': row['created_at'].isoformat()
+        } for row in booking_feed.build_feed()[:5]]
 
         # Revenue Chart (last 7 days)
         monthly_revenue = []
         for i in range(6, -1, -1):
             d = today - timedelta(days=i)
-            day_session_revenue = Booking.objects.filter(date=d).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-            day_party_revenue = PartyBooking.objects.filter(date=d).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-            
             monthly_revenue.append({
                 "name": d.strftime('%a'),
-                "total": float(day_session_revenue + day_party_revenue)  # Convert Decimal to float
+                "total": float(day_total(d, 'session_revenue', 'party_revenue'))  # Convert Decimal to float
             })
 
         # Customers
-        total_customers = Customer.objects.count()
-        new_customers_month = Customer.objects.filter(created_at__gte=first_day_of_month).count()
-        repeat_customers = Customer.objects.annotate(booking_count=Count('bookings')).filter(booking_count__gt=1).count()
+        total_customers = totals['new_customers']
+        new_customers_month = range_total(first_day_of_month, today + timedelta(days=1), 'new_customers')
+        repeat_customers = totals['repeat_customers']
 
         # Vouchers
-        active_vouchers = Voucher.objects.filter(is_active=True).count()
-        total_voucher_redemptions = Voucher.objects.aggregate(Sum('used_count'))['used_count__sum'] or 0
+        vouchers = Voucher.objects.aggregate(
+            active=Count('id', filter=Q(is_active=True)),
+            redemptions=Sum('used_count'),
+        )
+        active_vouchers = vouchers['active']
+        total_voucher_redemptions = vouchers['redemptions'] or 0
 
         # Content
         total_activities = Activity.objects.filter(active=True).count()
@@ -256,33 +256,18 @@ class DashboardViewSet(viewsets.ViewSet):
         # Unread Contact Messages
         from apps.cms.models import ContactMessage
         unread_messages = ContactMessage.objects.filter(is_read=False).count()
-        latest_message = ContactMessage.objects.filter(is_read=False).order_by('-created_at').first()
+        latest_message = ContactMessage.objects.filter(is_read=False).order_by('-created_at').first() if unread_messages else None
         latest_message_preview = None
         if latest_message:
             latest_message_preview = f"{latest_message.name}: {latest_message.message[:50]}..." if len(latest_message.message) > 50 else f"{latest_message.name}: {latest_message.message}"
         
-        # Today's Revenue
-        today_session_revenue = Booking.objects.filter(date=today).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        today_party_revenue = PartyBooking.objects.filter(date=today).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        today_revenue = today_session_revenue + today_party_revenue
-        
-        # Yesterday's Revenue for comparison
-        yesterday = today - timedelta(days=1)
-        yesterday_session_revenue = Booking.objects.filter(date=yesterday).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        yesterday_party_revenue = PartyBooking.objects.filter(date=yesterday).exclude(status='CANCELLED').aggregate(Sum('amount'))['amount__sum'] or 0
-        yesterday_revenue = yesterday_session_revenue + yesterday_party_revenue
-        
-        # Booking Trend (This week vs Last week)
-        week_ago = today - timedelta(days=7)
-        two_weeks_ago = today - timedelta(days=14)
-        
-        this_week_session = Booking.objects.filter(created_at__gte=week_ago).exclude(status='CANCELLED').count()
-        this_week_party = PartyBooking.objects.filter(created_at__gte=week_ago).exclude(status='CANCELLED').count()
-        this_week_bookings = this_week_session + this_week_party
+        # Today's Revenue, and Yesterday's for comparison
+        today_revenue = day_total(today, 'session_revenue', 'party_revenue')
+        yesterday_revenue = day_total(yesterday, 'session_revenue', 'party_revenue')
         
-        last_week_session = Booking.objects.filter(created_at__gte=two_weeks_ago, created_at__lt=week_ago).exclude(status='CANCELLED').count()
-        last_week_party = PartyBooking.objects.filter(created_at__gte=two_weeks_ago, created_at__lt=week_ago).exclude(status='CANCELLED').count()
-        last_week_bookings = last_week_session + last_week_party
+        # Booking Trend (This week vs Last week, by creation date)
+        this_week_bookings = range_total(week_ago, today + timedelta(days=1), 'bookings_created')
+        last_week_bookings = range_total(two_weeks_ago, week_ago, 'bookings_created')
         
         # Calculate growth percentage
         booking_growth = 0
@@ -322,108 +307,123 @@ class DashboardViewSet(viewsets.ViewSet):
             "bookingGrowth": booking_growth,
         })
     
+    # Longest range the revenue series accepts (about ten years)
+    MAX_SERIES_DAYS = 3660
+
+    # source -> (DailyMetrics revenue expression, count expression)
+    SERIES_SOURCES = {
+        'bookings': (F('session_revenue') + F('party_revenue'), F('session_bookings') + F('party_bookings')),
+        'payments': (F('payments_amount'), F('payments')),
+    }
+
+    @action(detail=False, methods=['get'], url_path='revenue-series')
+    def revenue_series(self, request):
+        """
+        Revenue over time for charts.
+
+        GET /api/v1/core/dashboard/revenue-series/?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month&source=bookings|payments
+
+        source=bookings (default) is booking revenue by booking date, cancelled
+        bookings excluded; source=payments is successful payments by payment date.
+        Defaults to the last 30 days by day. One grouped query over the
+        DailyMetrics rollup whatever the range; empty periods are returned as 0.
+        """
+        today = timezone.localdate()
+        try:
+            end_param = request.query_params.get('to')
+            start_param = request.query_params.get('from')
+            end_date = date.fromisoformat(end_param) if end_param else today
+            start_date = date.fromisoformat(start_param) if start_param else end_date - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be dates in YYYY-MM-DD format'},
+                status=400
+            )
+
+        granularity = request.query_params.get('granularity', 'day')
+        source = request.query_params.get('source', 'bookings')
+        if granularity not in aggregates.GRANULARITIES:
+            return Response(
+                {'error': f"granularity must be one of: {', '.join(aggregates.GRANULARITIES)}"},
+                status=400
+            )
+        if source not in self.SERIES_SOURCES:
+            return Response(
+                {'error': f"source must be one of: {', '.join(self.SERIES_SOURCES)}"},
+                status=400
+            )
+        if end_date < start_date:
+            return Response({'error': 'to must not be before from'}, status=400)
+        if (end_date - start_date).days > self.MAX_SERIES_DAYS:
+            return Response(
+                {'error': f'Date range cannot exceed {self.MAX_SERIES_DAYS} days'},
+                status=400
+            )
+
+        revenue, count = self.SERIES_SOURCES[source]
+        series = aggregates.time_series(
+            DailyMetrics.objects.all(),
+            {'revenue': Sum(revenue), 'count': Sum(count)},
+            start_date, end_date,
+            date_field='date',
+            granularity=granularity,
+        )
+        return Response({
+            'from': start_date.isoformat(),
+            'to': end_date.isoformat(),
+            'granularity': granularity,
+            'source': source,
+            'total': float(sum(values['revenue'] for _, values in series)),
+            'series': [{
+                'period': period.isoformat(),
+                'revenue': float(values['revenue']),
+                'count': values['count'],
+            } for period, values in series],
+        })
+
+    # all_bookings page size without ?limit=, and the largest ?limit= accepted
+    ALL_BOOKINGS_DEFAULT_LIMIT = 100
+    ALL_BOOKINGS_MAX_LIMIT = 1000
+
     @action(detail=False, methods=['get'])
     def all_bookings(self, request):
         """
         Unified endpoint that returns both session and party bookings combined with customer data
+
+        Rows come from one UNION ALL query ordered by created_at (see booking_feed).
+        ?limit= (default ALL_BOOKINGS_DEFAULT_LIMIT, at most ALL_BOOKINGS_MAX_LIMIT)
+        &offset=, or opt-in cursor pages (?paginate=cursor).
         """
         booking_type = request.query_params.get('type', None)
         status = request.query_params.get('status', None)
         search = request.query_params.get('search', None)
         
-        all_bookings_data = []
+        # Opt-in cursor pages
+        paginator = KeysetPagination(ordering=booking_feed.FEED_ORDERING)
+        if paginator.is_requested(request):
+            page_size, position = paginator.start(request)
+            feed = booking_feed.build_feed(booking_type, status, search, paginator=paginator, position=position)
+            page = paginator.paginate_rows(list(feed[:page_size + 1]), page_size)
+            return paginator.get_paginated_response([booking_feed.format_row(row) for row in page])
         
         try:
-            # Fetch session bookings
-            if booking_type != 'party':
-                session_bookings = Booking.objects.select_related('customer').all()
-                if status:
-                    session_bookings = session_bookings.filter(booking_status=status)
-                if search:
-                    session_bookings = session_bookings.filter(
-                        Q(name__icontains=search) | Q(email__icontains=search)
-                    )
-                
-                for booking in session_bookings:
-                    try:
-                        all_bookings_data.append({
-                            'id': booking.id,
-                            'uuid': str(booking.uuid),
-                            'type': 'SESSION',
-                            'name': booking.name,
-                            'email': booking.email,
-                            'phone': booking.phone,
-                            'date': str(booking.date) if booking.date else None,
-                            'time': str(booking.time) if booking.time else None,
-                            'duration': booking.duration,
-                            'adults': booking.adults,
-                            'kids': booking.kids,
-                            'spectators': booking.spectators,
-                            'amount': float(booking.amount) if booking.amount else 0,
-                            'booking_status': booking.booking_status,
-                            'payment_status': booking.payment_status,
-                            'waiver_status': booking.waiver_status,
-                            'created_at': booking.created_at.isoformat() if booking.created_at else None,
-                            'customer': {
-                                'id': booking.customer.id if booking.customer else None,
-                                'name': booking.customer.name if booking.customer else booking.name,
-                                'email': booking.customer.email if booking.customer else booking.email,
-                                'phone': booking.customer.phone if booking.customer else booking.phone,
-                            } if booking.customer or booking.name else None
-                        })
-                    except Exception as e:
-                        print(f"Error serializing session booking {booking.id}: {e}")
-            
-            # Fetch party bookings
-            if booking_type != 'session':
-                party_bookings = PartyBooking.objects.select_related('customer').all()
-                if status:
-                    party_bookings = party_bookings.filter(status=status)
-                if search:
-                    party_bookings = party_bookings.filter(
-                        Q(name__icontains=search) | Q(email__icontains=search)
-                    )
-                
-                for booking in party_bookings:
-                    try:
-                        all_bookings_data.append({
-                            'id': booking.id,
-                            'uuid': str(booking.uuid),
-                            'type': 'PARTY',
-                            'name': booking.name,
-                            'email': booking.email,
-                            'phone': booking.phone,
-                            'date': str(booking.date) if booking.date else None,
-                            'time': str(booking.time) if booking.time else None,
-                            'duration': 120,  # Default party duration
-                            'adults': booking.adults,
-                            'kids': booking.kids,
-                            'spectators': 0,  # Not tracked for party bookings
-                            'amount': float(booking.amount) if booking.amount else 0,
-                            'booking_status': booking.status,
-                            'payment_status': 'PENDING',  # Not tracked separately for party bookings
-                            'waiver_status': 'SIGNED' if booking.waiver_signed else 'PENDING',
-                            'created_at': booking.created_at.isoformat() if booking.created_at else None,
-                            'birthday_child_name': booking.birthday_child_name,
-                            'birthday_child_age': booking.birthday_child_age,
-                            'package_name': booking.package_name,
-                            'customer': {
-                                'id': booking.customer.id if booking.customer else None,
-                                'name': booking.customer.name if booking.customer else booking.name,
-                                'email': booking.customer.email if booking.customer else booking.email,
-                                'phone': booking.customer.phone if booking.customer else booking.phone,
-                            } if booking.customer or booking.name else None
-                        })
-                    except Exception as e:
-                        print(f"Error serializing party booking {booking.id}: {e}")
-            
-            # Sort by created_at (most recent first)
-            all_bookings_data.sort(key=lambda x: x['created_at'] or '', reverse=True)
+            limit = int(request.query_params.get('limit', self.ALL_BOOKINGS_DEFAULT_LIMIT))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=400)
+        if limit < 1 or offset < 0:
+            return Response({'error': 'limit must be positive and offset not negative'}, status=400)
+        limit = min(limit, self.ALL_BOOKINGS_MAX_LIMIT)
+        
+        try:
+            feed = booking_feed.build_feed(booking_type, status, search)
+            count = feed.count()
+            rows = feed[offset:offset + limit]
             
             return Response({
-                'count': len(all_bookings_data),
-                'results': all_bookings_data
+                'count': count,
+                'results': [booking_feed.format_row(row) for row in rows]
             })
         except Exception as e:
-            print(f"Error in all_bookings: {e}")
+            logger.error(f"Error in all_bookings: {e}")
             return Response({'error': str(e)}, status=500)
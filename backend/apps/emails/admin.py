@@ -22,6 +22,7 @@ class EmailLogAdmin(admin.ModelAdmin):
     
     list_filter = [
         'status',
+        'queued',
         'email_type',
         'created_at',
         'sent_at',
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.emails.tasks import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Send outbox emails (pending EmailLogs and failed ones due for a retry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox (every EMAIL_OUTBOX_POLL_SECONDS) instead of exiting',
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            count = send_queued_emails()
+            self.stdout.write(self.style.SUCCESS(f'Sent {count} queued email(s)'))
+            return
+
+        self.stdout.write('Sending queued emails...')
+        while True:
+            close_old_connections()
+            if not send_queued_emails():
+                time.sleep(settings.EMAIL_OUTBOX_POLL_SECONDS)
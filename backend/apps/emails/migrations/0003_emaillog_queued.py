@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0002_alter_emaillog_email_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='queued',
+            field=models.BooleanField(default=False, help_text='Delivered by the outbox worker (send_queued_emails)'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['queued', 'status', 'created_at'], name='emails_emai_queued_905d79_idx'),
+        ),
+    ]
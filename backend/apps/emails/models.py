@@ -67,6 +67,12 @@ class EmailLog(models.Model):
         help_text="Azure message ID for tracking"
     )
     
+    # Outbox: sent later by send_queued_emails instead of by the caller
+    queued = models.BooleanField(
+        default=False,
+        help_text="Delivered by the outbox worker (send_queued_emails)"
+    )
+    
     # Retry Logic
     retry_count = models.IntegerField(
         default=0,
@@ -129,6 +135,7 @@ class EmailLog(models.Model):
             models.Index(fields=['email_type', 'created_at']),
             models.Index(fields=['recipient_email']),
             models.Index(fields=['next_retry_at']),
+            models.Index(fields=['queued', 'status', 'created_at']),
         ]
     
     def __str__(self):
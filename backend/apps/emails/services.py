@@ -43,7 +43,8 @@ class EmailService:
         context: Dict[str, Any],
         booking=None,
         party_booking=None,
-        contact_message=None
+        contact_message=None,
+        deliver: bool = True
     ) -> EmailLog:
         """
         Send an email and create EmailLog entry.
@@ -58,6 +59,8 @@ class EmailService:
             booking: Optional Booking instance
             party_booking: Optional PartyBooking instance
             contact_message: Optional ContactMessage instance
+            deliver: False only queues the EmailLog in the outbox (PENDING,
+                queued=True); send_queued_emails delivers it later
         
         Returns:
             EmailLog instance
@@ -88,11 +91,16 @@ class EmailService:
             template_name=template_name,
             context_data=serializable_context,  # Use serializable version
             status='PENDING',
+            queued=not deliver,
             booking=booking,
             party_booking=party_booking,
             contact_message=contact_message,
         )
         
+        if not deliver:
+            logger.info(f"Email queued: {email_type} to {recipient_email} (EmailLog {email_log.id})")
+            return email_log
+        
         # Check if emails are enabled
         if not self.enabled:
             logger.info(f"Email disabled by feature flag: {email_type} to {recipient_email}")
@@ -212,12 +220,13 @@ class EmailService:
         
         return render_to_string(template_name, context)
     
-    def send_booking_confirmation(self, booking):
+    def send_booking_confirmation(self, booking, deliver=True):
         """
         Send session booking confirmation email.
         
         Args:
             booking: Booking instance
+            deliver: False queues it in the outbox instead of sending now
         """
         logger.error(f"CREATING EMAILLOG FOR BOOKING {booking.id}")
         
@@ -242,7 +251,8 @@ class EmailService:
             subject=f'Booking Confirmation - Ninja Inflatable Park',
             template_name='emails/booking/session_confirmation.html',
             context=context,
-            booking=booking
+            booking=booking,
+            deliver=deliver
         )
         
         logger.error(f"EMAILLOG CREATED ID={email_log.id} STATUS={email_log.status}")
@@ -253,12 +263,13 @@ class EmailService:
         
         return email_log
     
-    def send_party_booking_confirmation(self, party_booking):
+    def send_party_booking_confirmation(self, party_booking, deliver=True):
         """
         Send party booking confirmation email.
         
         Args:
             party_booking: PartyBooking instance
+            deliver: False queues it in the outbox instead of sending now
         """
         logger.error(f"CREATING EMAILLOG FOR PARTY BOOKING {party_booking.id}")
         
@@ -284,7 +295,8 @@ class EmailService:
             subject=f'Party Booking Confirmation - Ninja Inflatable Park',
             template_name='emails/booking/party_confirmation.html',
             context=context,
-            party_booking=party_booking
+            party_booking=party_booking,
+            deliver=deliver
         )
         
         logger.error(f"EMAILLOG CREATED ID={email_log.id} STATUS={email_log.status}")
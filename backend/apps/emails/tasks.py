@@ -132,3 +132,55 @@ def send_party_booking_confirmation_email(party_booking_id):
         
     except Exception as e:
         logger.error(f"[TASK] ❌ Failed to send party booking confirmation for {party_booking_id}: {str(e)}")
+
+
+def queue_booking_confirmation_email(booking):
+    """
+    Write the session or party booking confirmation to the outbox.
+    
+    Only inserts a queued PENDING EmailLog, so it is safe inside a payment
+    transaction: the row commits or rolls back with the payment, and no
+    mail provider call happens while its row locks are held.
+    send_queued_emails delivers it.
+    
+    Args:
+        booking: Booking or PartyBooking instance
+    """
+    from apps.bookings.models import PartyBooking
+    
+    if isinstance(booking, PartyBooking):
+        return email_service.send_party_booking_confirmation(booking, deliver=False)
+    return email_service.send_booking_confirmation(booking, deliver=False)
+
+
+def send_queued_emails(limit=50):
+    """
+    Deliver outbox emails: queued PENDING ones and queued FAILED ones due
+    for a retry. Emails sent inline (queued=False) are left to their
+    callers, so they are never sent twice.
+    
+    Each row is locked (skipping rows another worker holds) while it is
+    sent, so concurrent workers never send the same email twice.
+    
+    Returns:
+        Number of emails attempted
+    """
+    from django.db import transaction
+    from django.db.models import F, Q
+    
+    now = timezone.now()
+    due = list(
+        EmailLog.objects.filter(queued=True).filter(
+            Q(status='PENDING') |
+            Q(status='FAILED', retry_count__lt=F('max_retries'), next_retry_at__lte=now)
+        ).order_by('created_at').values_list('id', flat=True)[:limit]
+    )
+    attempted = 0
+    for email_log_id in due:
+        with transaction.atomic():
+            email_log = EmailLog.objects.select_for_update(skip_locked=True).filter(id=email_log_id).first()
+            if email_log is None or not (email_log.status == 'PENDING' or email_log.can_retry()):
+                continue
+            send_email_async(email_log_id)
+            attempted += 1
+    return attempted
@@ -0,0 +1,91 @@
+"""
+Tests for the email outbox used by payment confirmations
+"""
+from decimal import Decimal
+
+import pytest
+
+from apps.core.tests.query_budget import seed_session_bookings
+from apps.emails.models import EmailLog
+from apps.emails.services import email_service
+from apps.emails.tasks import send_queued_emails
+from apps.payments.models import Payment
+from apps.payments.services import payment_service
+
+
+@pytest.fixture
+def azure(settings, monkeypatch):
+    """Record sends instead of calling Azure."""
+    settings.EMAIL_BOOKING_ENABLED = True
+    monkeypatch.setattr(email_service, 'enabled', True)
+    monkeypatch.setattr(email_service, 'debug_mode', False)
+    sent = []
+
+    def send(recipient_email, subject, html_content):
+        sent.append(recipient_email)
+        return f'msg-{len(sent)}'
+
+    monkeypatch.setattr(email_service, '_send_via_azure', send)
+    return sent
+
+
+@pytest.mark.django_db
+class TestEmailOutbox:
+
+    def test_payment_queues_confirmation_without_sending(self, azure, django_capture_on_commit_callbacks):
+        booking = seed_session_bookings(1)[0]
+        Payment.objects.create(booking=booking, provider='MOCK', order_id='MOCK_ORDER_1', amount=Decimal('1000.00'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            result = payment_service.verify_and_complete_payment('MOCK_ORDER_1', {'order_id': 'MOCK_ORDER_1'})
+        assert result['success'] and result['payment_status'] == 'PAID'
+        assert azure == []
+
+        email_log = EmailLog.objects.get()
+        assert (email_log.email_type, email_log.status, email_log.booking_id) == ('BOOKING_CONFIRMATION', 'PENDING', booking.id)
+        assert email_log.queued
+
+        assert send_queued_emails() == 1
+        email_log.refresh_from_db()
+        assert email_log.status == 'SENT' and email_log.message_id == 'msg-1'
+        assert azure == [booking.email]
+        assert send_queued_emails() == 0
+
+    def test_failed_send_waits_for_its_retry(self, azure, monkeypatch):
+        booking = seed_session_bookings(1)[0]
+        email_service.send_booking_confirmation(booking, deliver=False)
+
+        def fail(**kwargs):
+            raise RuntimeError('provider timeout')
+
+        monkeypatch.setattr(email_service, '_send_via_azure', fail)
+        assert send_queued_emails() == 1
+        email_log = EmailLog.objects.get()
+        assert email_log.status == 'FAILED' and email_log.retry_count == 1
+
+        # Not due yet
+        assert send_queued_emails() == 0
+        EmailLog.objects.update(next_retry_at=email_log.created_at)
+        monkeypatch.setattr(email_service, '_send_via_azure', lambda **kwargs: 'msg-retry')
+        assert send_queued_emails() == 1
+        assert EmailLog.objects.get().status == 'SENT'
+
+    def test_only_outbox_rows_are_sent(self, azure):
+        booking = seed_session_bookings(1)[0]
+        # An inline send still in progress and a failure from before the outbox
+        inline = EmailLog.objects.create(
+            email_type='BOOKING_CONFIRMATION', recipient_email='inline@example.com',
+            subject='Inline', template_name='emails/booking/session_confirmation.html',
+        )
+        old_failure = EmailLog.objects.create(
+            email_type='BOOKING_CONFIRMATION', recipient_email='old@example.com',
+            subject='Old', template_name='emails/booking/session_confirmation.html',
+            status='FAILED', next_retry_at=inline.created_at,
+        )
+        queued = email_service.send_booking_confirmation(booking, deliver=False)
+
+        assert send_queued_emails() == 1
+        assert azure == [booking.email]
+        assert dict(EmailLog.objects.values_list('id', 'status')) == {
+            inline.id: 'PENDING', old_failure.id: 'FAILED', queued.id: 'SENT',
+        }
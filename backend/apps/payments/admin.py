@@ -8,7 +8,7 @@ All payment records are read-only to prevent manual editing.
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Payment
+from .models import Payment, WebhookEvent
 
 
 @admin.register(Payment)
@@ -144,3 +144,16 @@ class PaymentAdmin(admin.ModelAdmin):
         )
     status_display.short_description = 'Status'
     status_display.admin_order_field = 'status'
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Read-only view of the webhook inbox, for tracing failed events."""
+
+    list_display = ['event_id', 'provider', 'event_type', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['provider', 'status', 'event_type']
+    search_fields = ['event_id']
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -6,6 +6,7 @@ This allows seamless switching between Mock and Razorpay without code changes.
 """
 
 import logging
+import threading
 from django.conf import settings
 
 from .base import BasePaymentGateway
@@ -50,8 +51,9 @@ def get_payment_gateway() -> BasePaymentGateway:
         return MockPaymentGateway()
 
 
-# Singleton instance for reuse
+# Singleton instance for reuse, created on first use (not at import time)
 _gateway_instance = None
+_gateway_lock = threading.Lock()
 
 
 def get_gateway_instance() -> BasePaymentGateway:
@@ -62,6 +64,7 @@ def get_gateway_instance() -> BasePaymentGateway:
         Cached BasePaymentGateway instance
     """
     global _gateway_instance
-    if _gateway_instance is None:
-        _gateway_instance = get_payment_gateway()
-    return _gateway_instance
+    with _gateway_lock:
+        if _gateway_instance is None:
+            _gateway_instance = get_payment_gateway()
+        return _gateway_instance
@@ -10,18 +10,29 @@ Features:
 - Supports full, partial, and deposit payments
 - Supports refunds (full and partial)
 - Updates database exactly like a real gateway
+- Goes through the gateway transport (retries, circuit breaker) like a real one
+- Optional production-like behaviour for load and soak tests (MOCK_GATEWAY_*
+  settings): latency, failures, timeouts, and Razorpay-style webhooks with
+  duplicate and out-of-order delivery
 - Zero risk of actual charges
 """
 
+import math
+import random
+import time
 import uuid
 import logging
 from decimal import Decimal
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime
+
+import requests
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 
 from .base import BasePaymentGateway
+from .transport import get_transport
 from apps.payments.models import Payment
 
 logger = logging.getLogger(__name__)
@@ -38,8 +49,88 @@ class MockPaymentGateway(BasePaymentGateway):
     def __init__(self):
         """Initialize mock gateway"""
         self.provider_name = 'MOCK'
+        self.transport = get_transport(self.provider_name)
+        # A fixed MOCK_GATEWAY_SEED makes load test runs repeatable
+        self.random = random.Random(getattr(settings, 'MOCK_GATEWAY_SEED', None))
         logger.info("MockPaymentGateway initialized")
     
+    def _latency_seconds(self) -> float:
+        """Simulated provider round trip per MOCK_GATEWAY_LATENCY"""
+        mode = getattr(settings, 'MOCK_GATEWAY_LATENCY', 'none')
+        base_ms = getattr(settings, 'MOCK_GATEWAY_LATENCY_MS', 300)
+        max_ms = getattr(settings, 'MOCK_GATEWAY_LATENCY_MAX_MS', 2000)
+        
+        if mode == 'fixed':
+            latency_ms = base_ms
+        elif mode == 'uniform':
+            latency_ms = self.random.uniform(base_ms, max_ms)
+        elif mode == 'lognormal':
+            # Median base_ms with a long tail, like real gateway response times
+            latency_ms = min(self.random.lognormvariate(math.log(max(base_ms, 1)), 0.5), max_ms)
+        else:
+            latency_ms = 0
+        return latency_ms / 1000
+    
+    def _provider_call(self, operation: str) -> None:
+        """
+        Stand-in for the provider API request behind `operation`.
+        
+        The mock has no remote side; this is the point where a real gateway
+        would wait on the network, so latency and failures are injected here.
+        Injected failures are the transport errors requests raises, so the
+        transport retries and trips its circuit breaker exactly as for Razorpay.
+        """
+        latency = self._latency_seconds()
+        if latency:
+            time.sleep(latency)
+        
+        roll = self.random.random()
+        timeout_rate = getattr(settings, 'MOCK_GATEWAY_TIMEOUT_RATE', 0)
+        failure_rate = getattr(settings, 'MOCK_GATEWAY_FAILURE_RATE', 0)
+        if roll < timeout_rate:
+            time.sleep(settings.PAYMENT_GATEWAY_READ_TIMEOUT)
+            raise requests.Timeout(f"Mock {operation} timed out (injected)")
+        if roll < timeout_rate + failure_rate:
+            raise requests.ConnectionError(f"Mock {operation} failed (injected)")
+    
+    def _webhook_events(self, payment, payment_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        The (event_id, payload) deliveries Razorpay would send for a captured
+        payment, with duplicates and reordering per MOCK_GATEWAY_*_RATE.
+        """
+        def event(event_type, pay_id, status):
+            return (f"evt_mock_{uuid.uuid4().hex[:14]}", {
+                'entity': 'event',
+                'event': event_type,
+                'payload': {'payment': {'entity': {
+                    'id': pay_id,
+                    'order_id': payment.order_id,
+                    'amount': int(payment.amount * 100),
+                    'status': status,
+                }}},
+                'created_at': int(time.time()),
+            })
+        
+        captured = event('payment.captured', payment_id, 'captured')
+        events = [captured, event('order.paid', payment_id, 'captured')]
+        
+        if self.random.random() < getattr(settings, 'MOCK_GATEWAY_OUT_OF_ORDER_RATE', 0):
+            # Later events overtake earlier ones, and an earlier failed attempt's event arrives last
+            events.reverse()
+            events.append(event('payment.failed', f"{payment_id}_EARLIER", 'failed'))
+        if self.random.random() < getattr(settings, 'MOCK_GATEWAY_DUPLICATE_RATE', 0):
+            # At-least-once delivery: the same event id arrives again
+            events.append(captured)
+        return events
+    
+    def _deliver_webhooks(self, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Queue events in the webhook inbox, as the webhook endpoint would"""
+        from apps.payments import webhooks
+        
+        for event_id, payload in events:
+            webhooks.record_event(event_id, payload, provider=self.provider_name)
+        logger.info(f"Mock gateway delivered {len(events)} webhook event(s)")
+    
     def create_order(self, booking, amount: Optional[Decimal] = None) -> Dict[str, Any]:
         """
         Create a mock payment order.
@@ -61,6 +152,8 @@ class MockPaymentGateway(BasePaymentGateway):
         else:
             amount = Decimal(str(amount))
         
+        self.transport.call('order.create', self._provider_call, 'order.create')
+        
         # Generate fake order ID
         order_id = f"MOCK_ORDER_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8].upper()}"
         
@@ -128,6 +221,16 @@ class MockPaymentGateway(BasePaymentGateway):
             logger.warning(f"Payment {order_id} already processed")
             return (True, payment.payment_id, {'message': 'Payment already processed', 'mock': True})
         
+        if not force_fail:
+            self.transport.call('payment.fetch', self._provider_call, 'payment.fetch', idempotent=True)
+        
+        # The webhook worker may have completed the payment during the call
+        # above: lock the row and check again so it is only counted once
+        payment = Payment.objects.select_for_update().get(pk=payment.pk)
+        if payment.status == 'SUCCESS':
+            logger.warning(f"Payment {order_id} already processed")
+            return (True, payment.payment_id, {'message': 'Payment already processed', 'mock': True})
+        
         # Simulate failure if requested
         if force_fail:
             payment.mark_failed("Mock payment forced to fail for testing")
@@ -174,6 +277,10 @@ class MockPaymentGateway(BasePaymentGateway):
             'message': 'Mock payment verified successfully (no real money charged)',
         }
         
+        if getattr(settings, 'MOCK_GATEWAY_WEBHOOKS', False):
+            events = self._webhook_events(payment, payment_id)
+            transaction.on_commit(lambda: self._deliver_webhooks(events))
+        
         return (True, payment_id, response)
     
     @transaction.atomic
@@ -201,6 +308,8 @@ class MockPaymentGateway(BasePaymentGateway):
         if refund_amount <= 0:
             raise ValueError("Refund amount must be positive")
         
+        self.transport.call('payment.refund', self._provider_call, 'payment.refund')
+        
         # Generate fake refund ID
         refund_id = f"MOCK_REFUND_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8].upper()}"
         
@@ -9,6 +9,7 @@ Features:
 - Signature verification for security
 - Webhook support for payment notifications
 - Refund support (full and partial)
+- Pooled connections, timeouts, retries and a circuit breaker (see transport.py)
 - Production-ready error handling
 """
 
@@ -22,6 +23,7 @@ from django.utils import timezone
 from django.db import transaction
 
 from .base import BasePaymentGateway
+from .transport import CircuitOpenError, get_transport
 from apps.payments.models import Payment
 
 logger = logging.getLogger(__name__)
@@ -47,10 +49,14 @@ class RazorpayGateway(BasePaymentGateway):
                 "Set RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET in environment."
             )
         
-        # Initialize Razorpay client
+        # Initialize Razorpay client on the shared pooled session
         try:
             import razorpay
-            self.client = razorpay.Client(auth=(self.key_id, self.key_secret))
+            self.transport = get_transport(
+                self.provider_name,
+                client_errors=(razorpay.errors.BadRequestError, razorpay.errors.SignatureVerificationError),
+            )
+            self.client = razorpay.Client(session=self.transport.session, auth=(self.key_id, self.key_secret))
             logger.info("RazorpayGateway initialized successfully")
         except ImportError:
             raise ImportError(
@@ -86,7 +92,7 @@ class RazorpayGateway(BasePaymentGateway):
         
         # Create Razorpay order
         try:
-            razorpay_order = self.client.order.create({
+            razorpay_order = self.transport.call('order.create', self.client.order.create, {
                 'amount': amount_paise,
                 'currency': 'INR',
                 'receipt': f"{'party' if is_party else 'session'}_{booking.id}_{int(timezone.now().timestamp())}",
@@ -97,6 +103,8 @@ class RazorpayGateway(BasePaymentGateway):
                     'customer_email': booking.email,
                 }
             })
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Razorpay order creation failed: {str(e)}")
             raise Exception(f"Failed to create Razorpay order: {str(e)}")
@@ -164,7 +172,8 @@ class RazorpayGateway(BasePaymentGateway):
             logger.warning(f"Payment {razorpay_order_id} already processed")
             return (True, payment.payment_id, {'message': 'Payment already processed'})
         
-        # Verify signature
+        # Verify signature, then fetch the payment details from Razorpay
+        error = None
         try:
             self.client.utility.verify_payment_signature({
                 'razorpay_order_id': razorpay_order_id,
@@ -173,16 +182,30 @@ class RazorpayGateway(BasePaymentGateway):
             })
         except Exception as e:
             logger.error(f"Razorpay signature verification failed: {str(e)}")
-            payment.mark_failed(f"Signature verification failed: {str(e)}")
-            return (False, '', {'error': 'Signature verification failed'})
+            error = (f"Signature verification failed: {str(e)}", 'Signature verification failed')
+        
+        if error is None:
+            try:
+                razorpay_payment = self.transport.call(
+                    'payment.fetch', self.client.payment.fetch, razorpay_payment_id, idempotent=True
+                )
+            except CircuitOpenError:
+                # Not the customer's failure: leave the payment open for a retry
+                raise
+            except Exception as e:
+                logger.error(f"Failed to fetch Razorpay payment: {str(e)}")
+                error = (f"Failed to fetch payment details: {str(e)}", 'Failed to fetch payment details')
+        
+        # The webhook worker may have completed the payment during the calls
+        # above: lock the row and check again so it is only counted once
+        payment = Payment.objects.select_for_update().get(pk=payment.pk)
+        if payment.status == 'SUCCESS':
+            logger.warning(f"Payment {razorpay_order_id} already processed")
+            return (True, payment.payment_id, {'message': 'Payment already processed'})
         
-        # Fetch payment details from Razorpay
-        try:
-            razorpay_payment = self.client.payment.fetch(razorpay_payment_id)
-        except Exception as e:
-            logger.error(f"Failed to fetch Razorpay payment: {str(e)}")
-            payment.mark_failed(f"Failed to fetch payment details: {str(e)}")
-            return (False, '', {'error': 'Failed to fetch payment details'})
+        if error is not None:
+            payment.mark_failed(error[0])
+            return (False, '', {'error': error[1]})
         
         # Mark payment as successful
         payment.mark_success(
@@ -249,13 +272,16 @@ class RazorpayGateway(BasePaymentGateway):
         
         # Process refund via Razorpay API
         try:
-            razorpay_refund = self.client.payment.refund(
+            razorpay_refund = self.transport.call(
+                'payment.refund', self.client.payment.refund,
                 payment.payment_id,
                 {
                     'amount': refund_amount_paise,
                     'speed': 'normal',  # or 'optimum'
                 }
             )
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Razorpay refund failed: {str(e)}")
             raise Exception(f"Failed to process Razorpay refund: {str(e)}")
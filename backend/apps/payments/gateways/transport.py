@@ -0,0 +1,192 @@
+"""
+Gateway transport: connection pooling, timeouts, retries and a circuit breaker.
+
+Every gateway call goes through its provider's GatewayTransport:
+
+- one shared requests.Session per process, whose pooled HTTPS adapter
+  applies PAYMENT_GATEWAY_CONNECT_TIMEOUT / PAYMENT_GATEWAY_READ_TIMEOUT to
+  every request that sets no timeout of its own (the Razorpay SDK sets none)
+- idempotent calls (reads) are retried with full-jitter exponential backoff
+- a circuit breaker counts consecutive provider failures; past the threshold
+  calls fail fast with CircuitOpenError until PAYMENT_GATEWAY_BREAKER_RESET_SECONDS
+  have passed, then one trial call decides whether it closes again
+
+Client errors (bad request, bad signature) are the caller's fault, not the
+provider's: they are raised at once and do not count as failures.
+
+Breaker state is per process; health() feeds the gateway status endpoint.
+"""
+import logging
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """The provider is failing; the call was not attempted."""
+
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} gateway unavailable, retry in {retry_after:.0f}s")
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide pooled session shared by all gateway clients."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = TimeoutHTTPAdapter(
+                timeout=(settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT, settings.PAYMENT_GATEWAY_READ_TIMEOUT),
+                pool_connections=settings.PAYMENT_GATEWAY_POOL_SIZE,
+                pool_maxsize=settings.PAYMENT_GATEWAY_POOL_SIZE,
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed."""
+
+    def __init__(self, failure_threshold, reset_seconds, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        """Seconds until a retry is worth it if the call must not be attempted, else None."""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return None
+            if state == 'half_open' and not self.trial_running:
+                self.trial_running = True  # Let exactly one call probe the provider
+                return None
+            return max(self.reset_seconds - (self.clock() - self.opened_at), 1)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+    def release_trial(self):
+        """A half-open trial ended in a client error: let another call probe."""
+        with self.lock:
+            self.trial_running = False
+
+
+class GatewayTransport:
+    """Retries, breaker and shared session for one provider's calls."""
+
+    def __init__(self, provider, client_errors=()):
+        self.provider = provider
+        self.client_errors = tuple(client_errors)
+        self.session = get_session()
+        self.breaker = CircuitBreaker(
+            settings.PAYMENT_GATEWAY_BREAKER_THRESHOLD,
+            settings.PAYMENT_GATEWAY_BREAKER_RESET_SECONDS,
+        )
+        self.last_failure_at = None
+        self.last_success_at = None
+
+    def call(self, operation, func, *args, idempotent=False, **kwargs):
+        """
+        Run func(*args, **kwargs) as gateway operation `operation`.
+        Idempotent operations are retried up to PAYMENT_GATEWAY_MAX_RETRIES times.
+        """
+        attempts = 1 + (settings.PAYMENT_GATEWAY_MAX_RETRIES if idempotent else 0)
+        for attempt in range(attempts):
+            retry_after = self.breaker.before_call()
+            if retry_after is not None:
+                raise CircuitOpenError(self.provider, retry_after)
+            try:
+                result = func(*args, **kwargs)
+            except self.client_errors:
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                self.last_failure_at = time.time()
+                if attempt + 1 == attempts:
+                    raise
+                delay = random.uniform(0, settings.PAYMENT_GATEWAY_RETRY_BACKOFF * 2 ** attempt)
+                logger.warning(f"{self.provider} {operation} failed ({e}), retry {attempt + 1} in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                self.last_success_at = time.time()
+                return result
+
+    def health(self):
+        state = self.breaker.state
+        return {
+            'provider': self.provider,
+            'state': state,
+            'consecutive_failures': self.breaker.failures,
+            'last_success_at': self.last_success_at,
+            'last_failure_at': self.last_failure_at,
+        }
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(provider, client_errors=()):
+    """The process-wide transport for a provider (created on first use)."""
+    with _transports_lock:
+        if provider not in _transports:
+            _transports[provider] = GatewayTransport(provider, client_errors)
+        return _transports[provider]
+
+
+def reset_transports():
+    """Forget breaker state (tests, or after reconfiguring the gateway)."""
+    with _transports_lock:
+        _transports.clear()
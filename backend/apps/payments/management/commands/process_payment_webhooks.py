@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.payments.webhooks import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply queued payment gateway webhook events to payments and bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the inbox (every PAYMENT_WEBHOOK_POLL_SECONDS) instead of exiting',
+        )
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            count = process_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {count} webhook event(s)'))
+            return
+
+        self.stdout.write('Processing payment webhooks...')
+        while True:
+            close_old_connections()
+            if not process_pending():
+                time.sleep(settings.PAYMENT_WEBHOOK_POLL_SECONDS)
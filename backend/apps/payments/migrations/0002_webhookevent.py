@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('MOCK', 'Mock Gateway'), ('RAZORPAY', 'Razorpay')], default='RAZORPAY', max_length=20)),
+                ('event_id', models.CharField(help_text='Gateway event ID (X-Razorpay-Event-Id)', max_length=255, unique=True)),
+                ('event_type', models.CharField(help_text='e.g. payment.captured', max_length=100)),
+                ('payload', models.JSONField(help_text='Raw event body')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSED', 'Processed'), ('IGNORED', 'Ignored'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='payments_we_status_4e31df_idx')],
+            },
+        ),
+    ]
@@ -141,3 +141,46 @@ class Payment(models.Model):
         if error_message:
             self.notes = error_message
         self.save()
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of payment gateway webhook events.
+
+    The webhook endpoint only verifies the signature and inserts the raw
+    event here; process_payment_webhooks applies pending events to payments
+    and bookings. The unique event_id makes redelivered events a no-op.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSED', 'Processed'),
+        ('IGNORED', 'Ignored'),
+        ('FAILED', 'Failed'),
+    ]
+
+    provider = models.CharField(max_length=20, choices=Payment.PROVIDER_CHOICES, default='RAZORPAY')
+    event_id = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Gateway event ID (X-Razorpay-Event-Id)"
+    )
+    event_type = models.CharField(max_length=100, help_text="e.g. payment.captured")
+    payload = models.JSONField(help_text="Raw event body")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        verbose_name = 'Webhook Event'
+        verbose_name_plural = 'Webhook Events'
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type} {self.event_id} ({self.status})"
@@ -20,6 +20,7 @@ from django.conf import settings
 from .gateways.factory import get_gateway_instance
 from .models import Payment
 from apps.bookings.models import Booking, PartyBooking
+from apps.bookings import availability
 from apps.emails.services import email_service
 
 logger = logging.getLogger(__name__)
@@ -33,10 +34,10 @@ class PaymentService:
     Handles all payment-related business logic and state management.
     """
     
-    def __init__(self):
-        """Initialize payment service"""
-        self.gateway = get_gateway_instance()
-        logger.info(f"PaymentService initialized with {self.gateway.get_provider_name()} gateway")
+    @property
+    def gateway(self):
+        """The configured gateway, created on first use rather than at import time"""
+        return get_gateway_instance()
     
     def get_booking(self, booking_id: int, booking_type: str):
         """
@@ -67,7 +68,6 @@ class PaymentService:
         else:
             raise ValueError(f"Invalid booking type: {booking_type}")
     
-    @transaction.atomic
     def create_payment_order(
         self,
         booking_id: int,
@@ -117,6 +117,15 @@ class PaymentService:
                     f"Minimum deposit of ₹{min_deposit} ({settings.MINIMUM_DEPOSIT_PERCENTAGE}%) required"
                 )
         
+        # Keep (or win back) the session slot places for the duration of checkout.
+        # ensure_hold commits on its own, so the slot and hold row locks are
+        # released before the (slow) gateway call below
+        if isinstance(booking, Booking):
+            try:
+                availability.ensure_hold(booking)
+            except availability.SlotUnavailable as e:
+                raise ValueError(f"Checkout expired and the slot is no longer available: {e}")
+        
         logger.info(f"Creating payment order for {booking_type} booking {booking_id}: ₹{amount}")
         
         # Create order via gateway
@@ -168,6 +177,10 @@ class PaymentService:
         booking = payment.get_booking()
         
         logger.info(f"Payment verified successfully: {order_id} → {payment_id}")
+        
+        # Payment received: the hold becomes a confirmed reservation
+        if isinstance(booking, Booking):
+            availability.convert_hold(booking)
         logger.info(f"Booking {booking.id} status: {booking.payment_status} (₹{booking.paid_amount}/₹{booking.amount})")
         
         # Send email notification
@@ -305,35 +318,31 @@ class PaymentService:
         }
     
     def _send_payment_success_email(self, booking, payment):
-        """Send full payment success email - triggers booking confirmation"""
-        logger.info(f"Sending payment success email for booking {booking.id}")
+        """
+        Queue the booking confirmation for a fully paid booking.
+        
+        Runs inside the payment transaction, so it only writes the email to
+        the outbox (a queued EmailLog); send_queued_emails sends it after
+        commit, keeping the mail provider off the request and out of the
+        Payment/Booking row locks.
+        """
+        logger.info(f"Queueing payment success email for booking {booking.id}")
+        
+        # Only send email if EMAIL_BOOKING_ENABLED is True
+        if not getattr(settings, 'EMAIL_BOOKING_ENABLED', False):
+            logger.warning(f"EMAIL_BOOKING_ENABLED=False, skipping email for booking {booking.id}")
+            return
         
         try:
-            # Import here to avoid circular imports
-            from django.conf import settings
-            from apps.bookings.models import PartyBooking
-            
-            # Only send email if EMAIL_BOOKING_ENABLED is True
-            if not getattr(settings, 'EMAIL_BOOKING_ENABLED', False):
-                logger.warning(f"EMAIL_BOOKING_ENABLED=False, skipping email for booking {booking.id}")
-                return
+            from apps.emails.tasks import queue_booking_confirmation_email
             
-            # Send booking confirmation email after successful payment
-            if isinstance(booking, PartyBooking):
-                # Party booking confirmation
-                from apps.emails.tasks import send_party_confirmation_email
-                logger.info(f"Sending party booking confirmation email for booking {booking.id}")
-                send_party_confirmation_email(booking.id)
-            else:
-                # Session booking confirmation
-                from apps.emails.tasks import send_booking_confirmation_email
-                logger.info(f"Sending session booking confirmation email for booking {booking.id}")
-                send_booking_confirmation_email(booking.id)
-                
-            logger.info(f"Booking confirmation email queued successfully for booking {booking.id}")
+            # Savepoint: a failed insert must not break the payment transaction
+            with transaction.atomic():
+                email_log = queue_booking_confirmation_email(booking)
+            logger.info(f"Booking confirmation email queued for booking {booking.id} (EmailLog {email_log.id})")
             
         except Exception as e:
-            logger.error(f"Failed to send booking confirmation email for booking {booking.id}: {str(e)}", exc_info=True)
+            logger.error(f"Failed to queue booking confirmation email for booking {booking.id}: {str(e)}", exc_info=True)
             # Don't fail the payment if email fails
     
     def _send_partial_payment_email(self, booking, payment):
@@ -0,0 +1,116 @@
+"""
+Tests for the gateway transport: retries, circuit breaker and health endpoint
+"""
+import pytest
+import requests
+from rest_framework.test import APIClient
+
+from apps.core.tests.query_budget import seed_session_bookings
+from apps.payments.gateways import factory
+from apps.payments.gateways.mock import MockPaymentGateway
+from apps.payments.gateways.transport import (
+    CircuitBreaker, CircuitOpenError, GatewayTransport, get_session, reset_transports,
+)
+
+
+class ClientError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_transport(settings, monkeypatch):
+    settings.PAYMENT_MODE = 'mock'
+    settings.PAYMENT_GATEWAY_BREAKER_THRESHOLD = 2
+    settings.PAYMENT_GATEWAY_BREAKER_RESET_SECONDS = 30
+    settings.PAYMENT_GATEWAY_MAX_RETRIES = 2
+    settings.PAYMENT_GATEWAY_RETRY_BACKOFF = 0
+    reset_transports()
+    monkeypatch.setattr(factory, '_gateway_instance', None)
+    yield
+    reset_transports()
+
+
+def flaky(failures, result='ok'):
+    """A call that raises ConnectionError `failures` times, then succeeds."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise requests.ConnectionError('connection reset')
+        return result
+    return call, calls
+
+
+class TestGatewayTransport:
+
+    def test_only_idempotent_calls_are_retried(self):
+        transport = GatewayTransport('TEST')
+        call, calls = flaky(1)
+        assert transport.call('payment.fetch', call, idempotent=True) == 'ok'
+        assert len(calls) == 2
+
+        call, calls = flaky(1)
+        with pytest.raises(requests.ConnectionError):
+            transport.call('order.create', call)
+        assert len(calls) == 1
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        now = [0.0]
+        transport = GatewayTransport('TEST')
+        transport.breaker = CircuitBreaker(2, 30, clock=lambda: now[0])
+        call, calls = flaky(2)
+        for _ in range(2):
+            with pytest.raises(requests.ConnectionError):
+                transport.call('order.create', call)
+        assert transport.health()['state'] == 'open'
+
+        # Fails fast without touching the provider
+        with pytest.raises(CircuitOpenError) as error:
+            transport.call('order.create', call)
+        assert len(calls) == 2 and error.value.retry_after == 30
+
+        now[0] = 31.0
+        assert transport.breaker.state == 'half_open'
+        assert transport.call('order.create', call) == 'ok'
+        assert transport.health()['state'] == 'closed'
+
+    def test_client_errors_do_not_trip_the_breaker(self):
+        transport = GatewayTransport('TEST', client_errors=(ClientError,))
+
+        def bad_request():
+            raise ClientError('amount must be positive')
+
+        for _ in range(3):
+            with pytest.raises(ClientError):
+                transport.call('order.create', bad_request, idempotent=True)
+        assert transport.health()['state'] == 'closed'
+        assert transport.breaker.failures == 0
+
+    def test_session_is_shared_with_default_timeouts(self, settings):
+        adapter = get_session().get_adapter('https://api.razorpay.com/v1/orders')
+        assert adapter.timeout == (settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT, settings.PAYMENT_GATEWAY_READ_TIMEOUT)
+        assert GatewayTransport('A').session is GatewayTransport('B').session
+
+
+@pytest.mark.django_db
+class TestGatewayOutage:
+
+    def test_mock_gateway_outage_fails_fast_and_shows_on_health(self, monkeypatch):
+        def provider_down(self, operation):
+            raise requests.Timeout('read timed out')
+
+        monkeypatch.setattr(MockPaymentGateway, '_provider_call', provider_down)
+        booking = seed_session_bookings(1)[0]
+        client = APIClient()
+        order = {'booking_id': booking.id, 'booking_type': 'session'}
+
+        statuses = [client.post('/api/v1/payments/create-order/', order, format='json').status_code for _ in range(3)]
+        assert statuses == [500, 500, 503]
+
+        response = client.post('/api/v1/payments/create-order/', order, format='json')
+        assert int(response['Retry-After']) >= 1
+
+        health = client.get('/api/v1/payments/gateway/health/')
+        assert health.status_code == 503
+        assert health.json()['state'] == 'open' and health.json()['provider'] == 'MOCK'
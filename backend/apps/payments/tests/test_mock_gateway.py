@@ -0,0 +1,91 @@
+"""
+Tests for the MockPaymentGateway latency, failure and webhook injection modes
+"""
+import time
+from decimal import Decimal
+
+import pytest
+import requests
+
+from apps.core.tests.query_budget import seed_session_bookings
+from apps.payments import webhooks
+from apps.payments.gateways.mock import MockPaymentGateway
+from apps.payments.gateways.transport import reset_transports
+from apps.payments.models import Payment, WebhookEvent
+
+
+@pytest.fixture(autouse=True)
+def fresh_transport():
+    reset_transports()
+    yield
+    reset_transports()
+
+
+class TestInjectedBehaviour:
+
+    def test_latency_distributions(self, settings):
+        settings.MOCK_GATEWAY_LATENCY_MS = 100
+        settings.MOCK_GATEWAY_LATENCY_MAX_MS = 400
+        gateway = MockPaymentGateway()
+
+        settings.MOCK_GATEWAY_LATENCY = 'none'
+        assert gateway._latency_seconds() == 0
+        settings.MOCK_GATEWAY_LATENCY = 'fixed'
+        assert gateway._latency_seconds() == 0.1
+        settings.MOCK_GATEWAY_LATENCY = 'uniform'
+        assert all(0.1 <= gateway._latency_seconds() <= 0.4 for _ in range(100))
+        settings.MOCK_GATEWAY_LATENCY = 'lognormal'
+        samples = sorted(gateway._latency_seconds() for _ in range(500))
+        assert max(samples) <= 0.4
+        assert 0.07 < samples[250] < 0.14  # Median near LATENCY_MS
+
+    def test_latency_is_applied(self, settings):
+        settings.MOCK_GATEWAY_LATENCY = 'fixed'
+        settings.MOCK_GATEWAY_LATENCY_MS = 50
+        started = time.perf_counter()
+        MockPaymentGateway()._provider_call('order.create')
+        assert time.perf_counter() - started >= 0.05
+
+    def test_failures_and_timeouts(self, settings):
+        gateway = MockPaymentGateway()
+        settings.MOCK_GATEWAY_FAILURE_RATE = 1
+        with pytest.raises(requests.ConnectionError):
+            gateway._provider_call('order.create')
+
+        settings.MOCK_GATEWAY_FAILURE_RATE = 0
+        settings.MOCK_GATEWAY_TIMEOUT_RATE = 1
+        settings.PAYMENT_GATEWAY_READ_TIMEOUT = 0
+        with pytest.raises(requests.Timeout):
+            gateway._provider_call('payment.fetch')
+
+    def test_seed_makes_runs_repeatable(self, settings):
+        settings.MOCK_GATEWAY_SEED = 42
+        settings.MOCK_GATEWAY_LATENCY = 'uniform'
+        first, second = MockPaymentGateway(), MockPaymentGateway()
+        assert [first._latency_seconds() for _ in range(5)] == [second._latency_seconds() for _ in range(5)]
+
+
+@pytest.mark.django_db
+class TestMockWebhooks:
+
+    def test_duplicate_and_out_of_order_events_are_absorbed(self, settings, django_capture_on_commit_callbacks):
+        settings.EMAIL_BOOKING_ENABLED = False
+        settings.MOCK_GATEWAY_WEBHOOKS = True
+        settings.MOCK_GATEWAY_DUPLICATE_RATE = 1
+        settings.MOCK_GATEWAY_OUT_OF_ORDER_RATE = 1
+        booking = seed_session_bookings(1)[0]
+        Payment.objects.create(booking=booking, provider='MOCK', order_id='MOCK_ORDER_1', amount=Decimal('1000.00'))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            success, payment_id, _ = MockPaymentGateway().verify_payment({'order_id': 'MOCK_ORDER_1'})
+        assert success
+
+        # The redelivered event id was skipped; the stale failure arrived last
+        events = list(WebhookEvent.objects.order_by('id').values_list('event_type', flat=True))
+        assert events == ['order.paid', 'payment.captured', 'payment.failed']
+
+        assert webhooks.process_pending() == 3
+        assert set(WebhookEvent.objects.values_list('status', flat=True)) == {'IGNORED'}
+        booking.refresh_from_db()
+        assert booking.paid_amount == Decimal('1000.00') and booking.payment_status == 'PAID'
+        assert Payment.objects.get(order_id='MOCK_ORDER_1').payment_id == payment_id
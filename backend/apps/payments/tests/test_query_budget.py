@@ -0,0 +1,22 @@
+"""
+Query budget tests for the payments list endpoint
+"""
+import pytest
+from apps.payments.models import Payment
+from apps.core.tests.query_budget import (
+    assert_constant_queries, staff_client, seed_session_bookings, seed_party_bookings,
+)
+
+
+def seed_payments(n):
+    for booking in seed_session_bookings(n):
+        Payment.objects.create(booking=booking, provider='MOCK', order_id=f'order_s{booking.id}', amount=booking.amount)
+    for booking in seed_party_bookings(n):
+        Payment.objects.create(party_booking=booking, provider='MOCK', order_id=f'order_p{booking.id}', amount=booking.amount)
+
+
+@pytest.mark.django_db
+class TestPaymentsQueryBudget:
+
+    def test_payments_list(self):
+        assert_constant_queries(staff_client().get, '/api/v1/payments/', seed_payments)
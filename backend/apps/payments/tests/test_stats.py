@@ -0,0 +1,49 @@
+"""
+Tests for the payment stats endpoint
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from apps.payments.models import Payment
+from apps.core.tests.query_budget import capture_queries, staff_client, seed_session_bookings
+
+
+def make_payment(booking, suffix, amount, status='SUCCESS', provider='MOCK', days_ago=0):
+    payment = Payment.objects.create(
+        booking=booking, provider=provider, order_id=f'order_{booking.id}_{suffix}', amount=amount, status=status
+    )
+    if days_ago:
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+    return payment
+
+
+@pytest.mark.django_db
+class TestPaymentStats:
+
+    def test_stats(self):
+        booking = seed_session_bookings(1)[0]
+        make_payment(booking, 1, Decimal('1000.00'))
+        make_payment(booking, 2, Decimal('500.00'), provider='RAZORPAY', days_ago=2)
+        make_payment(booking, 3, Decimal('700.00'), status='FAILED')
+        make_payment(booking, 4, Decimal('-200.00'), status='REFUNDED')
+        make_payment(booking, 5, Decimal('300.00'), days_ago=40)
+
+        client = staff_client()
+        response, queries = capture_queries(client.get, '/api/v1/payments/stats/')
+        assert response.status_code == 200, response.data
+        data = response.data
+        assert data['total_payments'] == 5
+        assert data['successful_payments'] == 3
+        assert data['failed_payments'] == 1
+        assert data['total_refunds'] == 1
+        assert data['total_revenue'] == 1800.0
+        assert data['today_revenue'] == 1000.0
+        assert data['avg_transaction_value'] == 600.0
+        assert data['payment_methods'] == {'MOCK': 4, 'RAZORPAY': 1}
+        assert data['payment_statuses'] == {'CREATED': 0, 'SUCCESS': 3, 'FAILED': 1, 'REFUNDED': 1}
+        assert [day['revenue'] for day in data['daily_revenue']] == [0, 0, 0, 0, 500.0, 0, 1000.0]
+        assert len(data['recent_payments']) == 5
+        # One aggregate, the daily series and recent payments
+        assert len(queries) <= 4, '\n'.join(queries)
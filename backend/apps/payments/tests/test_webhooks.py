@@ -0,0 +1,159 @@
+"""
+Tests for the Razorpay webhook inbox and its worker
+"""
+import hashlib
+import hmac
+import json
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from rest_framework.test import APIClient
+
+from apps.core.tests.query_budget import seed_session_bookings
+from apps.payments import webhooks
+from apps.payments.gateways.razorpay import RazorpayGateway
+from apps.payments.gateways.transport import reset_transports
+from apps.payments.models import Payment, WebhookEvent
+
+SECRET = 'whsec_test'
+URL = '/api/v1/payments/webhooks/razorpay/'
+
+
+def event_body(event_type, order_id, payment_id='pay_1', amount=100000):
+    return json.dumps({
+        'entity': 'event',
+        'event': event_type,
+        'payload': {'payment': {'entity': {
+            'id': payment_id, 'order_id': order_id, 'amount': amount, 'status': 'captured',
+        }}},
+    }).encode()
+
+
+def deliver(body, event_id, secret=SECRET):
+    signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return APIClient().post(
+        URL, body, content_type='application/json',
+        HTTP_X_RAZORPAY_SIGNATURE=signature, HTTP_X_RAZORPAY_EVENT_ID=event_id,
+    )
+
+
+@pytest.fixture
+def payment(settings):
+    settings.RAZORPAY_WEBHOOK_SECRET = SECRET
+    settings.EMAIL_BOOKING_ENABLED = False
+    booking = seed_session_bookings(1)[0]
+    return Payment.objects.create(
+        booking=booking, provider='RAZORPAY', order_id='order_1', amount=Decimal('1000.00'), status='CREATED'
+    )
+
+
+@pytest.mark.django_db
+class TestRazorpayWebhook:
+
+    def test_bad_signature_is_rejected(self, payment):
+        response = deliver(event_body('payment.captured', 'order_1'), 'evt_1', secret='wrong')
+        assert response.status_code == 400
+        assert not WebhookEvent.objects.exists()
+
+    def test_event_is_queued_once_and_applied_later(self, payment):
+        body = event_body('payment.captured', 'order_1')
+        assert deliver(body, 'evt_1').status_code == 200
+        assert deliver(body, 'evt_1').status_code == 200  # Redelivery
+
+        assert WebhookEvent.objects.get().status == 'PENDING'
+        payment.refresh_from_db()
+        assert payment.status == 'CREATED'
+
+        assert webhooks.process_pending() == 1
+        payment.refresh_from_db()
+        booking = payment.booking
+        booking.refresh_from_db()
+        assert payment.status == 'SUCCESS' and payment.payment_id == 'pay_1'
+        assert booking.paid_amount == Decimal('1000.00') and booking.payment_status == 'PAID'
+        assert WebhookEvent.objects.get().status == 'PROCESSED'
+
+    def test_second_event_for_a_paid_order_is_ignored(self, payment):
+        deliver(event_body('payment.captured', 'order_1'), 'evt_1')
+        deliver(event_body('order.paid', 'order_1'), 'evt_2')
+        webhooks.process_pending()
+
+        payment.booking.refresh_from_db()
+        assert payment.booking.paid_amount == Decimal('1000.00')
+        assert dict(WebhookEvent.objects.values_list('event_id', 'status')) == {
+            'evt_1': 'PROCESSED', 'evt_2': 'IGNORED',
+        }
+
+    def test_failing_event_is_retried_then_failed(self, payment, settings):
+        settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS = 2
+        deliver(event_body('payment.captured', 'order_unknown'), 'evt_1')
+
+        webhooks.process_pending()
+        event = WebhookEvent.objects.get()
+        assert event.status == 'PENDING' and event.attempts == 1 and 'not found' in event.last_error
+
+        webhooks.process_pending()
+        event.refresh_from_db()
+        assert event.status == 'FAILED' and event.attempts == 2
+
+
+@pytest.fixture
+def razorpay_gateway(settings):
+    settings.RAZORPAY_KEY_ID = 'rzp_test_key'
+    settings.RAZORPAY_KEY_SECRET = 'rzp_test_secret'
+    reset_transports()
+    gateway = RazorpayGateway()
+    gateway.client = mock.Mock()
+    gateway.client.payment.fetch.return_value = {'id': 'pay_1', 'order_id': 'order_1', 'status': 'captured'}
+    yield gateway
+    reset_transports()
+
+
+VERIFY_DATA = {'razorpay_order_id': 'order_1', 'razorpay_payment_id': 'pay_1', 'razorpay_signature': 'sig'}
+
+
+@pytest.mark.django_db
+class TestVerifyAndWebhook:
+    """/verify/ and the webhook worker complete the same payments; it must be counted once."""
+
+    def assert_paid_once(self, payment):
+        payment.refresh_from_db()
+        booking = payment.booking
+        booking.refresh_from_db()
+        assert payment.status == 'SUCCESS'
+        assert booking.paid_amount == Decimal('1000.00') and booking.payment_status == 'PAID'
+
+    def test_webhook_after_verify_is_ignored(self, payment, razorpay_gateway):
+        success, payment_id, _ = razorpay_gateway.verify_payment(VERIFY_DATA)
+        assert success and payment_id == 'pay_1'
+
+        deliver(event_body('payment.captured', 'order_1'), 'evt_1')
+        webhooks.process_pending()
+        assert WebhookEvent.objects.get().status == 'IGNORED'
+        self.assert_paid_once(payment)
+
+    def test_webhook_during_verify_is_counted_once(self, payment, razorpay_gateway):
+        deliver(event_body('payment.captured', 'order_1'), 'evt_1')
+
+        def fetch_while_worker_runs(payment_id):
+            webhooks.process_pending()
+            return {'id': payment_id, 'status': 'captured'}
+        razorpay_gateway.client.payment.fetch.side_effect = fetch_while_worker_runs
+
+        success, _, response = razorpay_gateway.verify_payment(VERIFY_DATA)
+        assert success and response['message'] == 'Payment already processed'
+        assert WebhookEvent.objects.get().status == 'PROCESSED'
+        self.assert_paid_once(payment)
+
+    def test_failed_fetch_does_not_undo_webhook_success(self, payment, razorpay_gateway, settings):
+        settings.PAYMENT_GATEWAY_MAX_RETRIES = 0
+        deliver(event_body('payment.captured', 'order_1'), 'evt_1')
+
+        def worker_then_error(payment_id):
+            webhooks.process_pending()
+            raise ValueError('Bad response')
+        razorpay_gateway.client.payment.fetch.side_effect = worker_then_error
+
+        success, _, _ = razorpay_gateway.verify_payment(VERIFY_DATA)
+        assert success
+        self.assert_paid_once(payment)
@@ -8,26 +8,47 @@ Provides REST API endpoints for payment operations:
 - Get booking payment status
 """
 
+import json
 import logging
 from decimal import Decimal, InvalidOperation
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 
+from apps.core.idempotency import idempotent
+from .gateways.factory import get_gateway_instance
+from .gateways.transport import CircuitOpenError
 from .services import payment_service
+from . import webhooks
 
 logger = logging.getLogger(__name__)
 
 
+def gateway_unavailable(error):
+    """503 while the gateway's circuit breaker is open"""
+    logger.warning(str(error))
+    response = Response(
+        {'success': False, 'error': 'Payment gateway is temporarily unavailable. Please try again shortly.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(int(error.retry_after))
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Frontend needs to create orders
+@idempotent('payment-order')
 def create_payment_order(request):
     """
     Create a payment order.
     
     POST /api/payments/create-order
     
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    returns the first response instead of creating another order.
+    
     Body:
         {
             "booking_id": 123,
@@ -85,6 +106,8 @@ def create_payment_order(request):
             **order_data
         })
         
+    except CircuitOpenError as e:
+        return gateway_unavailable(e)
     except ValueError as e:
         logger.error(f"Validation error creating payment order: {str(e)}")
         return Response(
@@ -101,6 +124,7 @@ def create_payment_order(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Frontend needs to verify payments
+@idempotent('payment-verify')
 def verify_payment(request):
     """
     Verify a payment.
@@ -149,6 +173,8 @@ def verify_payment(request):
         
         return Response(result)
         
+    except CircuitOpenError as e:
+        return gateway_unavailable(e)
     except ValueError as e:
         logger.error(f"Validation error verifying payment: {str(e)}")
         return Response(
@@ -163,6 +189,37 @@ def verify_payment(request):
         )
 
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])  # Authenticated by the signature
+def razorpay_webhook(request):
+    """
+    Receive a Razorpay webhook event.
+    
+    POST /api/v1/payments/webhooks/razorpay/
+    
+    Verifies X-Razorpay-Signature over the raw body and queues the event in
+    the WebhookEvent inbox; process_payment_webhooks applies it afterwards.
+    Redelivered events (same X-Razorpay-Event-Id) are acknowledged and skipped.
+    """
+    body = request.body
+    if not webhooks.verify_signature(body, request.headers.get('X-Razorpay-Signature')):
+        logger.warning("Rejected Razorpay webhook with an invalid signature")
+        return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return Response({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    event_id = request.headers.get('X-Razorpay-Event-Id')
+    if not event_id:
+        return Response({'error': 'X-Razorpay-Event-Id header is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    webhooks.record_event(event_id, payload)
+    return Response({'status': 'queued'})
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # Only admins can refund
 def process_refund(request):
@@ -217,6 +274,8 @@ def process_refund(request):
         
         return Response(result)
         
+    except CircuitOpenError as e:
+        return gateway_unavailable(e)
     except ValueError as e:
         logger.error(f"Validation error processing refund: {str(e)}")
         return Response(
@@ -278,6 +337,31 @@ def get_booking_payment_status(request, booking_id, booking_type):
         )
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])  # Polled by uptime monitors
+def gateway_health(request):
+    """
+    Payment gateway health, as seen by this process.
+    
+    GET /api/v1/payments/gateway/health/
+    
+    Returns 200 while the circuit breaker is closed or half-open and 503
+    while it is open:
+        {
+            "mode": "razorpay",
+            "provider": "RAZORPAY",
+            "state": "closed",
+            "consecutive_failures": 0,
+            "last_success_at": 1760000000.0,
+            "last_failure_at": null
+        }
+    """
+    gateway = get_gateway_instance()
+    health = {'mode': settings.PAYMENT_MODE, **gateway.transport.health()}
+    http_status = status.HTTP_503_SERVICE_UNAVAILABLE if health['state'] == 'open' else status.HTTP_200_OK
+    return Response(health, status=http_status)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])  # Only admins can view stats
 def get_payment_stats(request):
@@ -292,13 +376,15 @@ def get_payment_stats(request):
     - Average transaction value
     - Success rate
     - Recent payments
-    - Payment methods breakdown
+    - Payment methods and status breakdown
     - Daily revenue trend
+    
+    Everything except recent payments comes from one aggregate query and one
+    grouped daily revenue query.
     """
     try:
         from .models import Payment
-        from apps.bookings.models import Booking
-        from apps.party_bookings.models import PartyBooking
+        from apps.core.aggregates import conditional_aggregate, date_windows, time_series
         from django.db.models import Sum, Count, Q, Avg
         from django.utils import timezone
         from datetime import timedelta
@@ -306,44 +392,53 @@ def get_payment_stats(request):
         # Get all payments
         all_payments = Payment.objects.all()
         
-        # Basic counts
-        total_payments = all_payments.count()
-        successful_payments = all_payments.filter(status='SUCCESS', amount__gt=0).count()
-        failed_payments = all_payments.filter(status='FAILED').count()
-        total_refunds = all_payments.filter(amount__lt=0).count()
+        # Counts, revenue, time windows and breakdowns in a single aggregate query
+        # (revenue only counts successful payments with positive amounts)
+        successful = Q(status='SUCCESS', amount__gt=0)
+        windows = date_windows('created_at')
+        stats = conditional_aggregate(
+            all_payments,
+            measures={
+                'count': Count('id'),
+                'successful': Count('id', filter=successful),
+                'failed': Count('id', filter=Q(status='FAILED')),
+                'refunds': Count('id', filter=Q(amount__lt=0)),
+                'revenue': Sum('amount', filter=successful),
+                'avg': Avg('amount', filter=successful),
+            },
+            windows={name: windows[name] for name in ('today', 'week', 'month')},
+            window_measures=['revenue'],
+            breakdowns={
+                'provider': [code for code, _ in Payment.PROVIDER_CHOICES],
+                'status': [code for code, _ in Payment.STATUS_CHOICES],
+            },
+            breakdown_measures=['count'],
+        )
+        totals = stats['total']
         
-        # Revenue calculations (only successful payments with positive amounts)
-        successful_payment_qs = all_payments.filter(status='SUCCESS', amount__gt=0)
-        total_revenue = successful_payment_qs.aggregate(total=Sum('amount'))['total'] or 0
+        total_payments = totals['count']
+        successful_payments = totals['successful']
+        failed_payments = totals['failed']
+        total_refunds = totals['refunds']
+        total_revenue = totals['revenue'] or 0
         
         # Time-based revenue
-        now = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=today_start.weekday())
-        month_start = today_start.replace(day=1)
-        
-        today_revenue = successful_payment_qs.filter(
-            created_at__gte=today_start
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        this_week_revenue = successful_payment_qs.filter(
-            created_at__gte=week_start
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        this_month_revenue = successful_payment_qs.filter(
-            created_at__gte=month_start
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        today_revenue = stats['windows']['today']['revenue'] or 0
+        this_week_revenue = stats['windows']['week']['revenue'] or 0
+        this_month_revenue = stats['windows']['month']['revenue'] or 0
         
         # Average transaction value
-        avg_transaction = successful_payment_qs.aggregate(avg=Avg('amount'))['avg'] or 0
+        avg_transaction = totals['avg'] or 0
         
         # Success rate
         success_rate = (successful_payments / total_payments * 100) if total_payments > 0 else 0
         
-        # Payment methods breakdown
+        # Payment methods and status breakdown
         payment_methods = {
-            'MOCK': all_payments.filter(provider='MOCK').count(),
-            'RAZORPAY': all_payments.filter(provider='RAZORPAY').count()
+            provider: values['count'] for provider, values in stats['breakdowns']['provider'].items()
+        }
+        payment_statuses = {
+            status_code: values['count'] for status_code, values in stats['breakdowns']['status'].items()
         }
         
         # Recent payments (last 10)
@@ -383,19 +478,13 @@ def get_payment_stats(request):
             })
         
         # Daily revenue for last 7 days
-        daily_revenue = []
-        for i in range(6, -1, -1):
-            day_start = today_start - timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            day_revenue = successful_payment_qs.filter(
-                created_at__gte=day_start,
-                created_at__lt=day_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            daily_revenue.append({
-                'date': day_start.strftime('%Y-%m-%d'),
-                'revenue': float(day_revenue)
-            })
+        today = timezone.localdate()
+        daily_revenue = [
+            {'date': day.strftime('%Y-%m-%d'), 'revenue': float(values['revenue'])}
+            for day, values in time_series(
+                all_payments.filter(successful), {'revenue': Sum('amount')}, today - timedelta(days=6), today
+            )
+        ]
         
         return Response({
             'total_payments': total_payments,
@@ -409,6 +498,7 @@ def get_payment_stats(request):
             'avg_transaction_value': float(avg_transaction),
             'success_rate': round(success_rate, 2),
             'payment_methods': payment_methods,
+            'payment_statuses': payment_statuses,
             'recent_payments': recent_payments,
             'daily_revenue': daily_revenue
         })
@@ -421,6 +511,19 @@ def get_payment_stats(request):
         )
 
 
+def filter_payments(queryset, params):
+    """Apply the payments list filters (status, provider) from query params."""
+    status_filter = params.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    
+    provider_filter = params.get('provider')
+    if provider_filter:
+        queryset = queryset.filter(provider=provider_filter)
+    
+    return queryset
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_payments(request):
@@ -446,19 +549,14 @@ def list_payments(request):
         from .serializers import PaymentSerializer
         
         # Get query parameters
-        status_filter = request.query_params.get('status')
-        provider_filter = request.query_params.get('provider')
         limit = int(request.query_params.get('limit', 100))
         offset = int(request.query_params.get('offset', 0))
         
         # Build query
-        queryset = Payment.objects.all().select_related('booking', 'party_booking')
-        
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        if provider_filter:
-            queryset = queryset.filter(provider=provider_filter)
+        queryset = filter_payments(
+            Payment.objects.all().select_related('booking', 'party_booking'),
+            request.query_params
+        )
         
         # Order by most recent first
         queryset = queryset.order_by('-created_at')
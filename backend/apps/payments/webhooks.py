@@ -0,0 +1,139 @@
+"""
+Razorpay webhook ingestion.
+
+The webhook request does as little as possible: check the HMAC signature
+and insert the raw event into the WebhookEvent inbox (one INSERT that skips
+redelivered event ids). process_pending() - run by the
+process_payment_webhooks command - applies pending events afterwards, so
+gateway bursts are absorbed by the table and the request never waits on
+booking updates or email.
+
+Applying an event is idempotent: a payment that is already SUCCESS (e.g.
+completed by the checkout's /verify/ call) is left alone.
+"""
+import hashlib
+import hmac
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.bookings import availability
+from apps.bookings.models import Booking
+from .models import Payment, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+
+def verify_signature(body, signature, secret=None):
+    """Razorpay signs the raw body with HMAC-SHA256 of the webhook secret."""
+    secret = secret if secret is not None else settings.RAZORPAY_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def record_event(event_id, payload, provider='RAZORPAY'):
+    """Insert the event into the inbox; a redelivered event_id is skipped by the database."""
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, event_id=event_id, event_type=payload.get('event', ''), payload=payload)],
+        ignore_conflicts=True,
+    )
+
+
+def _payment_entity(payload):
+    return ((payload.get('payload') or {}).get('payment') or {}).get('entity') or {}
+
+
+def _record_success(payment, entity):
+    """Same bookkeeping as RazorpayGateway.verify_payment, from the event body."""
+    payment.mark_success(payment_id=entity['id'], provider_response=entity)
+
+    booking = payment.get_booking()
+    booking.paid_amount += payment.amount
+    if booking.paid_amount >= booking.amount:
+        booking.payment_status = 'PAID'
+    elif booking.paid_amount > 0:
+        booking.payment_status = 'PARTIAL'
+    booking.save()
+
+    if isinstance(booking, Booking):
+        availability.convert_hold(booking)
+
+    if booking.payment_status == 'PAID':
+        from .services import payment_service
+        payment_service._send_payment_success_email(booking, payment)
+
+    logger.info(f"Webhook completed payment {payment.order_id} → {entity['id']} (booking {booking.id}: {booking.payment_status})")
+
+
+def apply_event(event):
+    """
+    Apply one event to its Payment and booking. Returns the event's new
+    status: PROCESSED, or IGNORED for events that change nothing.
+    """
+    if event.event_type not in ('payment.captured', 'order.paid', 'payment.failed'):
+        return 'IGNORED'
+
+    entity = _payment_entity(event.payload)
+    order_id = entity.get('order_id')
+    if not order_id or not entity.get('id'):
+        raise ValueError('Event has no payment entity with an order_id')
+
+    payment = Payment.objects.select_for_update().filter(order_id=order_id).first()
+    if payment is None:
+        raise ValueError(f"Payment with order_id {order_id} not found")
+    # A failed attempt can still be followed by a successful one on the same order
+    retry_after_failure = payment.status == 'FAILED' and event.event_type != 'payment.failed'
+    if payment.status != 'CREATED' and not retry_after_failure:
+        # Already completed by /verify/ or an earlier event
+        return 'IGNORED'
+
+    if event.event_type == 'payment.failed':
+        payment.mark_failed(entity.get('error_description') or 'Payment failed (webhook)')
+        return 'PROCESSED'
+
+    if entity.get('amount') is not None and Decimal(entity['amount']) != payment.amount * 100:
+        logger.warning(f"Webhook amount {entity['amount']} paise differs from payment {order_id} (₹{payment.amount})")
+    _record_success(payment, entity)
+    return 'PROCESSED'
+
+
+def process_event(event_pk):
+    """Apply one pending event in its own transaction. Returns its final status."""
+    max_attempts = getattr(settings, 'PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5)
+    try:
+        with transaction.atomic():
+            event = WebhookEvent.objects.select_for_update().get(pk=event_pk)
+            if event.status != 'PENDING':
+                return event.status
+            event.status = apply_event(event)
+            event.attempts += 1
+            event.last_error = None
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+            return event.status
+    except Exception as e:
+        logger.error(f"Failed to apply webhook event {event_pk}: {e}", exc_info=True)
+        event = WebhookEvent.objects.get(pk=event_pk)
+        event.attempts += 1
+        event.last_error = str(e)
+        if event.attempts >= max_attempts:
+            event.status = 'FAILED'
+        event.save(update_fields=['status', 'attempts', 'last_error'])
+        return event.status
+
+
+def process_pending(limit=BATCH_SIZE):
+    """Apply up to `limit` pending events, oldest first. Returns how many were handled."""
+    pending = list(
+        WebhookEvent.objects.filter(status='PENDING').order_by('received_at').values_list('pk', flat=True)[:limit]
+    )
+    for event_pk in pending:
+        process_event(event_pk)
+    return len(pending)
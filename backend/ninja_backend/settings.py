@@ -79,11 +79,13 @@ MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'apps.core.middleware.rate_limit.RateLimitMiddleware',  # Per-route limits (after CORS so 429s carry CORS headers)
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.query_diagnostics.QueryDiagnosticsMiddleware',  # Opt-in SQL diagnostics
 ]
 
 ROOT_URLCONF = 'ninja_backend.urls'
@@ -143,6 +145,60 @@ else:
     }
 
 
+# ====================================================
+# CACHES
+# ====================================================
+
+# 'default' is the shared cache: Redis when REDIS_URL is set (shared by all
+# gunicorn workers and surviving worker recycles), per-process LocMem otherwise.
+# 'local' is always per-process LocMem, the first level of two-level reads.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'ninja')
+
+if REDIS_URL:
+    _SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            # Fail fast: a slow cache must not stall requests
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+        },
+    }
+else:
+    _SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ninja-shared',
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 300,
+    }
+
+CACHES = {
+    'default': _SHARED_CACHE,
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ninja-local',
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Two-level reads in apps.core.cache: values are also kept in the 'local' cache
+# for CACHE_LOCAL_TTL seconds, so hot keys skip the network round trip. Other
+# workers may then serve a value up to CACHE_LOCAL_TTL seconds stale.
+CACHE_TWO_LEVEL = get_env_bool('CACHE_TWO_LEVEL', False)
+CACHE_LOCAL_TTL = int(os.getenv('CACHE_LOCAL_TTL', '5'))
+
+# Idempotency-Key responses (booking, party booking and payment creation) are kept
+# this long in the IdempotencyKey table (purged by purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+# A key whose request never answered (worker killed) can be reused after this many seconds
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -236,6 +292,10 @@ if 'WEBSITE_HOSTNAME' in os.environ:
     CSRF_TRUSTED_ORIGINS.append(f"https://{os.environ['WEBSITE_HOSTNAME']}")
 
 CORS_ALLOW_CREDENTIALS = True
+# Retry-safe POSTs (apps/core/idempotency.py)
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
 # CORS_ALLOW_ALL_ORIGINS = True  # Disabled to allowing credentials
 
 # Azure Storage Configuration
@@ -286,6 +346,9 @@ EMAIL_DEBUG_MODE = get_env_bool('EMAIL_DEBUG_MODE', False)
 EMAIL_MAX_RETRIES = int(os.getenv('EMAIL_MAX_RETRIES', '3'))
 EMAIL_RETRY_DELAY_MINUTES = int(os.getenv('EMAIL_RETRY_DELAY_MINUTES', '1'))
 
+# Payment confirmations are queued as outbox EmailLogs (queued=True) and sent by send_queued_emails
+EMAIL_OUTBOX_POLL_SECONDS = int(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', '5'))
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -300,6 +363,10 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'INFO',
         },
+        'apps.query_diagnostics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     },
 }
 
@@ -313,8 +380,110 @@ PAYMENT_MODE = os.getenv('PAYMENT_MODE', 'mock')
 # Razorpay Credentials (only needed when PAYMENT_MODE='razorpay')
 RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', '')
+RAZORPAY_WEBHOOK_SECRET = os.getenv('RAZORPAY_WEBHOOK_SECRET', '')
+
+# Webhook events are queued in an inbox and applied by process_payment_webhooks
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', '5'))
+PAYMENT_WEBHOOK_POLL_SECONDS = int(os.getenv('PAYMENT_WEBHOOK_POLL_SECONDS', '5'))
+
+# Gateway transport (apps/payments/gateways/transport.py): pooled session,
+# (connect, read) timeouts in seconds, retries of idempotent calls and the circuit breaker
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(os.getenv('PAYMENT_GATEWAY_CONNECT_TIMEOUT', '3.05'))
+PAYMENT_GATEWAY_READ_TIMEOUT = float(os.getenv('PAYMENT_GATEWAY_READ_TIMEOUT', '10'))
+PAYMENT_GATEWAY_POOL_SIZE = int(os.getenv('PAYMENT_GATEWAY_POOL_SIZE', '10'))
+PAYMENT_GATEWAY_MAX_RETRIES = int(os.getenv('PAYMENT_GATEWAY_MAX_RETRIES', '2'))
+PAYMENT_GATEWAY_RETRY_BACKOFF = float(os.getenv('PAYMENT_GATEWAY_RETRY_BACKOFF', '0.2'))
+PAYMENT_GATEWAY_BREAKER_THRESHOLD = int(os.getenv('PAYMENT_GATEWAY_BREAKER_THRESHOLD', '5'))
+PAYMENT_GATEWAY_BREAKER_RESET_SECONDS = int(os.getenv('PAYMENT_GATEWAY_BREAKER_RESET_SECONDS', '30'))
+
+# Mock gateway behaviour for load and soak tests (PAYMENT_MODE='mock' only).
+# Latency: none | fixed (LATENCY_MS) | uniform (LATENCY_MS..LATENCY_MAX_MS) |
+# lognormal (median LATENCY_MS, capped at LATENCY_MAX_MS). Rates are 0..1 per call.
+MOCK_GATEWAY_LATENCY = os.getenv('MOCK_GATEWAY_LATENCY', 'none')
+MOCK_GATEWAY_LATENCY_MS = int(os.getenv('MOCK_GATEWAY_LATENCY_MS', '300'))
+MOCK_GATEWAY_LATENCY_MAX_MS = int(os.getenv('MOCK_GATEWAY_LATENCY_MAX_MS', '2000'))
+MOCK_GATEWAY_FAILURE_RATE = float(os.getenv('MOCK_GATEWAY_FAILURE_RATE', '0'))
+MOCK_GATEWAY_TIMEOUT_RATE = float(os.getenv('MOCK_GATEWAY_TIMEOUT_RATE', '0'))
+# Emit Razorpay-style webhooks into the inbox after each verified payment
+MOCK_GATEWAY_WEBHOOKS = get_env_bool('MOCK_GATEWAY_WEBHOOKS', False)
+MOCK_GATEWAY_DUPLICATE_RATE = float(os.getenv('MOCK_GATEWAY_DUPLICATE_RATE', '0'))
+MOCK_GATEWAY_OUT_OF_ORDER_RATE = float(os.getenv('MOCK_GATEWAY_OUT_OF_ORDER_RATE', '0'))
+MOCK_GATEWAY_SEED = int(os.getenv('MOCK_GATEWAY_SEED')) if os.getenv('MOCK_GATEWAY_SEED') else None
 
 # Payment Settings
 ALLOW_PARTIAL_PAYMENTS = False  # Require full payment (no partial payments)
 MINIMUM_DEPOSIT_PERCENTAGE = 50  # Not used when ALLOW_PARTIAL_PAYMENTS = False
 
+
+# ====================================================
+# BOOKING CAPACITY CONFIGURATION
+# ====================================================
+
+# Maximum jumpers (adults + kids) per session slot. 0 (the default) disables the
+# capacity check; set it per park once the real limit is known.
+SESSION_SLOT_CAPACITY = int(os.getenv('SESSION_SLOT_CAPACITY', '0'))
+
+# Minutes an unpaid public checkout keeps its places before the booking is released.
+# Staff bookings (the admin manual booking form) are never held.
+SLOT_HOLD_TTL_MINUTES = int(os.getenv('SLOT_HOLD_TTL_MINUTES', '15'))
+
+# Seconds between sweeps of `expire_slot_holds --loop` (started by startup.sh)
+SLOT_HOLD_SWEEP_SECONDS = int(os.getenv('SLOT_HOLD_SWEEP_SECONDS', '60'))
+
+
+# ====================================================
+# RATE LIMITING
+# ====================================================
+
+# Requests per client IP as 'count/seconds' (sliding window, see
+# apps.core.middleware.rate_limit); empty or 0 disables a policy. Counts live
+# in the default cache, so they are only shared between workers with Redis.
+RATE_LIMITS = {
+    'login': os.getenv('RATE_LIMIT_LOGIN', '5/60'),
+    'booking_create': os.getenv('RATE_LIMIT_BOOKING_CREATE', '20/60'),
+    'voucher_validate': os.getenv('RATE_LIMIT_VOUCHER_VALIDATE', '10/60'),
+    'waiver_create': os.getenv('RATE_LIMIT_WAIVER_CREATE', '30/60'),
+}
+
+# The frontend server(s) whose Next.js server actions call the API on behalf of
+# visitors (IPs or CIDRs, e.g. the frontend App Service's outbound addresses).
+# Requests through them are counted per forwarded visitor IP, not per proxy.
+# Defaults to loopback and private networks (same host, Docker, VNet); add the
+# frontend's public outbound addresses when it reaches the API over the internet.
+RATE_LIMIT_TRUSTED_PROXIES = get_env_list(
+    'RATE_LIMIT_TRUSTED_PROXIES',
+    '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7'
+)
+
+
+# ====================================================
+# QUERY DIAGNOSTICS
+# ====================================================
+
+# Log SQL count/time per request (apps.query_diagnostics logger). Off by default.
+QUERY_DIAGNOSTICS = get_env_bool('QUERY_DIAGNOSTICS', False)
+
+# Also allow enabling it per request with the `X-Query-Diagnostics: 1` header.
+QUERY_DIAGNOSTICS_ALLOW_HEADER = get_env_bool('QUERY_DIAGNOSTICS_ALLOW_HEADER', False)
+
+
+# ====================================================
+# SEARCH
+# ====================================================
+
+# Admin search backend (apps.core.search): 'auto' uses pg_trgm indexes when the
+# database is PostgreSQL with the extension installed, 'trigram' / 'basic' force one.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Global admin search: 'index' answers from the SearchDocument table (one query,
+# see apps.core.search_index), 'live' queries each module's tables in turn,
+# 'parallel' queries them concurrently and drops modules slower than the budget.
+GLOBAL_SEARCH_MODE = os.getenv('GLOBAL_SEARCH_MODE', 'index')
+
+# Parallel mode: pool threads (each holds its own DB connection) and per-module budget
+GLOBAL_SEARCH_WORKERS = int(os.getenv('GLOBAL_SEARCH_WORKERS', '4'))
+GLOBAL_SEARCH_MODULE_TIMEOUT_MS = int(os.getenv('GLOBAL_SEARCH_MODULE_TIMEOUT_MS', '1500'))
+
+# Seconds the admin search box's results are cached per role (0 disables);
+# any indexed record change clears the cache (apps.core.search_cache)
+GLOBAL_SEARCH_CACHE_TTL = int(os.getenv('GLOBAL_SEARCH_CACHE_TTL', '30'))
@@ -27,16 +27,34 @@ echo "Running core app migrations (for RBAC users)..."
 python manage.py showmigrations core || echo "Could not show core migrations"
 python manage.py migrate core --noinput || echo "Core migration FAILED but continuing..."
 
+echo "Populating dashboard metrics rollup (first deploy only)..."
+python manage.py rebuild_daily_metrics --if-empty || echo "WARNING: Daily metrics rebuild failed"
+
 echo "Running shop app migrations (for vouchers)..."
 python manage.py showmigrations shop || echo "Could not show shop migrations"
 python manage.py migrate shop --noinput || echo "Shop migration FAILED but continuing..."
 
+echo "Populating global search index (first deploy only)..."
+python manage.py rebuild_search_index --if-empty || echo "WARNING: Search index rebuild failed"
+
+echo "Purging expired idempotency keys..."
+python manage.py purge_idempotency_keys || echo "WARNING: Idempotency key purge failed"
+
 echo "Creating RBAC users via management command..."
 python manage.py create_rbac_users || echo "WARNING: User creation command failed"
 
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+echo "Starting payment webhook worker..."
+python manage.py process_payment_webhooks --loop &
+
+echo "Starting email outbox worker..."
+python manage.py send_queued_emails --loop &
+
+echo "Starting slot hold sweeper..."
+python manage.py expire_slot_holds --loop &
+
 echo "Starting Gunicorn..."
 # Run from the current directory (which will be /home/site/wwwroot after deployment)
 exec gunicorn --bind=0.0.0.0:8000 --timeout 120 --workers 1 --worker-class sync --max-requests 1000 --max-requests-jitter 50 --access-logfile - --error-logfile - ninja_backend.wsgi:application
@@ -3,7 +3,7 @@
 import { cookies } from "next/headers";
 import { revalidatePath } from "next/cache";
 import { redirect } from "next/navigation";
-import { fetchAPI } from "../lib/server-api";
+import { fetchAPI, getForwardedHeaders } from "../lib/server-api";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || process.env.API_URL || 'http://localhost:8000/api/v1';
 
@@ -126,7 +126,7 @@ export async function loginAdmin(formData: FormData) {
     try {
         const res = await fetch(targetUrl, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
             // Send both email and username (mapped to email) to cover all backend config bases
             body: JSON.stringify({ email, username: email, password }),
             cache: 'no-store', // Disable caching
@@ -3,6 +3,7 @@
 import { revalidatePath } from "next/cache";
 import { bookingSchema, formatPhoneNumber } from "@repo/types";
 import QRCode from "qrcode";
+import { getForwardedHeaders } from "@/app/lib/server-api";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
@@ -206,7 +207,7 @@ export async function createBooking(formData: any) {
 
         const bookingRes = await fetch(`${API_URL}/bookings/bookings/`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
             body: JSON.stringify(bookingPayload)
         });
 
@@ -247,7 +248,7 @@ export async function createBooking(formData: any) {
 
             await fetch(`${API_URL}/bookings/waivers/`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
                 body: JSON.stringify(waiverPayload)
             });
 
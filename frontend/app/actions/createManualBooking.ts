@@ -3,6 +3,7 @@
 import { revalidatePath } from "next/cache";
 import { adminBookingSchema, formatPhoneNumber } from "@repo/types";
 import QRCode from "qrcode";
+import { getAuthHeader, getForwardedHeaders } from "@/app/lib/server-api";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
@@ -210,9 +211,11 @@ export async function createManualBooking(formData: any) {
             type: "SESSION"
         };
 
+        // Sent as the signed-in admin, so the backend does not put the
+        // unpaid booking on a checkout hold that would later cancel it
         const bookingRes = await fetch(`${API_URL}/bookings/bookings/`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...getAuthHeader(), ...getForwardedHeaders() },
             body: JSON.stringify(bookingPayload)
         });
 
@@ -252,7 +255,7 @@ export async function createManualBooking(formData: any) {
 
             await fetch(`${API_URL}/bookings/waivers/`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
                 body: JSON.stringify(waiverPayload)
             });
 
@@ -1,6 +1,7 @@
 "use server";
 
 import { revalidatePath } from "next/cache";
+import { getForwardedHeaders } from "@/app/lib/server-api";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
@@ -48,7 +49,7 @@ export async function createPartyBooking(formData: any) {
             // Validate voucher server-side
             const voucherRes = await fetch(`${API_URL}/shop/vouchers/validate/`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
                 body: JSON.stringify({
                     code: formData.voucherCode.toUpperCase(),
                     order_amount: subtotal
@@ -139,7 +140,7 @@ export async function createPartyBooking(formData: any) {
 
         const bookingRes = await fetch(`${API_URL}/bookings/party-bookings/`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
             body: JSON.stringify(partyBookingPayload)
         });
 
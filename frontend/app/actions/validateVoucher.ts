@@ -1,5 +1,7 @@
 "use server";
 
+import { getForwardedHeaders } from "@/app/lib/server-api";
+
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
 export async function validateVoucher(
@@ -17,6 +19,7 @@ export async function validateVoucher(
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...getForwardedHeaders(),
             },
             body: JSON.stringify({
                 code: code.toUpperCase(),
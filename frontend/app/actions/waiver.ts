@@ -1,6 +1,7 @@
 "use server";
 
 import { revalidatePath } from "next/cache";
+import { getForwardedHeaders } from "@/app/lib/server-api";
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
 
@@ -49,7 +50,7 @@ export async function submitWaiver(formData: FormData) {
 
         const waiverRes = await fetch(`${API_URL}/bookings/waivers/`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...getForwardedHeaders() },
             body: JSON.stringify(waiverPayload)
         });
 
@@ -1,4 +1,4 @@
-import { cookies } from "next/headers";
+import { cookies, headers } from "next/headers";
 
 // Use 127.0.0.1 for server-side requests to avoid Node.js 18+ IPv6 resolution issues
 const API_URL = (process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000/api/v1").replace('localhost', '127.0.0.1');
@@ -8,6 +8,14 @@ export function getAuthHeader(): Record<string, string> {
     return token ? { "Authorization": `Bearer ${token}` } : {};
 }
 
+// Server actions reach the backend from this server's IP. Pass the visitor's
+// forwarded chain on, so the backend rate limiter (which trusts this server as
+// a proxy via RATE_LIMIT_TRUSTED_PROXIES) counts each visitor separately.
+export function getForwardedHeaders(): Record<string, string> {
+    const forwardedFor = headers().get("x-forwarded-for");
+    return forwardedFor ? { "X-Forwarded-For": forwardedFor } : {};
+}
+
 export async function fetchAPI(endpoint: string, options: RequestInit = {}) {
     const headers: Record<string, string> = {
         ...getAuthHeader(),